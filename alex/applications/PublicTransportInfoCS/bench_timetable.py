@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Latency benchmark of the offline timetable directions search on a synthetic city network.
+
+The network is a grid of stops with a bus line along each row and a tram line along each column, running every few
+minutes for the whole day. The benchmark reports the time needed to index the timetable and the latency of
+earliest arrival and latest departure queries between random stops. Run as::
+
+    ./bench_timetable.py
+"""
+
+from __future__ import unicode_literals
+
+import random
+import time
+import unittest
+
+if __name__ == '__main__':
+    import autopath
+from alex.applications.PublicTransportInfoCS.timetable import Timetable, JourneyLeg
+
+
+def grid_network(size=40, headway=300, hop_time=120, first_departure=5 * 3600, last_departure=24 * 3600):
+    """Generate the stops, trips and stop times of a grid network with size x size stops."""
+    stops = [('%d-%d' % (row, col), 'Stop %d-%d' % (row, col), 'Praha')
+             for row in xrange(size) for col in xrange(size)]
+    trips = []
+    stop_times = []
+
+    lines = []
+    for row in xrange(size):
+        lines.append(('bus', 'B%d' % row, ['%d-%d' % (row, col) for col in xrange(size)]))
+    for col in xrange(size):
+        lines.append(('tram', 'T%d' % col, ['%d-%d' % (row, col) for row in xrange(size)]))
+
+    for vehicle, line_name, line_stops in lines:
+        for direction, route in enumerate((line_stops, line_stops[::-1])):
+            for start in xrange(first_departure, last_departure, headway):
+                trip_id = '%s-%d-%d' % (line_name, direction, start)
+                trips.append((trip_id, line_name, vehicle, None))
+                for seq, stop_id in enumerate(route):
+                    t = start + seq * hop_time
+                    stop_times.append((trip_id, stop_id, t, t, seq))
+
+    return stops, trips, stop_times
+
+
+class BenchTimetable(unittest.TestCase):
+
+    grid_size = 40
+    n_queries = 50
+
+    def report(self, name, times):
+        times = sorted(times)
+        print "%-28s mean %8.2f ms  median %8.2f ms  max %8.2f ms" % (
+            name, 1000.0 * sum(times) / len(times), 1000.0 * times[len(times) // 2], 1000.0 * times[-1])
+
+    @classmethod
+    def setUpClass(cls):
+        stops, trips, stop_times = grid_network(cls.grid_size)
+
+        start = time.time()
+        cls.tt = Timetable(stops, trips, stop_times, min_change_time=60)
+        print "indexed %d stops, %d trips, %d connections in %.2f s" % (
+            len(stops), len(trips), len(cls.tt.dep_trip), time.time() - start)
+
+        rnd = random.Random(0)
+        n_stops = len(stops)
+        cls.queries = [(rnd.randrange(n_stops), rnd.randrange(n_stops), rnd.randrange(6 * 3600, 22 * 3600))
+                       for _ in xrange(cls.n_queries)]
+        cls.queries = [(src, tgt, t) for src, tgt, t in cls.queries if src != tgt]
+
+    def test_bench_earliest_arrival(self):
+        times = []
+        for src, tgt, t in self.queries:
+            start = time.time()
+            legs = self.tt.earliest_arrival([src], [tgt], t)
+            times.append(time.time() - start)
+
+            self.assertIsNotNone(legs)
+            self.assertGreaterEqual(legs[0].departure_time, t)
+            self.assertTrue(all(leg.travel_mode == JourneyLeg.MODE_TRANSIT for leg in legs))
+
+        self.report("earliest arrival", times)
+
+    def test_bench_latest_departure(self):
+        times = []
+        for src, tgt, t in self.queries:
+            start = time.time()
+            legs = self.tt.latest_departure([src], [tgt], t)
+            times.append(time.time() - start)
+
+            if legs is not None:
+                self.assertLessEqual(legs[-1].arrival_time, t)
+
+        self.report("latest departure", times)
+
+
+if __name__ == '__main__':
+    unittest.main()
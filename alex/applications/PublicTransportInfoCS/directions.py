@@ -22,6 +22,7 @@ from alex.tools.apirequest import APIRequest
 from alex.utils.cache import lru_cache
 from alex.utils.config import online_update, to_project_path
 from alex.applications.PublicTransportInfoCS.data.convert_idos_stops import expand_abbrevs
+from alex.applications.PublicTransportInfoCS.timetable import Timetable, JourneyLeg
 
 
 class Travel(object):
@@ -850,3 +851,118 @@ class CRWSDirectionsFinder(DirectionsFinder, APIRequest):
             stop_full_name, _ = expand_abbrevs(idos_stop)
             self.reverse_mapping[self._normalize_idos_name(idos_stop)] = stop_full_name
         return stop_full_name
+
+
+class TimetableDirectionsFinder(DirectionsFinder, APIRequest):
+    """Offline direction finder searching a local timetable (see
+    :class:`~alex.applications.PublicTransportInfoCS.timetable.Timetable`).
+
+    The timetable is loaded from a GTFS feed given in the configuration::
+
+        'Timetable': {
+            'gtfs_dir': ...,               # directory with the GTFS files
+            'default_city': 'Praha',       # city of the stops without the stop_city column
+            'min_change_time': 60,         # minimal change time at a stop (in seconds)
+            'max_connections_count': 3,    # number of route alternatives to search for
+        }
+
+    Stop names in the feed are expected to match the stop names of the Alex database.
+    """
+
+    def __init__(self, cfg, timetable=None):
+        DirectionsFinder.__init__(self)
+        APIRequest.__init__(self, cfg, 'timetable-directions', 'Timetable directions query')
+        tt_cfg = cfg['Timetable'] if 'Timetable' in cfg else {}
+        self.max_connections_count = tt_cfg.get('max_connections_count', 3)
+        if timetable is None:
+            timetable = Timetable.load_gtfs(tt_cfg['gtfs_dir'], tt_cfg.get('default_city', 'Praha'),
+                                            tt_cfg.get('min_change_time', 60))
+        self.timetable = timetable
+
+    @lru_cache(maxsize=10)
+    def get_directions(self, travel, departure_time=None, arrival_time=None):
+        """Search the timetable for the given travel, departing at the given time (now by default) or arriving
+        at the given time.
+
+        :rtype: Directions
+        """
+        directions = Directions(travel=travel)
+
+        sources = self.timetable.find_stops(travel.from_city, travel.from_stop)
+        targets = self.timetable.find_stops(travel.to_city, travel.to_stop)
+        if not sources or not targets:
+            self.system_logger.info("Timetable: unknown stop: %s -- %s, %s -- %s" %
+                                    (travel.from_stop, travel.from_city, travel.to_stop, travel.to_city))
+            return directions
+
+        max_transfers = None
+        if travel.max_transfers is not None:
+            try:
+                max_transfers = int(travel.max_transfers)
+            except ValueError:
+                pass
+
+        ts = arrival_time or departure_time or datetime.now()
+        day_start = datetime(ts.year, ts.month, ts.day)
+        search_time = int((ts - day_start).total_seconds())
+
+        journeys = []
+        while len(journeys) < self.max_connections_count:
+            if arrival_time is None:
+                legs = self.timetable.earliest_arrival(sources, targets, search_time,
+                                                       travel.vehicle, max_transfers)
+            else:
+                legs = self.timetable.latest_departure(sources, targets, search_time,
+                                                       travel.vehicle, max_transfers)
+            if legs is None:
+                break
+            journeys.append(legs)
+
+            transit_legs = [leg for leg in legs if leg.travel_mode == JourneyLeg.MODE_TRANSIT]
+            if not transit_legs:
+                # walking is always possible, no need for alternatives
+                break
+            # search for the next journey, which must use a later first vehicle (or a sooner last vehicle)
+            if arrival_time is None:
+                first = legs.index(transit_legs[0])
+                walk_time = sum(leg.arrival_time - leg.departure_time for leg in legs[:first])
+                search_time = transit_legs[0].departure_time - walk_time + 1
+            else:
+                last = legs.index(transit_legs[-1])
+                walk_time = sum(leg.arrival_time - leg.departure_time for leg in legs[last + 1:])
+                search_time = transit_legs[-1].arrival_time + walk_time - 1
+
+        if arrival_time is not None:
+            journeys.reverse()
+
+        for legs in journeys:
+            directions.routes.append(self._create_route(legs, day_start))
+
+        self.system_logger.info("Timetable Directions response:\n" + unicode(directions))
+        return directions
+
+    def _create_route(self, legs, day_start):
+        """Convert a journey found in the timetable into a route with a single leg."""
+        tt = self.timetable
+        route_leg = RouteLeg()
+        for leg in legs:
+            if leg.travel_mode == JourneyLeg.MODE_TRANSIT:
+                step = RouteStep(RouteStep.MODE_TRANSIT)
+                step.departure_stop = tt.stop_names[leg.from_stop]
+                step.departure_time = day_start + timedelta(seconds=leg.departure_time)
+                step.arrival_stop = tt.stop_names[leg.to_stop]
+                step.arrival_time = day_start + timedelta(seconds=leg.arrival_time)
+                step.headsign = tt.trip_headsigns[leg.trip]
+                step.vehicle = tt.trip_vehicles[leg.trip]
+                step.line_name = tt.trip_lines[leg.trip]
+                # normalize some stops' names
+                step.departure_stop = step.STOPS_MAPPING.get(step.departure_stop, step.departure_stop)
+                step.arrival_stop = step.STOPS_MAPPING.get(step.arrival_stop, step.arrival_stop)
+            else:
+                step = RouteStep(RouteStep.MODE_WALKING)
+                step.duration = leg.arrival_time - leg.departure_time
+            route_leg.steps.append(step)
+
+        route = Route()
+        route.legs.append(route_leg)
+        return route
@@ -4,13 +4,12 @@
 
 from __future__ import unicode_literals
 
-import copy
 import codecs
 from ast import literal_eval
 from itertools import chain
 
 from alex.components.asr.utterance import Utterance, UtteranceHyp
-from alex.components.slu.base import SLUInterface
+from alex.components.slu.base import NormalisedUtteranceSLU
 from alex.components.slu.da import DialogueActItem, DialogueActConfusionNetwork, DialogueAct
 
 # if there is a change in search parameters from_stop, to_stop, time, then
@@ -174,7 +173,7 @@ class DAIBuilder(object):
         return False
 
 
-class PTICSHDCSLU(SLUInterface):
+class PTICSHDCSLU(NormalisedUtteranceSLU):
 
     def __init__(self, preprocessing, cfg):
         super(PTICSHDCSLU, self).__init__(preprocessing, cfg)
@@ -208,37 +207,20 @@ class PTICSHDCSLU(SLUInterface):
         :param utterance: an Utterance instance
         :return: a list of abstracted utterance, form, value, category label tuples
         """
-        abs_utts = copy.deepcopy(utterance)
+        abs_utts = Utterance(' '.join(utterance))
         category_labels = set()
         abs_utt_lengths = [1] * len(abs_utts)
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                # print start, end
-                # print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            abs_utts = abs_utts.replace(f, (c.upper() + '='+v,))
-                            abs_utt_lengths[start] = len(f)
-                            category_labels.add(c.upper())
-                            break
-                        else:
-                            continue
-
-                        break
-
-                    # print f
-
-                    # skip all substring for this form
-                    start = end
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    abs_utts = abs_utts.replace(f, (c.upper() + '='+v,))
+                    abs_utt_lengths[start] = len(f)
+                    category_labels.add(c.upper())
                     break
-                end -= 1
-            else:
-                start += 1
+                else:
+                    continue
+
+                break
         # normalize abstract utterance lengths
         norm_abs_utt_lengths = []
         i = 0
@@ -975,30 +957,28 @@ class PTICSHDCSLU(SLUInterface):
         abutterance = abutterance.replace(('jsem', 'v', 'STOP=Metra',), ('jsem', 'v', 'VEHICLE=metro',))
         return abutterance
 
-    def parse_1_best(self, obs, verbose=False, *args, **kwargs):
-        """Parse an utterance into a dialogue act.
+    def parse_utt2da(self, utterance):
+        """Parse an utterance listed in the utt2da dictionary.
 
+        :return: the dialogue act confusion network, or None if the utterance is not in the dictionary
         :rtype DialogueActConfusionNetwork
         """
+        dict_da = self.utt2da.get(unicode(utterance), None)
+        if not dict_da:
+            return None
 
-        utterance = obs['utt']
-
-        if isinstance(utterance, UtteranceHyp):
-            # Parse just the utterance and ignore the confidence score.
-            utterance = utterance.utterance
+        res_cn = DialogueActConfusionNetwork()
+        for dai in DialogueAct(dict_da):
+            res_cn.add_merge(1.0, dai)
+        return res_cn
 
-        if verbose:
-            print 'Parsing utterance "{utt}".'.format(utt=utterance)
+    def parse_normalised(self, utterance, verbose=False):
+        """Parse an already normalised utterance into a dialogue act using the HDC rules.
 
+        :rtype DialogueActConfusionNetwork
+        """
         res_cn = DialogueActConfusionNetwork()
 
-        dict_da = self.utt2da.get(unicode(utterance), None)
-        if dict_da:
-            for dai in DialogueAct(dict_da):
-                res_cn.add_merge(1.0, dai)
-            return res_cn
-
-        utterance = self.preprocessing.normalise_utterance(utterance)
         abutterance, category_labels, abutterance_lenghts = self.abstract_utterance(utterance)
 
         if verbose:
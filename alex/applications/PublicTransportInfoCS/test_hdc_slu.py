@@ -5,7 +5,7 @@ from unittest import TestCase
 from alex.applications.PublicTransportInfoCS.hdc_slu import PTICSHDCSLU
 from alex.applications.PublicTransportInfoCS.preprocessing import PTICSSLUPreprocessing
 from alex.components.asr.utterance import Utterance, UtteranceNBList
-from alex.components.slu.base import CategoryLabelDatabase
+from alex.components.slu.base import CategoryLabelDatabase, SLUInterface
 from alex.components.slu.da import DialogueAct, DialogueActItem
 from alex.utils.config import as_project_path
 
@@ -18,6 +18,22 @@ class TestPTICSHDCSLU(TestCase):
 
         self.assert_(DialogueActItem(dai="inform(date_rel=tomorrow)") in cn)
 
+    def test_parse_nblist_same_as_parsing_each_hypothesis(self):
+        asr_hyp = UtteranceNBList()
+        asr_hyp.add(0.4, Utterance("chtěl bych jet zítra"))
+        asr_hyp.add(0.1, Utterance("chtěl bych jet ve zitra"))
+        asr_hyp.add(0.1, Utterance("chtěl bych jet v zitra"))
+        asr_hyp.add(0.2, Utterance("chtěl bych jet teď"))
+        asr_hyp.add(0.1, Utterance("chtěl bych najít spojení"))
+        asr_hyp.add_other()
+
+        cn = self.slu.parse_nblist({'utt_nbl': asr_hyp})
+        cn_each = SLUInterface.parse_nblist(self.slu, {'utt_nbl': asr_hyp})
+
+        self.assertEqual(len(cn_each), len(cn))
+        for prob, dai in cn_each:
+            self.assertAlmostEqual(prob, cn.get_prob(dai))
+
     def test_parse_meta(self):
         utterances_to_understand = [
             (u"ahoj", "hello()", ),
@@ -0,0 +1,131 @@
+# encoding: utf8
+from __future__ import unicode_literals
+
+import codecs
+import os.path
+import shutil
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+import alex.utils
+from alex.applications.PublicTransportInfoCS.directions import Travel, TimetableDirectionsFinder
+from alex.applications.PublicTransportInfoCS.timetable import Timetable, JourneyLeg
+
+
+def hms(hours, minutes, seconds=0):
+    return hours * 3600 + minutes * 60 + seconds
+
+
+class TestTimetable(TestCase):
+
+    def setUp(self):
+        stops = [('A', 'Anděl', 'Praha'),
+                 ('B', 'Bílá Hora', 'Praha'),
+                 ('C', 'Cukrovar', 'Praha'),
+                 ('D', 'Dejvická', 'Praha'),
+                 ('W', 'Vítězné náměstí', 'Praha')]
+        trips = [('T1', '1', 'tram', None),
+                 ('T2', '1', 'tram', None),
+                 ('T3', '100', 'bus', 'Dejvická'),
+                 ('T4', 'A', 'subway', None)]
+        stop_times = [('T1', 'A', hms(8, 0), hms(8, 0), 1),
+                      ('T1', 'B', hms(8, 10), hms(8, 10), 2),
+                      ('T1', 'C', hms(8, 20), hms(8, 20), 3),
+                      ('T2', 'A', hms(8, 30), hms(8, 30), 1),
+                      ('T2', 'B', hms(8, 40), hms(8, 40), 2),
+                      ('T2', 'C', hms(8, 50), hms(8, 50), 3),
+                      ('T3', 'B', hms(8, 12), hms(8, 12), 1),
+                      ('T3', 'D', hms(8, 25), hms(8, 25), 2),
+                      ('T4', 'A', hms(8, 5), hms(8, 5), 1),
+                      ('T4', 'D', hms(8, 40), hms(8, 40), 2)]
+        transfers = [('C', 'W', 120),
+                     ('W', 'C', 120)]
+        self.tt = Timetable(stops, trips, stop_times, transfers, min_change_time=60)
+
+    def stops(self, *names):
+        return [stop for name in names for stop in self.tt.find_stops('Praha', name)]
+
+    def trips(self, legs):
+        return [self.tt.trip_ids[leg.trip] for leg in legs if leg.travel_mode == JourneyLeg.MODE_TRANSIT]
+
+    def test_earliest_arrival_with_transfer(self):
+        legs = self.tt.earliest_arrival(self.stops('Anděl'), self.stops('Dejvická'), hms(7, 55))
+
+        self.assertEqual(self.trips(legs), ['T1', 'T3'])
+        self.assertEqual(legs[0].departure_time, hms(8, 0))
+        self.assertEqual(legs[-1].arrival_time, hms(8, 25))
+        self.assertEqual(self.tt.trip_headsigns[legs[0].trip], 'Cukrovar')
+
+    def test_earliest_arrival_with_limits(self):
+        legs = self.tt.earliest_arrival(self.stops('Anděl'), self.stops('Dejvická'), hms(7, 55), max_transfers=0)
+        self.assertEqual(self.trips(legs), ['T4'])
+
+        legs = self.tt.earliest_arrival(self.stops('Anděl'), self.stops('Dejvická'), hms(7, 55), vehicle='metro')
+        self.assertEqual(self.trips(legs), ['T4'])
+
+        legs = self.tt.earliest_arrival(self.stops('Anděl'), self.stops('Dejvická'), hms(8, 6))
+        self.assertIsNone(legs)
+
+    def test_earliest_arrival_with_walking(self):
+        legs = self.tt.earliest_arrival(self.stops('Anděl'), self.stops('Vítězné náměstí'), hms(7, 55))
+
+        self.assertEqual([leg.travel_mode for leg in legs], [JourneyLeg.MODE_TRANSIT, JourneyLeg.MODE_WALKING])
+        self.assertEqual(legs[-1].arrival_time, hms(8, 22))
+
+    def test_latest_departure(self):
+        legs = self.tt.latest_departure(self.stops('Anděl'), self.stops('Dejvická'), hms(8, 45))
+        self.assertEqual(self.trips(legs), ['T4'])
+
+        legs = self.tt.latest_departure(self.stops('Anděl'), self.stops('Dejvická'), hms(8, 30))
+        self.assertEqual(self.trips(legs), ['T1', 'T3'])
+
+        legs = self.tt.latest_departure(self.stops('Anděl'), self.stops('Vítězné náměstí'), hms(8, 55))
+        self.assertEqual([leg.travel_mode for leg in legs], [JourneyLeg.MODE_TRANSIT, JourneyLeg.MODE_WALKING])
+        self.assertEqual(self.trips(legs), ['T2'])
+
+        legs = self.tt.latest_departure(self.stops('Anděl'), self.stops('Vítězné náměstí'), hms(8, 51))
+        self.assertEqual(self.trips(legs), ['T1'])
+
+    def test_load_gtfs(self):
+        gtfs_dir = tempfile.mkdtemp()
+        try:
+            files = {'stops.txt': ['stop_id,stop_name,location_type', 'S1,Anděl,0', 'S2,Dejvická,',
+                                   'ST,Praha hl.n.,1'],
+                     'routes.txt': ['route_id,route_short_name,route_type', 'R1,A,1', 'R2,119,700'],
+                     'trips.txt': ['route_id,service_id,trip_id,trip_headsign', 'R1,X,T1,Nemocnice Motol'],
+                     'stop_times.txt': ['trip_id,arrival_time,departure_time,stop_id,stop_sequence',
+                                        'T1,24:05:00,24:05:00,S1,1', 'T1,24:20:00,24:20:00,S2,2']}
+            for fname, lines in files.iteritems():
+                with codecs.open(os.path.join(gtfs_dir, fname), 'w', 'utf-8') as fh:
+                    fh.write('\n'.join(lines) + '\n')
+
+            tt = Timetable.load_gtfs(gtfs_dir, 'Praha')
+        finally:
+            shutil.rmtree(gtfs_dir)
+
+        self.assertEqual(tt.stop_names, ['Anděl', 'Dejvická'])
+        self.assertEqual(tt.trip_vehicles, ['subway'])
+        legs = tt.earliest_arrival(tt.find_stops('Praha', 'Anděl'), tt.find_stops('Praha', 'Dejvická'), hms(23, 50))
+        self.assertEqual(legs[0].arrival_time, hms(24, 20))
+        self.assertEqual(tt.trip_headsigns[legs[0].trip], 'Nemocnice Motol')
+
+    def test_finder_directions(self):
+        cfg = {'Logging': {'system_logger': alex.utils.DummyLogger(),
+                           'session_logger': alex.utils.DummyLogger()}}
+        finder = TimetableDirectionsFinder(cfg, timetable=self.tt)
+        travel = Travel(from_city='Praha', from_stop='Anděl', to_city='Praha', to_stop='Dejvická',
+                        vehicle='none', max_transfers='none')
+
+        directions = finder.get_directions(travel, departure_time=datetime(2015, 3, 2, 7, 55))
+
+        self.assertEqual(len(directions), 2)
+        steps = directions[0].legs[0].steps
+        self.assertEqual([step.vehicle for step in steps], ['tram', 'bus'])
+        self.assertEqual(steps[0].departure_time, datetime(2015, 3, 2, 8, 0))
+        self.assertEqual(steps[-1].arrival_stop, 'Dejvická')
+        self.assertEqual(directions[1].legs[0].steps[0].line_name, 'A')
+
+        travel = Travel(from_city='Praha', from_stop='Anděl', to_city='Praha', to_stop='Zličín',
+                        vehicle='none', max_transfers='none')
+        self.assertEqual(len(finder.get_directions(travel)), 0)
@@ -0,0 +1,503 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+An in-process timetable for the offline transit directions finder.
+
+The timetable keeps all the elementary connections (a vehicle going from one stop to the next one without stopping)
+in flat arrays sorted by the departure and by the arrival time. Journeys are searched with the Connection Scan
+Algorithm (Dibbelt et al., 2013), which makes one pass over the connections from the requested time on.
+
+The timetable can be loaded from a GTFS feed (stops.txt, routes.txt, trips.txt, stop_times.txt and optionally
+transfers.txt). The service calendar is not taken into account; all the trips are assumed to run every day.
+"""
+
+from __future__ import unicode_literals
+
+import codecs
+import csv
+import os.path
+from itertools import izip
+
+import numpy as np
+
+
+# GTFS route types -> Alex vehicle names
+GTFS_VEHICLE_TYPES = {0: 'tram',
+                      1: 'subway',
+                      2: 'train',
+                      3: 'bus',
+                      4: 'ferry',
+                      5: 'cable_car',
+                      6: 'cable_car',
+                      7: 'cable_car',
+                      11: 'trolleybus'}
+
+# extended GTFS route types (by hundreds, e.g. 700 = bus service) -> basic GTFS route types
+GTFS_EXTENDED_ROUTE_TYPES = {1: 2,
+                             2: 3,
+                             4: 1,
+                             7: 3,
+                             8: 11,
+                             9: 0,
+                             10: 4,
+                             13: 6,
+                             14: 7}
+
+# vehicle names used in the dialogue -> vehicle names used in the timetable
+VEHICLE_ALIASES = {'metro': 'subway'}
+
+INFINITY = float('inf')
+
+
+class TimetableException(Exception):
+    pass
+
+
+class JourneyLeg(object):
+    """One leg of a journey found in the timetable -- a ride in one trip or a walk between two stops.
+
+    Stops are given as indexes into the timetable stop arrays and times in seconds from the service day start.
+    """
+
+    MODE_TRANSIT = 'TRANSIT'
+    MODE_WALKING = 'WALKING'
+
+    def __init__(self, travel_mode, from_stop, to_stop, departure_time, arrival_time, trip=None):
+        self.travel_mode = travel_mode
+        self.from_stop = from_stop
+        self.to_stop = to_stop
+        self.departure_time = departure_time
+        self.arrival_time = arrival_time
+        self.trip = trip
+
+    def __repr__(self):
+        return "JourneyLeg(%s, %d -> %d, %d -> %d, trip=%s)" % (self.travel_mode, self.from_stop, self.to_stop,
+                                                                self.departure_time, self.arrival_time, self.trip)
+
+
+def parse_gtfs_time(time_str):
+    """Convert a GTFS time (HH:MM:SS, possibly over 24:00:00) into seconds from the service day start."""
+    hours, minutes, seconds = time_str.strip().split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def _read_gtfs_file(dirname, fname, required=True):
+    path = os.path.join(dirname, fname)
+    if not os.path.exists(path):
+        if required:
+            raise TimetableException('Missing GTFS file: ' + path)
+        return []
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    if data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+    reader = csv.DictReader(data.splitlines())
+    return [{key.strip(): (value or b'').decode('utf-8').strip()
+             for key, value in row.iteritems() if key is not None}
+            for row in reader]
+
+
+class Timetable(object):
+    """Transit timetable indexed for the connection scan.
+
+    :param stops: a list of (stop_id, name, city) tuples
+    :param trips: a list of (trip_id, line_name, vehicle, headsign) tuples; headsign may be None, then the name \
+            of the last stop of the trip is used
+    :param stop_times: a list of (trip_id, stop_id, arrival_time, departure_time, stop_sequence) tuples, \
+            with times in seconds from the service day start
+    :param transfers: a list of (from_stop_id, to_stop_id, duration) tuples; a transfer from a stop to itself \
+            sets the minimal change time at the stop, other transfers are footpaths between stops
+    :param min_change_time: default minimal change time at a stop (in seconds)
+    """
+
+    # number of connections converted from the arrays at once during the scan
+    SCAN_CHUNK_SIZE = 4096
+
+    def __init__(self, stops, trips, stop_times, transfers=(), min_change_time=0):
+        stop_idx = {}
+        self.stop_ids = []
+        self.stop_names = []
+        self.stop_cities = []
+        self.stop_index = {}
+        for stop_id, name, city in stops:
+            stop_idx[stop_id] = len(self.stop_ids)
+            self.stop_index.setdefault((city, name), []).append(len(self.stop_ids))
+            self.stop_ids.append(stop_id)
+            self.stop_names.append(name)
+            self.stop_cities.append(city)
+        self.city_index = {}
+        for idx, city in enumerate(self.stop_cities):
+            self.city_index.setdefault(city, []).append(idx)
+
+        trip_idx = {}
+        self.trip_ids = []
+        self.trip_lines = []
+        self.trip_vehicles = []
+        self.trip_headsigns = []
+        for trip_id, line_name, vehicle, headsign in trips:
+            trip_idx[trip_id] = len(self.trip_ids)
+            self.trip_ids.append(trip_id)
+            self.trip_lines.append(line_name)
+            self.trip_vehicles.append(vehicle)
+            self.trip_headsigns.append(headsign)
+
+        self._build_connections(stop_idx, trip_idx, stop_times)
+        self._build_transfers(stop_idx, transfers, min_change_time)
+
+    def _build_connections(self, stop_idx, trip_idx, stop_times):
+        """Create the connection arrays from the stop times of the trips."""
+        n_times = len(stop_times)
+        st_trip = np.empty(n_times, dtype=np.int32)
+        st_stop = np.empty(n_times, dtype=np.int32)
+        st_arr = np.empty(n_times, dtype=np.int32)
+        st_dep = np.empty(n_times, dtype=np.int32)
+        st_seq = np.empty(n_times, dtype=np.int32)
+        for i, (trip_id, stop_id, arr, dep, seq) in enumerate(stop_times):
+            if trip_id not in trip_idx or stop_id not in stop_idx:
+                raise TimetableException('Unknown trip or stop in stop times: %s, %s' % (trip_id, stop_id))
+            st_trip[i] = trip_idx[trip_id]
+            st_stop[i] = stop_idx[stop_id]
+            st_arr[i] = arr
+            st_dep[i] = dep
+            st_seq[i] = seq
+
+        order = np.lexsort((st_seq, st_trip))
+        st_trip, st_stop, st_arr, st_dep = st_trip[order], st_stop[order], st_arr[order], st_dep[order]
+
+        # each two consecutive stop times of a trip form a connection
+        same_trip = np.nonzero(st_trip[:-1] == st_trip[1:])[0]
+        c_trip = st_trip[same_trip]
+        c_dep_stop = st_stop[same_trip]
+        c_arr_stop = st_stop[same_trip + 1]
+        c_dep_time = st_dep[same_trip]
+        c_arr_time = st_arr[same_trip + 1]
+        # position of the connection within its trip, keeps the order of zero-duration connections
+        c_seq = same_trip.astype(np.int32)
+
+        # fill in the missing headsigns with the last stop of the trip
+        last_stops = np.ones(len(st_trip), dtype=bool)
+        last_stops[same_trip] = False
+        for trip, stop in izip(st_trip[last_stops].tolist(), st_stop[last_stops].tolist()):
+            if not self.trip_headsigns[trip]:
+                self.trip_headsigns[trip] = self.stop_names[stop]
+
+        vehicle_codes = {}
+        trip_vehicle_codes = np.array([vehicle_codes.setdefault(vehicle, len(vehicle_codes))
+                                       for vehicle in self.trip_vehicles], dtype=np.int32)
+        self.vehicle_codes = vehicle_codes
+
+        by_departure = np.lexsort((c_seq, c_arr_time, c_dep_time))
+        self.dep_trip = c_trip[by_departure]
+        self.dep_dep_stop = c_dep_stop[by_departure]
+        self.dep_arr_stop = c_arr_stop[by_departure]
+        self.dep_dep_time = c_dep_time[by_departure]
+        self.dep_arr_time = c_arr_time[by_departure]
+        self.dep_vehicle = trip_vehicle_codes[self.dep_trip]
+
+        # the connections sorted by the decreasing arrival time; the arrival times are negated so that
+        # the array is increasing and can be searched with np.searchsorted
+        by_arrival = np.lexsort((-c_seq, -c_dep_time, -c_arr_time))
+        self.arr_trip = c_trip[by_arrival]
+        self.arr_dep_stop = c_dep_stop[by_arrival]
+        self.arr_arr_stop = c_arr_stop[by_arrival]
+        self.arr_dep_time = c_dep_time[by_arrival]
+        self.arr_neg_arr_time = -c_arr_time[by_arrival]
+        self.arr_vehicle = trip_vehicle_codes[self.arr_trip]
+
+    def _build_transfers(self, stop_idx, transfers, min_change_time):
+        """Create the minimal change times and the footpaths (in both directions) between stops."""
+        self.change_times = [min_change_time] * len(self.stop_ids)
+        self.footpaths_from = [() for _ in self.stop_ids]
+        self.footpaths_to = [() for _ in self.stop_ids]
+
+        footpaths_from = {}
+        footpaths_to = {}
+        for from_id, to_id, duration in transfers:
+            from_stop, to_stop = stop_idx[from_id], stop_idx[to_id]
+            if from_stop == to_stop:
+                self.change_times[from_stop] = duration
+            else:
+                footpaths_from.setdefault(from_stop, []).append((to_stop, duration))
+                footpaths_to.setdefault(to_stop, []).append((from_stop, duration))
+
+        for stop, paths in footpaths_from.iteritems():
+            self.footpaths_from[stop] = tuple(paths)
+        for stop, paths in footpaths_to.iteritems():
+            self.footpaths_to[stop] = tuple(paths)
+
+    @classmethod
+    def load_gtfs(cls, dirname, default_city, min_change_time=0):
+        """Load a timetable from a directory with a GTFS feed.
+
+        The city of a stop is taken from the non-standard ``stop_city`` column of stops.txt, if present.
+
+        :param dirname: the directory with the GTFS files
+        :param default_city: the city of the stops without ``stop_city``
+        :param min_change_time: default minimal change time at a stop (in seconds)
+        :rtype: Timetable
+        """
+        stops = [(row['stop_id'], row['stop_name'], row.get('stop_city') or default_city)
+                 for row in _read_gtfs_file(dirname, 'stops.txt')
+                 # skip stations (parent stops) and entrances
+                 if row.get('location_type', '0') in ('', '0')]
+
+        routes = {}
+        for row in _read_gtfs_file(dirname, 'routes.txt'):
+            route_type = int(row['route_type'])
+            if route_type >= 100:
+                route_type = GTFS_EXTENDED_ROUTE_TYPES.get(route_type // 100, 3)
+            routes[row['route_id']] = (row.get('route_short_name') or row.get('route_long_name', ''),
+                                       GTFS_VEHICLE_TYPES.get(route_type, 'bus'))
+
+        trips = [(row['trip_id'],) + routes[row['route_id']] + (row.get('trip_headsign') or None,)
+                 for row in _read_gtfs_file(dirname, 'trips.txt')]
+
+        stop_ids = set(stop_id for stop_id, _, _ in stops)
+        stop_times = [(row['trip_id'], row['stop_id'],
+                       parse_gtfs_time(row['arrival_time'] or row['departure_time']),
+                       parse_gtfs_time(row['departure_time'] or row['arrival_time']),
+                       int(row['stop_sequence']))
+                      for row in _read_gtfs_file(dirname, 'stop_times.txt')
+                      if row['stop_id'] in stop_ids]
+
+        transfers = [(row['from_stop_id'], row['to_stop_id'], int(row.get('min_transfer_time') or 0))
+                     for row in _read_gtfs_file(dirname, 'transfers.txt', required=False)
+                     if row['from_stop_id'] in stop_ids and row['to_stop_id'] in stop_ids and
+                     row.get('transfer_type', '0') != '3']
+
+        return cls(stops, trips, stop_times, transfers, min_change_time)
+
+    def find_stops(self, city, name=None):
+        """Return the indexes of all the stops of the given name in the given city, or of all the stops in the city
+        if the name is not given."""
+        if name is None:
+            return self.city_index.get(city, [])
+        return self.stop_index.get((city, name), [])
+
+    def _vehicle_code(self, vehicle):
+        """Return the code of the vehicle for filtering the connections, or None if not filtering."""
+        if vehicle is None:
+            return None
+        vehicle = VEHICLE_ALIASES.get(vehicle, vehicle)
+        return self.vehicle_codes.get(vehicle, -1)
+
+    def _iter_connections(self, columns, start, vehicles, vehicle_code):
+        """Iterate over the connections from the given position on, as tuples of the connection index and
+        the values of the given columns. The arrays are converted to Python values in chunks, so that the scan
+        stopped early does not pay for the whole timetable.
+
+        :param columns: connection arrays, all in the same order
+        :param start: index of the first connection
+        :param vehicles: vehicle codes of the connections, in the same order as the columns
+        :param vehicle_code: yield only the connections of this vehicle, or all if None
+        """
+        n_conns = len(vehicles)
+        chunk_size = self.SCAN_CHUNK_SIZE
+        for chunk_start in xrange(start, n_conns, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, n_conns)
+            conns = np.arange(chunk_start, chunk_end)
+            if vehicle_code is not None:
+                conns = conns[vehicles[chunk_start:chunk_end] == vehicle_code]
+            for row in izip(conns.tolist(), *[column[conns].tolist() for column in columns]):
+                yield row
+
+    def earliest_arrival(self, sources, targets, departure_time, vehicle=None, max_transfers=None):
+        """Find the journey from any of the source stops to any of the target stops that arrives as soon as possible,
+        departing at the given time or later.
+
+        :param sources: source stop indexes
+        :param targets: target stop indexes
+        :param departure_time: the earliest departure time (seconds from the service day start)
+        :param vehicle: use only the trips of this vehicle type
+        :param max_transfers: the maximal number of transfers; the limit is applied to the earliest arrival labels, \
+                so a journey with less transfers but a later arrival may be missed
+        :return: the list of legs of the journey, or None if no journey has been found
+        :rtype: list[JourneyLeg]
+        """
+        targets = set(targets)
+        if not sources or not targets or targets.intersection(sources):
+            return None
+        max_trips = max_transfers + 1 if max_transfers is not None else None
+        change_times = self.change_times
+        footpaths_from = self.footpaths_from
+
+        # for each reached stop: the earliest time to catch a vehicle there, the journey label and number of trips
+        ready = {}
+        labels = {}
+        trips_used = {}
+        best_time = INFINITY
+        best_label = None
+        trip_enter = {}
+        for stop in sources:
+            ready[stop] = departure_time
+            labels[stop] = None
+            trips_used[stop] = 0
+        for stop in sources:
+            for to_stop, duration in footpaths_from[stop]:
+                walk_time = departure_time + duration
+                if to_stop in targets and walk_time < best_time:
+                    best_time = walk_time
+                    best_label = (None, None, stop, to_stop, duration)
+                if walk_time < ready.get(to_stop, INFINITY):
+                    ready[to_stop] = walk_time
+                    labels[to_stop] = (None, None, stop, to_stop, duration)
+                    trips_used[to_stop] = 0
+
+        start = np.searchsorted(self.dep_dep_time, departure_time, side='left')
+        columns = (self.dep_trip, self.dep_dep_stop, self.dep_arr_stop, self.dep_dep_time, self.dep_arr_time)
+
+        for conn, trip, dep_stop, arr_stop, dep_time, arr_time in self._iter_connections(
+                columns, start, self.dep_vehicle, self._vehicle_code(vehicle)):
+            if dep_time >= best_time:
+                break
+
+            enter = trip_enter.get(trip)
+            if enter is None:
+                if ready.get(dep_stop, INFINITY) > dep_time:
+                    continue
+                if max_trips is not None and trips_used[dep_stop] >= max_trips:
+                    continue
+                trip_enter[trip] = enter = (conn, trips_used[dep_stop] + 1)
+            enter_conn, n_trips = enter
+
+            if arr_stop in targets and arr_time < best_time:
+                best_time = arr_time
+                best_label = (enter_conn, conn, None, None, 0)
+
+            if arr_time + change_times[arr_stop] < ready.get(arr_stop, INFINITY):
+                ready[arr_stop] = arr_time + change_times[arr_stop]
+                labels[arr_stop] = (enter_conn, conn, None, None, 0)
+                trips_used[arr_stop] = n_trips
+
+            for to_stop, duration in footpaths_from[arr_stop]:
+                walk_time = arr_time + duration
+                if to_stop in targets and walk_time < best_time:
+                    best_time = walk_time
+                    best_label = (enter_conn, conn, arr_stop, to_stop, duration)
+                if walk_time < ready.get(to_stop, INFINITY):
+                    ready[to_stop] = walk_time
+                    labels[to_stop] = (enter_conn, conn, arr_stop, to_stop, duration)
+                    trips_used[to_stop] = n_trips
+
+        if best_label is None:
+            return None
+
+        # unwind the journey from the target back to the source
+        legs = []
+        label = best_label
+        while label is not None:
+            enter_conn, exit_conn, walk_from, walk_to, duration = label
+            if walk_from is not None:
+                walk_start = self.dep_arr_time[exit_conn] if exit_conn is not None else departure_time
+                legs.append(JourneyLeg(JourneyLeg.MODE_WALKING, walk_from, walk_to,
+                                       int(walk_start), int(walk_start) + duration))
+            if enter_conn is None:
+                break
+            legs.append(self._transit_leg(self.dep_trip[enter_conn], self.dep_dep_stop[enter_conn],
+                                          self.dep_dep_time[enter_conn], self.dep_arr_stop[exit_conn],
+                                          self.dep_arr_time[exit_conn]))
+            label = labels[self.dep_dep_stop[enter_conn]]
+        legs.reverse()
+
+        return legs
+
+    def latest_departure(self, sources, targets, arrival_time, vehicle=None, max_transfers=None):
+        """Find the journey from any of the source stops to any of the target stops that departs as late as possible,
+        arriving at the given time or sooner.
+
+        The parameters and the return value are the same as for :meth:`earliest_arrival`, with the latest arrival
+        time instead of the earliest departure time.
+
+        :rtype: list[JourneyLeg]
+        """
+        sources = set(sources)
+        if not sources or not targets or sources.intersection(targets):
+            return None
+        max_trips = max_transfers + 1 if max_transfers is not None else None
+        change_times = self.change_times
+        footpaths_to = self.footpaths_to
+
+        # for each stop from which a target is reachable: the latest time of arriving there by a vehicle,
+        # the journey label and the number of trips to the target
+        latest = {}
+        labels = {}
+        trips_used = {}
+        best_time = -INFINITY
+        best_label = None
+        trip_exit = {}
+        for stop in targets:
+            latest[stop] = arrival_time
+            labels[stop] = None
+            trips_used[stop] = 0
+        for stop in targets:
+            for from_stop, duration in footpaths_to[stop]:
+                walk_time = arrival_time - duration
+                if from_stop in sources and walk_time > best_time:
+                    best_time = walk_time
+                    best_label = (None, None, from_stop, stop, duration)
+                if walk_time > latest.get(from_stop, -INFINITY):
+                    latest[from_stop] = walk_time
+                    labels[from_stop] = (None, None, from_stop, stop, duration)
+                    trips_used[from_stop] = 0
+
+        start = np.searchsorted(self.arr_neg_arr_time, -arrival_time, side='left')
+        columns = (self.arr_trip, self.arr_dep_stop, self.arr_arr_stop, self.arr_dep_time, self.arr_neg_arr_time)
+
+        for conn, trip, dep_stop, arr_stop, dep_time, neg_arr_time in self._iter_connections(
+                columns, start, self.arr_vehicle, self._vehicle_code(vehicle)):
+            if -neg_arr_time <= best_time:
+                break
+
+            exit_ = trip_exit.get(trip)
+            if exit_ is None:
+                if latest.get(arr_stop, -INFINITY) < -neg_arr_time:
+                    continue
+                if max_trips is not None and trips_used[arr_stop] >= max_trips:
+                    continue
+                trip_exit[trip] = exit_ = (conn, trips_used[arr_stop] + 1)
+            exit_conn, n_trips = exit_
+
+            if dep_stop in sources and dep_time > best_time:
+                best_time = dep_time
+                best_label = (conn, exit_conn, None, None, 0)
+
+            if dep_time - change_times[dep_stop] > latest.get(dep_stop, -INFINITY):
+                latest[dep_stop] = dep_time - change_times[dep_stop]
+                labels[dep_stop] = (conn, exit_conn, None, None, 0)
+                trips_used[dep_stop] = n_trips
+
+            for from_stop, duration in footpaths_to[dep_stop]:
+                walk_time = dep_time - duration
+                if from_stop in sources and walk_time > best_time:
+                    best_time = walk_time
+                    best_label = (conn, exit_conn, from_stop, dep_stop, duration)
+                if walk_time > latest.get(from_stop, -INFINITY):
+                    latest[from_stop] = walk_time
+                    labels[from_stop] = (conn, exit_conn, from_stop, dep_stop, duration)
+                    trips_used[from_stop] = n_trips
+
+        if best_label is None:
+            return None
+
+        # unwind the journey from the source forward to the target
+        legs = []
+        label = best_label
+        while label is not None:
+            enter_conn, exit_conn, walk_from, walk_to, duration = label
+            if walk_from is not None:
+                walk_end = self.arr_dep_time[enter_conn] if enter_conn is not None else arrival_time
+                legs.append(JourneyLeg(JourneyLeg.MODE_WALKING, walk_from, walk_to,
+                                       int(walk_end) - duration, int(walk_end)))
+            if enter_conn is None:
+                break
+            legs.append(self._transit_leg(self.arr_trip[enter_conn], self.arr_dep_stop[enter_conn],
+                                          self.arr_dep_time[enter_conn], self.arr_arr_stop[exit_conn],
+                                          -self.arr_neg_arr_time[exit_conn]))
+            label = labels[self.arr_arr_stop[exit_conn]]
+
+        return legs
+
+    def _transit_leg(self, trip, dep_stop, dep_time, arr_stop, arr_time):
+        return JourneyLeg(JourneyLeg.MODE_TRANSIT, int(dep_stop), int(arr_stop), int(dep_time), int(arr_time),
+                          int(trip))
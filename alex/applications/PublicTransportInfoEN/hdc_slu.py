@@ -4,13 +4,12 @@
 
 from __future__ import unicode_literals
 
-import copy
 import codecs
 from ast import literal_eval
 from itertools import chain
 
 from alex.components.asr.utterance import Utterance, UtteranceHyp
-from alex.components.slu.base import SLUInterface
+from alex.components.slu.base import NormalisedUtteranceSLU
 from alex.components.slu.da import DialogueActItem, DialogueActConfusionNetwork, DialogueAct
 
 # if there is a change in search parameters from_stop, to_stop, time, then
@@ -223,7 +222,7 @@ class DAIBuilder(object):
         return False
 
 
-class PTIENHDCSLU(SLUInterface):
+class PTIENHDCSLU(NormalisedUtteranceSLU):
 
     def __init__(self, preprocessing, cfg):
         super(PTIENHDCSLU, self).__init__(preprocessing, cfg)
@@ -257,48 +256,35 @@ class PTIENHDCSLU(SLUInterface):
         :param utterance: an Utterance instance
         :return: a list of abstracted utterance, form, value, category label tuples
         """
-        abs_utts = copy.deepcopy(utterance)
+        abs_utts = Utterance(' '.join(utterance))
         category_labels = set()
         abs_utt_lengths = [1] * len(abs_utts)
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-
-                if f in self.cldb.form2value2cl:
-                    entities = self.cldb.form2value2cl[f]
-                    slot_names = [(slot, name) for name in entities for slot in entities[name]]
-                    slots = [slot for slot, _ in slot_names]
-
-                    def replace_slot(abs_utts, slot, slot_names):
-                        name = [n for s, n in slot_names if s == slot].pop()
-                        return abs_utts.replace(f, (slot.upper() + '=' + name,))
-
-                    if 'borough' in slots:
-                        abs_utts = replace_slot(abs_utts, 'borough', slot_names)
-                        category_labels.add('BOROUGH')
-                    elif 'street' in slots:
-                        abs_utts = replace_slot(abs_utts, 'street', slot_names)
-                        category_labels.add('STREET')
-                    elif 'stop' in slots and 'city' in slots:
-                        abs_utts = replace_slot(abs_utts, 'stop', slot_names)
-                        category_labels.add('STOP')
-                    elif 'city' in slots and 'state' in slots:
-                        abs_utts = replace_slot(abs_utts, 'city', slot_names)
-                        category_labels.add('CITY')
-                    else:
-                        slot = slots.pop()
-                        abs_utts = replace_slot(abs_utts, slot, slot_names)
-                        category_labels.add(slot.upper())
-                    abs_utt_lengths[start] = len(f)
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
+        for start, end, f in self.cldb.find_forms(utterance):
+            entities = self.cldb.form2value2cl[f]
+            slot_names = [(slot, name) for name in entities for slot in entities[name]]
+            slots = [slot for slot, _ in slot_names]
+
+            def replace_slot(abs_utts, slot, slot_names):
+                name = [n for s, n in slot_names if s == slot].pop()
+                return abs_utts.replace(f, (slot.upper() + '=' + name,))
+
+            if 'borough' in slots:
+                abs_utts = replace_slot(abs_utts, 'borough', slot_names)
+                category_labels.add('BOROUGH')
+            elif 'street' in slots:
+                abs_utts = replace_slot(abs_utts, 'street', slot_names)
+                category_labels.add('STREET')
+            elif 'stop' in slots and 'city' in slots:
+                abs_utts = replace_slot(abs_utts, 'stop', slot_names)
+                category_labels.add('STOP')
+            elif 'city' in slots and 'state' in slots:
+                abs_utts = replace_slot(abs_utts, 'city', slot_names)
+                category_labels.add('CITY')
             else:
-                start += 1
+                slot = slots.pop()
+                abs_utts = replace_slot(abs_utts, slot, slot_names)
+                category_labels.add(slot.upper())
+            abs_utt_lengths[start] = len(f)
         # normalize abstract utterance lengths
         norm_abs_utt_lengths = []
         i = 0
@@ -1149,30 +1135,28 @@ class PTIENHDCSLU(SLUInterface):
             #     abutterance = abutterance.replace(abutterance[i + 1], 'CITY=' + city_val)
         return abutterance
 
-    def parse_1_best(self, obs, verbose=False, *args, **kwargs):
-        """Parse an utterance into a dialogue act.
+    def parse_utt2da(self, utterance):
+        """Parse an utterance listed in the utt2da dictionary.
 
+        :return: the dialogue act confusion network, or None if the utterance is not in the dictionary
         :rtype DialogueActConfusionNetwork
         """
+        dict_da = self.utt2da.get(unicode(utterance), None)
+        if not dict_da:
+            return None
 
-        utterance = obs['utt']
-
-        if isinstance(utterance, UtteranceHyp):
-            # Parse just the utterance and ignore the confidence score.
-            utterance = utterance.utterance
+        res_cn = DialogueActConfusionNetwork()
+        for dai in DialogueAct(dict_da):
+            res_cn.add(1.0, dai)
+        return res_cn
 
-        if verbose:
-            print 'Parsing utterance "{utt}".'.format(utt=utterance)
+    def parse_normalised(self, utterance, verbose=False):
+        """Parse an already normalised utterance into a dialogue act using the HDC rules.
 
+        :rtype DialogueActConfusionNetwork
+        """
         res_cn = DialogueActConfusionNetwork()
 
-        dict_da = self.utt2da.get(unicode(utterance), None)
-        if dict_da:
-            for dai in DialogueAct(dict_da):
-                res_cn.add(1.0, dai)
-            return res_cn
-
-        utterance = self.preprocessing.normalise_utterance(utterance)
         abutterance, category_labels, abutterance_lenghts = self.abstract_utterance(utterance)
 
         if verbose:
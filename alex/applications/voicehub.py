@@ -15,6 +15,7 @@ from alex.components.hub.slu import SLU
 from alex.components.hub.dm import DM
 from alex.components.hub.nlg import NLG
 from alex.components.hub.tts import TTS
+from alex.components.hub.audiopipe import AudioPipe, SharedMemoryConnection
 from alex.components.hub.messages import Command, DMDA, ASRHyp, TTSText
 from alex.components.hub.calldb import CallDB
 
@@ -49,11 +50,11 @@ class VoiceHub(Hub):
             cfg = self.cfg
 
             vio_commands, vio_child_commands = multiprocessing.Pipe()  # used to send commands to VoipIO
-            vio_record, vio_child_record = multiprocessing.Pipe()      # I read from this connection recorded audio
-            vio_play, vio_child_play = multiprocessing.Pipe()          # I write in audio to be played
+            vio_record, vio_child_record = AudioPipe(cfg)              # I read from this connection recorded audio
+            vio_child_play, vio_play = AudioPipe(cfg)                  # I write in audio to be played
 
             vad_commands, vad_child_commands = multiprocessing.Pipe()   # used to send commands to VAD
-            vad_audio_out, vad_child_audio_out = multiprocessing.Pipe() # used to read output audio from VAD
+            vad_audio_out, vad_child_audio_out = AudioPipe(cfg)         # used to read output audio from VAD
 
             asr_commands, asr_child_commands = multiprocessing.Pipe()          # used to send commands to ASR
             asr_hypotheses_out, asr_child_hypotheses = multiprocessing.Pipe()  # used to read ASR hypotheses
@@ -444,6 +445,9 @@ class VoiceHub(Hub):
                     c.recv()
 
             for c in non_command_connections:
+                # the audio rings in the shared memory must be read only by the child processes
+                if isinstance(c, SharedMemoryConnection):
+                    continue
                 while c.poll():
                     c.recv()
 
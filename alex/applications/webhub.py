@@ -8,6 +8,7 @@ if __name__ == "__main__":
     import autopath
 
 from alex.components.hub import Hub
+from alex.components.hub.audiopipe import AudioPipe, SharedMemoryConnection
 from alex.components.hub.webio import WebIO
 from alex.components.hub.vad import VAD
 from alex.components.hub.asr import ASR
@@ -28,15 +29,15 @@ class WebHub(Hub):
         # used to send commands to VoipIO
         aio_commands, aio_child_commands = multiprocessing.Pipe()
         # I read from this connection recorded audio
-        aio_record, aio_child_record = multiprocessing.Pipe()
+        aio_record, aio_child_record = AudioPipe(self.cfg)
         # I write in audio to be played
-        aio_play, aio_child_play = multiprocessing.Pipe()
+        aio_child_play, aio_play = AudioPipe(self.cfg)
 
         # VAD pipes
         # used to send commands to VAD
         vad_commands, vad_child_commands = multiprocessing.Pipe()
         # used to read output audio from VAD
-        vad_audio_out, vad_child_audio_out = multiprocessing.Pipe()
+        vad_audio_out, vad_child_audio_out = AudioPipe(self.cfg)
 
         # ASR pipes
         # used to send commands to ASR
@@ -180,6 +181,9 @@ class WebHub(Hub):
                 c.recv()
 
         for c in non_command_connections:
+            # the audio rings in the shared memory must be read only by the child processes
+            if isinstance(c, SharedMemoryConnection):
+                continue
             while c.poll():
                 c.recv()
 
@@ -8,12 +8,12 @@ from __future__ import unicode_literals
 import copy
 import re
 from collections import namedtuple
-from itertools import izip, product
+from itertools import islice, izip, product
 from operator import add, itemgetter, mul
 
 from alex.components.slu.exceptions import SLUException
 from alex.corpustools.wavaskey import load_wavaskey, save_wavaskey
-from alex.ml.hypothesis import Hypothesis, NBList
+from alex.ml.hypothesis import Hypothesis, NBList, iter_kbest
 from alex.ml.exceptions import NBListException
 from alex.utils import text
 from alex.utils.text import Escaper
@@ -666,6 +666,12 @@ class UtteranceNBList(ASRHypothesis, NBList):
         """
         return self.add_other()
 
+    def _fact_key(self, utterance):
+        # Utterances are equal if their words are equal.
+        if isinstance(utterance, basestring):
+            return tuple(utterance.split())
+        return tuple(utterance.utterance)
+
     def add_other(self):
         try:
             return NBList.add_other(self, Utterance('_other_'))
@@ -1012,9 +1018,9 @@ class UtteranceConfusionNetwork(ASRHypothesis, Abstracted):
         self._update_wordset()
         return self
 
-    def replace(self, phrase, replacement):
+    def replace(self, phrase, replacement, inplace=False):
         replaced, old_idxs, new_idxs = self._replace(
-            phrase, replacement, keep=False)
+            phrase, replacement, keep=False, inplace=inplace)
         return replaced
 
     def phrase2category_label(self, phrase, catlab):
@@ -1111,7 +1117,7 @@ class UtteranceConfusionNetwork(ASRHypothesis, Abstracted):
     # TODO Test.
     # TODO Implement the option to keep the original value, just adding the
     # replacement by its side.
-    def _replace(self, phrase, replacement, keep=False):
+    def _replace(self, phrase, replacement, keep=False, inplace=False):
         """A private method implementing replacement of phrases.
 
         Arguments:
@@ -1119,6 +1125,8 @@ class UtteranceConfusionNetwork(ASRHypothesis, Abstracted):
             replacement -- what to replace with (a list of words, may be empty)
             keep -- if set to True, the original phrase will be kept in the
                 confnet
+            inplace -- if set to True, this confnet is modified instead of
+                its copy
 
         Returns a tuple:
             replaced -- the confusion network with the replacement done
@@ -1134,7 +1142,7 @@ class UtteranceConfusionNetwork(ASRHypothesis, Abstracted):
         old_idxs = list()
         new_idxs = list()
         idxs = self.get_phrase_idxs(phrase, start=0)
-        if idxs:
+        if idxs and not inplace:
             replaced = copy.deepcopy(self)
         else:
             replaced = self
@@ -1296,19 +1304,6 @@ class UtteranceConfusionNetwork(ASRHypothesis, Abstracted):
         utterance = ' '.join(utterance).strip()
         return (prob, Utterance(utterance))
 
-    # FIXME Make this method aware of _long_links.
-    def get_prob(self, hyp_index):
-        """Returns a probability of the given hypothesis."""
-        return reduce(mul,
-                      (alts[altidx][0]
-                       for (altidx, alts) in izip(hyp_index, self._cn)),
-                      1.)
-        # prob = 1.0
-        # for i, alts in izip(hyp_index, self._cn):
-        #     prob *= alts[i][0]
-        #
-        # return prob
-
     # def get_phrase_prob(self, start, phrase):
         # """Returns the probability of a phrase starting at the index `start'.
         # This method adds probabilities for different ways corresponding to
@@ -1471,34 +1466,24 @@ class UtteranceConfusionNetwork(ASRHypothesis, Abstracted):
 
         return []
 
-    # TODO Test.
-    # TODO Implement the option to keep the original value, just adding the
-    # replacement by its side.
-    def get_next_worse_candidates(self, hyp_index):
-        """
-        Returns such hypotheses that will have lower probability. It assumes
-        that the confusion network is sorted.
-
-        """
-        worse_hyp = []
-
-        for i in range(len(hyp_index)):
-            wh = list(hyp_index)
-            wh[i] += 1
-            if wh[i] >= len(self._cn[i]):
-                # this generate inadmissible word hypothesis
-                continue
-
-            worse_hyp.append(tuple(wh))
-
-        return worse_hyp
-
     def get_hyp_index_utterance(self, hyp_index):
         s = [alts[i][1] for i, alts in zip(hyp_index, self._cn)]
 
         return Utterance(' '.join(s))
 
     # FIXME Make this method aware of _long_links.
+    def iter_utterance_hyps(self):
+        """Lazily generates the hypotheses of the confusion network from the
+        most to the least probable one. It assumes that the confusion network
+        is sorted.
+
+        Yields (probability, utterance) tuples.
+
+        """
+        alternatives = [[p for p, word in alts] for alts in self._cn]
+        for prob, hyp_index in iter_kbest(alternatives):
+            yield (prob, self.get_hyp_index_utterance(hyp_index))
+
     def get_utterance_nblist(self, n=10, prune_prob=0.005):
         """Parses the confusion network and generates n best hypotheses.
 
@@ -1510,47 +1495,13 @@ class UtteranceConfusionNetwork(ASRHypothesis, Abstracted):
 
         """
 
-        open_hyp = []
-        closed_hyp = {}
-
-        # create index for the best hypothesis
-        best_hyp = tuple([0] * len(self._cn))
-        best_prob = self.get_prob(best_hyp)
-        open_hyp.append((best_prob, best_hyp))
-
-        i = 0
-        while open_hyp and i < n:
-            i += 1
-
-            current_prob, current_hyp_index = open_hyp.pop(0)
-
-            if current_hyp_index not in closed_hyp:
-                # process only those hypotheses which were not processed so far
-
-                closed_hyp[current_hyp_index] = current_prob
-
-                # print "current_prob, current_hyp_index:", current_prob,
-                # current_hyp_index
-
-                for hyp_index in self.get_next_worse_candidates(current_hyp_index):
-                    prob = self.get_prob(hyp_index)
-                    open_hyp.append((prob, hyp_index))
-
-                open_hyp.sort(reverse=True)
-
         nblist = UtteranceNBList()
-        for idx in closed_hyp:
-            nblist.add(closed_hyp[idx], self.get_hyp_index_utterance(idx))
-
-        # print nblist
-        # print
+        for prob, utterance in islice(self.iter_utterance_hyps(), n):
+            nblist.add(prob, utterance)
 
         nblist.merge()
         nblist.add_other()
 
-        # print nblist
-        # print
-
         return nblist
 
     # TODO Implement!
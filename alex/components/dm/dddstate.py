@@ -36,6 +36,17 @@ class D3DiscreteValue(DiscreteValue):
     def __getitem__(self, value):
         return self.values[value]
 
+    def copy(self):
+        """Returns a copy of this slot which does not share the probabilities with it."""
+        value = D3DiscreteValue(name=self.name, desc=self.desc)
+        value.values = defaultdict(float, self.values)
+        return value
+
+    def same_as(self, other):
+        """Returns True if the other slot has the same name, description and probabilities as this one."""
+        return isinstance(other, D3DiscreteValue) and self.values == other.values and \
+            self.name == other.name and self.desc == other.desc
+
     def get(self, value, default_prob):
         return self.values.get(value, default_prob)
 
@@ -320,13 +331,38 @@ class DeterministicDiscriminativeDialogueState(DialogueState):
         self._update_state(user_da, system_da)
         self.turn_number += 1
 
-        # store the result
-        self.turns.append([deepcopy(user_da), deepcopy(system_da), deepcopy(self.slots)])
+        # store the result; user_da is a new confusion network built by the context resolution above
+        self.turns.append([user_da, deepcopy(system_da), self._snapshot_slots()])
 
         # print the dialogue state if requested
         if self.debug:
             self.system_logger.debug(unicode(self))
 
+    def _snapshot_slots(self):
+        """Returns a copy of the slots to be stored in the turn history.
+
+        The slots which have not changed since the last stored turn are shared with the previous snapshot; only
+        the changed slots are copied. The snapshots must not be modified.
+
+        :rtype: defaultdict
+        """
+        prev_slots = self.turns[-1][2] if self.turns else {}
+        slots = defaultdict(D3DiscreteValue)
+
+        for name, value in self.slots.iteritems():
+            prev_value = prev_slots.get(name)
+            if isinstance(value, D3DiscreteValue):
+                if value.same_as(prev_value):
+                    slots[name] = prev_value
+                else:
+                    slots[name] = value.copy()
+            elif name in prev_slots and type(value) == type(prev_value) and value == prev_value:
+                slots[name] = prev_value
+            else:
+                slots[name] = deepcopy(value)
+
+        return slots
+
     def _resolve_user_da_in_context(self, user_da, system_da):
         """Resolves and converts meaning of some user dialogue acts
         given the context."""
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import unittest
+
+if __name__ == "__main__":
+    import autopath
+
+import alex.utils
+from alex.components.dm.dddstate import DeterministicDiscriminativeDialogueState
+from alex.components.dm.ontology import Ontology
+from alex.components.slu.da import DialogueAct, DialogueActConfusionNetwork, DialogueActItem
+from alex.utils.config import Config
+
+
+class TestDeterministicDiscriminativeDialogueState(unittest.TestCase):
+    def setUp(self):
+        cfg = Config(config={
+            'DM': {
+                'DeterministicDiscriminativeDialogueState': {
+                    'type': 'UFAL_DSTC_1.0_approx',
+                },
+            },
+            'Logging': {
+                'system_logger': alex.utils.DummyLogger(),
+                'session_logger': alex.utils.DummyLogger()
+            },
+        })
+        ontology = Ontology()
+        ontology.ontology = {
+            'slots': {
+                'from_stop': set(['Anděl', 'Florenc', 'Malostranská']),
+                'to_stop': set(['Anděl', 'Florenc', 'Malostranská']),
+            },
+            'slot_attributes': {
+                'from_stop': [],
+                'to_stop': [],
+            },
+            'context_resolution': {},
+            'last_talked_about': {},
+        }
+        self.state = DeterministicDiscriminativeDialogueState(cfg, ontology)
+
+    def update(self, *dais):
+        user_da = DialogueActConfusionNetwork()
+        for prob, dai in dais:
+            user_da.add(prob, DialogueActItem(dai=dai))
+        self.state.update(user_da, DialogueAct('hello()'))
+
+    def test_turns_share_unchanged_slots(self):
+        self.update((0.9, 'inform(from_stop=Anděl)'))
+        self.update((0.8, 'inform(to_stop=Malostranská)'))
+
+        prev_slots, cur_slots = self.state.turns[-2][2], self.state.turns[-1][2]
+
+        self.assertIs(prev_slots['from_stop'], cur_slots['from_stop'])
+        self.assertIsNot(prev_slots['to_stop'], cur_slots['to_stop'])
+        self.assertEqual(cur_slots['to_stop'].mph(), (0.8, 'Malostranská'))
+        self.assertEqual(self.state.get_changed_slots(0.5).keys(), ['to_stop'])
+
+    def test_turns_are_not_changed_by_later_updates(self):
+        self.update((0.9, 'inform(from_stop=Anděl)'))
+        self.state['from_stop'].set({'Florenc': 1.0})
+        self.update((0.8, 'inform(to_stop=Malostranská)'))
+
+        self.assertEqual(self.state.turns[0][2]['from_stop'].mph(), (0.9, 'Anděl'))
+        self.assertEqual(self.state.turns[1][2]['from_stop'].mph(), (1.0, 'Florenc'))
+        self.assertIsNot(self.state.turns[1][2]['from_stop'], self.state['from_stop'])
+
+
+if __name__ == '__main__':
+    unittest.main()
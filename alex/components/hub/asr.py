@@ -15,6 +15,7 @@ from alex.components.asr.common import asr_factory
 from alex.components.asr.exceptions import ASRException
 from alex.components.asr.utterance import UtteranceNBList, UtteranceConfusionNetwork
 from alex.components.hub.messages import Command, Frame, ASRHyp
+from alex.components.hub.component import ComponentLoop
 from alex.utils.procname import set_proc_name
 
 
@@ -64,6 +65,8 @@ class ASR(multiprocessing.Process):
         self.asr_hypotheses_out = asr_hypotheses_out
         self.close_event = close_event
 
+        self.main_loop = ComponentLoop('ASR', cfg, [self.commands, self.audio_in])
+
         # Load the ASR
         self.asr = asr_factory(cfg)
 
@@ -80,10 +83,12 @@ class ASR(multiprocessing.Process):
 
         while self.commands.poll():
             command = self.commands.recv()
+            self.main_loop.record_latency(command)
             self.local_commands.append(command)
 
         while self.audio_in.poll():
             frame = self.audio_in.recv()
+            self.main_loop.record_latency(frame)
             self.local_audio_in.append(frame)
 
     def process_pending_commands(self):
@@ -239,9 +244,11 @@ class ASR(multiprocessing.Process):
                 # Check the close event.
                 if self.close_event.is_set():
                     print 'Received close event in: %s' % multiprocessing.current_process().name
+                    print self.main_loop
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # wait for the commands or audio unless there are frames left to process
+                self.main_loop.wait(busy=bool(self.local_audio_in))
 
                 s = (time.time(), time.clock())
 
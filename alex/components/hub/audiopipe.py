@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# This code is PEP8-compliant. See http://www.python.org/dev/peps/pep-0008.
+
+import ctypes
+import errno
+import fcntl
+import multiprocessing
+import os
+import struct
+import time
+import cPickle as pickle
+
+from datetime import datetime
+
+from alex.components.hub.exceptions import AudioPipeException
+from alex.components.hub.messages import Frame
+
+# the header of a record: the length of the data, the sequence number, the time stamp, and the kind of the record
+HEADER = struct.Struct('<IIdB')
+
+FRAME = 0
+MESSAGE = 1
+
+
+class SharedMemoryPipe(object):
+    """
+    A one way channel for the audio data between two hub processes.
+
+    The records are stored in a ring buffer in the shared memory. Each record has a compact header with
+    a sequence number, a time stamp and the kind of the record. The audio frames are stored as raw PCM data;
+    other messages, e.g. the speech_start() and speech_end() commands marking the audio stream, are pickled into
+    the ring so that they keep their order relative to the audio. The ring has only one writer and one reader,
+    so it does not need any lock: the writer only moves the write position and the reader only moves the read
+    position.
+
+    When the ring is full, the records which do not fit are dropped and counted in dropped.
+
+    The reader is woken up by a byte written into an OS pipe for each record. The read end of this pipe is
+    returned by fileno() so that the reader can wait for the data in select() as for a multiprocessing.Pipe
+    connection.
+
+    The pipe must be created before the processes are forked.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.buffer = multiprocessing.RawArray(ctypes.c_char, size)
+        # the positions are not wrapped, the records are at the positions modulo the size
+        self.write_pos = multiprocessing.RawValue(ctypes.c_ulonglong, 0)
+        self.read_pos = multiprocessing.RawValue(ctypes.c_ulonglong, 0)
+        # the number of the records dropped because the ring was full
+        self.dropped = multiprocessing.RawValue(ctypes.c_ulonglong, 0)
+
+        self.signal_in, self.signal_out = os.pipe()
+        for fd in (self.signal_in, self.signal_out):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+        # the sequence number of the next record, used only by the writer
+        self.seq = 0
+
+    def _put(self, pos, data):
+        pos %= self.size
+        n = min(len(data), self.size - pos)
+        self.buffer[pos:pos + n] = data[:n]
+        if n < len(data):
+            self.buffer[:len(data) - n] = data[n:]
+
+    def _get(self, pos, length):
+        pos %= self.size
+        n = min(length, self.size - pos)
+        data = self.buffer[pos:pos + n]
+        if n < length:
+            data += self.buffer[:length - n]
+        return data
+
+    def write(self, data, kind, timeout=0.0):
+        """Append a record to the ring.
+
+        If the ring is full, it waits until the reader frees enough space. If it does not happen within timeout
+        seconds, the record is dropped, counted, and False is returned. By default, it does not wait at all.
+        """
+        record_size = HEADER.size + len(data)
+        if record_size > self.size:
+            raise ValueError("The record of %d bytes does not fit into the audio ring of %d bytes" %
+                             (record_size, self.size))
+
+        start = time.time()
+        while self.write_pos.value + record_size - self.read_pos.value > self.size:
+            if time.time() - start >= timeout:
+                self.dropped.value += 1
+                return False
+            time.sleep(0.001)
+
+        pos = self.write_pos.value
+        self._put(pos, HEADER.pack(len(data), self.seq, time.time(), kind) + data)
+        self.seq = (self.seq + 1) % 2 ** 32
+        # publish the record only after it is completely written
+        self.write_pos.value = pos + record_size
+
+        try:
+            os.write(self.signal_out, b'\x00')
+        except OSError as e:
+            # the reader is far behind, it will find the records anyway
+            if e.errno != errno.EAGAIN:
+                raise
+
+        return True
+
+    def poll(self):
+        """Return True if there is a record to be read."""
+        if self.read_pos.value < self.write_pos.value:
+            return True
+
+        # clear the wake up signals so that select() does not return before a new record is written
+        try:
+            while os.read(self.signal_in, 4096):
+                pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+
+        return self.read_pos.value < self.write_pos.value
+
+    def read(self):
+        """Remove the oldest record from the ring and return its data, sequence number, time stamp and kind."""
+        pos = self.read_pos.value
+        if pos >= self.write_pos.value:
+            raise EOFError("The audio ring is empty")
+
+        length, seq, timestamp, kind = HEADER.unpack(self._get(pos, HEADER.size))
+        data = self._get(pos + HEADER.size, length)
+        self.read_pos.value = pos + HEADER.size + length
+
+        return data, seq, timestamp, kind
+
+
+class SharedMemoryConnection(object):
+    """
+    One end of a SharedMemoryPipe. It has the same interface as the multiprocessing.Pipe connections used for
+    the audio, so that the components do not need to know which of them they use.
+
+    The received frames are numbered by the sequence number of the pipe and their time is the time when they
+    were sent.
+
+    Sending never blocks the real-time loop of the writer on a frame: if the ring is full, the frame is dropped
+    and the drops are logged. Other messages, e.g. speech_start() and speech_end(), must not be lost, so sending
+    them waits up to message_timeout seconds for the reader and raises AudioPipeException if the ring is still
+    full.
+    """
+
+    # log every n-th dropped frame
+    log_dropped_every = 100
+
+    def __init__(self, pipe, writable, logger=None, message_timeout=1.0):
+        self.pipe = pipe
+        self.writable = writable
+        self.logger = logger
+        self.message_timeout = message_timeout
+
+    def send(self, obj):
+        if not self.writable:
+            raise IOError("The connection is read only")
+
+        if isinstance(obj, Frame):
+            if not self.pipe.write(str(obj.payload), FRAME):
+                dropped = self.pipe.dropped.value
+                if self.logger and (dropped == 1 or dropped % self.log_dropped_every == 0):
+                    self.logger.warning("The audio ring is full, %d records were dropped so far." % dropped)
+        else:
+            if not self.pipe.write(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL), MESSAGE, self.message_timeout):
+                raise AudioPipeException("The audio ring is full, the message could not be sent: %s" % (obj, ))
+
+    def recv(self):
+        if self.writable:
+            raise IOError("The connection is write only")
+
+        data, seq, timestamp, kind = self.pipe.read()
+
+        if kind == MESSAGE:
+            return pickle.loads(data)
+
+        # avoid the constructor, the frame gets the header of the record
+        frame = Frame.__new__(Frame)
+        frame.id = seq
+        frame.time = datetime.fromtimestamp(timestamp)
+        frame.source = None
+        frame.target = None
+        frame.payload = data
+        return frame
+
+    def poll(self):
+        if self.writable:
+            return False
+
+        return self.pipe.poll()
+
+    def fileno(self):
+        if self.writable:
+            return self.pipe.signal_out
+
+        return self.pipe.signal_in
+
+
+def AudioPipe(cfg):
+    """
+    Create a one way connection for the audio data.
+
+    Depending on cfg['Hub']['audio_pipe']['type'], it uses a multiprocessing.Pipe ('pipe') or a SharedMemoryPipe
+    ('shm') of cfg['Hub']['audio_pipe']['size'] bytes. The frames which do not fit into a full ring are dropped,
+    the other messages wait up to cfg['Hub']['audio_pipe']['message_timeout'] seconds for the reader.
+
+    Returns a pair of connections: the first end is for reading and the second end is for writing.
+    """
+    audio_pipe_cfg = cfg['Hub'].get('audio_pipe', {'type': 'pipe'})
+
+    if audio_pipe_cfg['type'] == 'shm':
+        pipe = SharedMemoryPipe(audio_pipe_cfg['size'])
+        logger = cfg.get('Logging', {}).get('system_logger')
+        return SharedMemoryConnection(pipe, False), \
+            SharedMemoryConnection(pipe, True, logger, audio_pipe_cfg.get('message_timeout', 1.0))
+
+    return multiprocessing.Pipe()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# This code is PEP8-compliant. See http://www.python.org/dev/peps/pep-0008.
+
+import select
+
+from datetime import datetime
+
+from alex.components.hub.messages import Message
+
+
+class ComponentLoop(object):
+    """
+    Event driven main loop of a hub component process.
+
+    Instead of sleeping for a fixed time and then polling all its input
+    connections, the component blocks in wait() until one of the connections
+    is readable. Therefore, a message is processed immediately after it
+    arrives and the process does not use the CPU while idle.
+
+    The close event cannot be waited for together with the connections;
+    it is checked at least every cfg['Hub']['main_loop_wait_time'] seconds.
+
+    For each received message, the loop records its queueing latency, i.e.
+    the time since the message was created by the sending component.
+    """
+
+    def __init__(self, name, cfg, connections, timeout=None):
+        """
+        Arguments:
+            name: the name of the component used in the reports
+            cfg: a Config object specifying the configuration to use
+            connections: a list of connections (multiprocessing.Pipe ends)
+                to wait for
+            timeout: the maximal time to wait in seconds, the default is
+                cfg['Hub']['main_loop_wait_time']. Components which must
+                be woken periodically, e.g. to play audio, use a shorter time.
+
+        """
+        self.name = name
+        self.cfg = cfg
+        self.connections = connections
+        if timeout is None:
+            timeout = cfg['Hub']['main_loop_wait_time']
+        self.timeout = timeout
+
+        self.n_messages = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def wait(self, busy=False):
+        """
+        Wait until one of the connections is readable or the timeout expires.
+
+        Arguments:
+            busy: if True, the component has local work to do and the call
+                does not block
+
+        Returns the list of the readable connections.
+        """
+        if busy:
+            timeout = 0.0
+        else:
+            timeout = self.timeout
+
+        readable, _, _ = select.select(self.connections, [], [], timeout)
+
+        return readable
+
+    def record_latency(self, message):
+        """Record the queueing latency of a received message."""
+        if not isinstance(message, Message):
+            return
+
+        latency = (datetime.now() - message.time).total_seconds()
+
+        self.n_messages += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+        if latency > self.cfg['Hub']['latency_report_threshold']:
+            print "QUEUE latency: {name} t = {t:0.4f} message: {m}\n".format(name=self.name, t=latency, m=message)
+
+    def get_latency_stats(self):
+        """Return the number of received messages, their mean and maximal queueing latency."""
+        mean_latency = self.total_latency / self.n_messages if self.n_messages else 0.0
+
+        return self.n_messages, mean_latency, self.max_latency
+
+    def __str__(self):
+        return "QUEUE latency: {name} messages = {n} mean t = {mean:0.4f} max t = {max:0.4f}".format(
+            name=self.name, n=self.n_messages, mean=self.get_latency_stats()[1], max=self.max_latency)
@@ -4,7 +4,6 @@
 from __future__ import unicode_literals
 
 import multiprocessing
-import select
 import time
 import random
 import urllib2
@@ -13,6 +12,7 @@ from collections import deque
 
 from alex.components.slu.da import DialogueAct, DialogueActItem, DialogueActConfusionNetwork
 from alex.components.hub.messages import Command, SLUHyp, DMDA
+from alex.components.hub.component import ComponentLoop
 from alex.components.dm.common import dm_factory, get_dm_type
 from alex.components.dm.exceptions import DMException
 from alex.utils.procname import set_proc_name
@@ -40,6 +40,8 @@ class DM(multiprocessing.Process):
         self.last_user_diff_time = time.time()
         self.epilogue_state = None
 
+        self.main_loop = ComponentLoop('DM', cfg, [self.commands, self.slu_hypotheses_in])
+
         dm_type = get_dm_type(cfg)
         self.dm = dm_factory(dm_type, cfg)
         self.dm.new_dialogue()
@@ -63,6 +65,7 @@ class DM(multiprocessing.Process):
 
         while self.commands.poll():
             command = self.commands.recv()
+            self.main_loop.record_latency(command)
 
             if self.cfg['DM']['debug']:
                 self.cfg['Logging']['system_logger'].debug(command)
@@ -221,6 +224,7 @@ class DM(multiprocessing.Process):
         if self.slu_hypotheses_in.poll():
             # read SLU hypothesis
             data_slu = self.slu_hypotheses_in.recv()
+            self.main_loop.record_latency(data_slu)
 
             if self.epilogue_state:
                 # we have got another turn, now we can hang up.
@@ -280,9 +284,11 @@ class DM(multiprocessing.Process):
                 # Check the close event.
                 if self.close_event.is_set():
                     print 'Received close event in: %s' % multiprocessing.current_process().name
+                    print self.main_loop
                     return
 
-                select.select([self.commands, self.slu_hypotheses_in], [], [], 1)
+                # wait for the commands or SLU hypotheses
+                self.main_loop.wait()
 
                 s = (time.time(), time.clock())
 
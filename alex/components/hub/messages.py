@@ -9,7 +9,7 @@ import time
 from datetime import datetime
 
 from alex.utils.text import parse_command
-from alex.utils.mproc import InstanceID
+from alex.utils.mproc import InstanceID, ProcessInstanceID
 
 # TODO: add comments
 
@@ -90,7 +90,11 @@ class TTSText(Message):
             return "#%-6d Time: %s From: %-10s To: %-10s Text: %s " % (self.id, self.get_time_str(), self.source, self.target, self.text)
 
 
-class Frame(Message):
+class Frame(ProcessInstanceID, Message):
+    """ A frame of audio data. The frames are numbered in each process separately, so that creating them does not
+    need the global lock.
+    """
+
     def __init__(self, payload, source=None, target=None):
         Message.__init__(self, source, target)
 
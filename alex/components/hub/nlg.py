@@ -7,6 +7,7 @@ import time
 from alex.components.nlg.common import nlg_factory, get_nlg_type
 
 from alex.components.hub.messages import Command, DMDA, TTSText
+from alex.components.hub.component import ComponentLoop
 from alex.components.dm.exceptions import DMException
 
 from alex.utils.procname import set_proc_name
@@ -29,6 +30,8 @@ class NLG(multiprocessing.Process):
         self.text_out = text_out
         self.close_event = close_event
 
+        self.main_loop = ComponentLoop('NLG', cfg, [self.commands, self.dialogue_act_in])
+
         nlg_type = get_nlg_type(cfg)
         self.nlg = nlg_factory(nlg_type, cfg)
 
@@ -78,6 +81,7 @@ class NLG(multiprocessing.Process):
 
         while self.commands.poll():
             command = self.commands.recv()
+            self.main_loop.record_latency(command)
             if self.cfg['NLG']['debug']:
                 self.cfg['Logging']['system_logger'].debug(command)
 
@@ -104,6 +108,7 @@ class NLG(multiprocessing.Process):
     def read_dialogue_act_write_text(self):
         if self.dialogue_act_in.poll():
             data_da = self.dialogue_act_in.recv()
+            self.main_loop.record_latency(data_da)
 
             if isinstance(data_da, DMDA):
                 self.process_da(data_da.da)
@@ -121,9 +126,11 @@ class NLG(multiprocessing.Process):
                 # Check the close event.
                 if self.close_event.is_set():
                     print 'Received close event in: %s' % multiprocessing.current_process().name
+                    print self.main_loop
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # wait for the commands or dialogue acts
+                self.main_loop.wait()
 
                 s = (time.time(), time.clock())
 
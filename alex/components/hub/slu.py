@@ -7,6 +7,7 @@ import time
 
 from alex.components.slu.da import DialogueActNBList, DialogueActConfusionNetwork
 from alex.components.hub.messages import Command, ASRHyp, SLUHyp
+from alex.components.hub.component import ComponentLoop
 from alex.components.slu.common import slu_factory
 from alex.components.slu.exceptions import SLUException
 from alex.utils.procname import set_proc_name
@@ -50,6 +51,8 @@ class SLU(multiprocessing.Process):
         self.slu_hypotheses_out = slu_hypotheses_out
         self.close_event = close_event
 
+        self.main_loop = ComponentLoop('SLU', cfg, [self.commands, self.asr_hypotheses_in])
+
         # Load the SLU.
         self.slu = slu_factory(cfg)
 
@@ -67,6 +70,7 @@ class SLU(multiprocessing.Process):
 
         while self.commands.poll():
             command = self.commands.recv()
+            self.main_loop.record_latency(command)
             if self.cfg['NLG']['debug']:
                 self.cfg['Logging']['system_logger'].debug(command)
 
@@ -91,6 +95,7 @@ class SLU(multiprocessing.Process):
     def read_asr_hypotheses_write_slu_hypotheses(self):
         if self.asr_hypotheses_in.poll():
             data_asr = self.asr_hypotheses_in.recv()
+            self.main_loop.record_latency(data_asr)
 
             if isinstance(data_asr, ASRHyp):
                 slu_hyp = self.slu.parse(data_asr.hyp)
@@ -138,9 +143,11 @@ class SLU(multiprocessing.Process):
                 # Check the close event.
                 if self.close_event.is_set():
                     print 'Received close event in: %s' % multiprocessing.current_process().name
+                    print self.main_loop
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # wait for the commands or ASR hypotheses
+                self.main_loop.wait()
 
                 s = (time.time(), time.clock())
 
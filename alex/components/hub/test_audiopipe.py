@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import select
+import unittest
+
+from alex.components.hub.audiopipe import AudioPipe, SharedMemoryConnection, SharedMemoryPipe
+from alex.components.hub.exceptions import AudioPipeException
+from alex.components.hub.messages import Command, Frame
+
+
+def send_frames(conn, n):
+    conn.send(Command('speech_start(fname="test.wav")', 'VAD', 'AudioIn'))
+    for i in range(n):
+        conn.send(Frame(chr(i % 256) * 320))
+    conn.send(Command('speech_end(fname="test.wav")', 'VAD', 'AudioIn'))
+
+
+class TestSharedMemoryPipe(unittest.TestCase):
+    def setUp(self):
+        self.cfg = {
+            'Hub': {
+                'audio_pipe': {
+                    'type': 'shm',
+                    'size': 4096,
+                },
+            },
+        }
+
+    def receive(self, conn):
+        received = []
+        while conn.poll():
+            received.append(conn.recv())
+        return received
+
+    def test_order(self):
+        audio_in, audio_out = AudioPipe(self.cfg)
+        self.assertFalse(audio_in.poll())
+
+        send_frames(audio_out, 5)
+        received = self.receive(audio_in)
+
+        self.assertEqual([type(data) for data in received], [Command] + [Frame] * 5 + [Command])
+        self.assertEqual(received[0].parsed['__name__'], 'speech_start')
+        self.assertEqual(received[-1].parsed['__name__'], 'speech_end')
+        self.assertEqual([frame.payload for frame in received[1:-1]], [chr(i) * 320 for i in range(5)])
+        self.assertEqual([frame.id for frame in received[1:-1]], range(1, 6))
+
+    def test_wrap_around(self):
+        audio_in, audio_out = AudioPipe(self.cfg)
+
+        # the ring holds only a few frames, the records wrap around its end many times
+        for i in range(100):
+            audio_out.send(Frame(chr(i) * 1000))
+            self.assertEqual(audio_in.recv().payload, chr(i) * 1000)
+
+        self.assertFalse(audio_in.poll())
+
+    def test_full(self):
+        pipe = SharedMemoryPipe(4096)
+        self.assertTrue(pipe.write('a' * 3000, 0))
+        self.assertFalse(pipe.write('b' * 3000, 0))
+        self.assertFalse(pipe.write('b' * 3000, 0, timeout=0.01))
+        self.assertEqual(pipe.dropped.value, 2)
+        self.assertRaises(ValueError, pipe.write, 'c' * 5000, 0)
+
+    def test_full_connection(self):
+        warnings = []
+
+        class Logger(object):
+            def warning(self, message):
+                warnings.append(message)
+
+        pipe = SharedMemoryPipe(4096)
+        audio_in = SharedMemoryConnection(pipe, False)
+        audio_out = SharedMemoryConnection(pipe, True, Logger(), message_timeout=0.01)
+
+        # the frames which do not fit are dropped without waiting, the first drop is logged
+        for i in range(20):
+            audio_out.send(Frame(chr(i) * 1000))
+        self.assertEqual(pipe.dropped.value, 16)
+        self.assertEqual(len(warnings), 1)
+
+        # a message is never dropped silently
+        self.assertRaises(AudioPipeException, audio_out.send, Command('speech_end()', 'VAD', 'AudioIn'))
+
+        audio_in.recv()
+        audio_out.send(Command('speech_end()', 'VAD', 'AudioIn'))
+        received = [audio_in.recv() for i in range(4)]
+        self.assertEqual([frame.payload for frame in received[:3]], [chr(i) * 1000 for i in range(1, 4)])
+        self.assertEqual(received[3].parsed['__name__'], 'speech_end')
+
+    def test_select(self):
+        audio_in, audio_out = AudioPipe(self.cfg)
+        self.assertEqual(select.select([audio_in], [], [], 0.0)[0], [])
+
+        audio_out.send(Frame('a' * 320))
+        self.assertEqual(select.select([audio_in], [], [], 1.0)[0], [audio_in])
+
+        audio_in.recv()
+        # polling an empty ring clears the wake up signal
+        self.assertFalse(audio_in.poll())
+        self.assertEqual(select.select([audio_in], [], [], 0.0)[0], [])
+
+    def test_processes(self):
+        # the frames are not dropped if the ring is big enough
+        self.cfg['Hub']['audio_pipe']['size'] = 200 * 400
+        audio_in, audio_out = AudioPipe(self.cfg)
+
+        p = multiprocessing.Process(target=send_frames, args=(audio_out, 200))
+        p.start()
+
+        received = []
+        while len(received) < 202 and select.select([audio_in], [], [], 5.0)[0]:
+            received.extend(self.receive(audio_in))
+        p.join()
+
+        self.assertEqual(len([data for data in received if isinstance(data, Frame)]), 200)
+        self.assertEqual(received[-1].parsed['__name__'], 'speech_end')
+
+    def test_pipe(self):
+        self.cfg['Hub']['audio_pipe']['type'] = 'pipe'
+        audio_in, audio_out = AudioPipe(self.cfg)
+        self.assertNotIsInstance(audio_in, SharedMemoryConnection)
+
+        send_frames(audio_out, 5)
+        self.assertEqual(len(self.receive(audio_in)), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
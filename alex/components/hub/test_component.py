@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import threading
+import time
+import unittest
+
+from alex.components.hub.component import ComponentLoop
+from alex.components.hub.messages import Command
+
+
+class TestComponentLoop(unittest.TestCase):
+    def setUp(self):
+        self.cfg = {
+            'Hub': {
+                'main_loop_wait_time': 5.0,
+                'latency_report_threshold': 5.0,
+            }
+        }
+        self.commands, self.commands_hub = multiprocessing.Pipe()
+        self.data_in, self.data_out = multiprocessing.Pipe()
+        self.main_loop = ComponentLoop('TEST', self.cfg, [self.commands, self.data_in])
+
+    def test_wait_timeout(self):
+        main_loop = ComponentLoop('TEST', self.cfg, [self.commands, self.data_in], timeout=0.01)
+        self.assertEqual(main_loop.wait(), [])
+        self.assertEqual(self.main_loop.wait(busy=True), [])
+
+    def test_wait_wakes_on_input(self):
+        timer = threading.Timer(0.05, self.data_out.send, [Command('test()', 'HUB', 'TEST')])
+        timer.start()
+
+        start = time.time()
+        self.assertEqual(self.main_loop.wait(), [self.data_in])
+        self.assertLess(time.time() - start, 1.0)
+        timer.join()
+
+        self.commands_hub.send(Command('stop()', 'HUB', 'TEST'))
+        self.assertEqual(set(self.main_loop.wait()), set([self.commands, self.data_in]))
+
+    def test_record_latency(self):
+        self.data_out.send(Command('test()', 'HUB', 'TEST'))
+        time.sleep(0.02)
+        self.main_loop.record_latency(self.data_in.recv())
+        # only messages have a time stamp
+        self.main_loop.record_latency('data')
+
+        n_messages, mean_latency, max_latency = self.main_loop.get_latency_stats()
+        self.assertEqual(n_messages, 1)
+        self.assertGreaterEqual(mean_latency, 0.02)
+        self.assertEqual(mean_latency, max_latency)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import struct
+import threading
+import time
+import unittest
+
+from alex.components.hub.messages import Command, Frame
+from alex.components.hub.tts import TTS
+from alex.components.tts import TTSInterface
+from alex.components.tts.presynthesis import PromptCache
+
+
+class Logger(object):
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class SlowTTS(TTSInterface):
+    """Synthesizes each segment as a constant signal, the first segments take the longest time."""
+    def synthesize(self, text):
+        time.sleep(0.3 / len(text))
+        return '\x00' * 4 + struct.pack('h', len(text)) * 100 + '\x00' * 6
+
+
+class SerialTTS(SlowTTS):
+    """Records the maximal number of the concurrent calls of synthesize."""
+    def __init__(self, cfg):
+        super(SerialTTS, self).__init__(cfg)
+        self.lock = threading.Lock()
+        self.n_calls = self.max_calls = 0
+
+    def synthesize(self, text):
+        with self.lock:
+            self.n_calls += 1
+            self.max_calls = max(self.max_calls, self.n_calls)
+        try:
+            return super(SerialTTS, self).synthesize(text)
+        finally:
+            with self.lock:
+                self.n_calls -= 1
+
+
+class TestTTS(unittest.TestCase):
+    def setUp(self):
+        self.cfg = {
+            'Logging': {
+                'system_logger': Logger(),
+                'session_logger': Logger(),
+            },
+            'Hub': {
+                'main_loop_wait_time': 0.5,
+                'latency_report_threshold': 5.0,
+            },
+            'Audio': {
+                'sample_rate': 16000,
+                'samples_per_frame': 80,
+            },
+            'TTS': {
+                'debug': False,
+                'type': SlowTTS,
+                'in_between_segments_silence': 0.001,
+                'parallel_segments': 4,
+                'presynthesis': {
+                    'enabled': False,
+                    'templates': False,
+                    'n_speculative': 1,
+                    'max_size': 1024 * 1024,
+                },
+            },
+        }
+
+    def synthesize(self, text, tts=None):
+        commands, commands_hub = multiprocessing.Pipe()
+        text_in, text_in_hub = multiprocessing.Pipe()
+        audio_out, audio_out_hub = multiprocessing.Pipe()
+        if tts is None:
+            tts = TTS(self.cfg, commands, text_in, audio_out, multiprocessing.Event())
+        else:
+            tts.commands, tts.audio_out = commands, audio_out
+
+        tts.synthesize(None, text)
+
+        output = []
+        while audio_out_hub.poll():
+            output.append(audio_out_hub.recv())
+        return output
+
+    def test_remove_start_and_final_silence(self):
+        tts = TTS(self.cfg, None, None, None, None)
+
+        self.assertEqual(tts.remove_start_and_final_silence(''), '')
+        self.assertEqual(tts.remove_start_and_final_silence('\x00' * 10), '')
+        # the samples are aligned and the last sample is always removed
+        self.assertEqual(tts.remove_start_and_final_silence('\x00\x00\x01\x00\x02\x00\x03\x00\x00\x00'), '\x01\x00\x02\x00')
+        self.assertEqual(tts.remove_start_and_final_silence('\x00\x01\x00\x02\x00\x00'), '\x00\x01')
+
+    def test_segments_in_order(self):
+        text = 'A. Bb. Ccc. Dddd.'
+        start = time.time()
+        parallel = self.synthesize(text)
+        parallel_time = time.time() - start
+
+        self.cfg['TTS']['parallel_segments'] = 1
+        start = time.time()
+        sequential = self.synthesize(text)
+        sequential_time = time.time() - start
+
+        self.assertEqual(parallel[0].parsed['__name__'], 'utterance_start')
+        self.assertEqual(parallel[-1].parsed['__name__'], 'utterance_end')
+        self.assertEqual([f.payload for f in parallel if isinstance(f, Frame)],
+                         [f.payload for f in sequential if isinstance(f, Frame)])
+        self.assertLess(parallel_time, sequential_time)
+
+    def test_prompt_cache(self):
+        self.cfg['TTS']['presynthesis']['enabled'] = True
+        tts = TTS(self.cfg, None, None, None, None)
+
+        first = self.synthesize('Aa. Bb.', tts)
+        start = time.time()
+        second = self.synthesize('Aa. Bb.', tts)
+        self.assertLess(time.time() - start, 0.1)
+
+        self.assertEqual([f.payload for f in first if isinstance(f, Frame)],
+                         [f.payload for f in second if isinstance(f, Frame)])
+        stats = tts.prompt_cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+        self.assertGreater(stats['saved_time'], 0.0)
+
+    def test_speculative_presynthesis(self):
+        self.cfg['TTS']['presynthesis']['enabled'] = True
+        tts = TTS(self.cfg, None, None, None, None)
+        tts.start_presynthesis()
+
+        self.synthesize('A.', tts)
+        self.synthesize('Bb.', tts)
+        tts.prompt_cache = PromptCache(1024 * 1024)
+        # after 'A.' the prompt 'Bb.' is expected, it is synthesized in advance
+        self.synthesize('A.', tts)
+
+        start = time.time()
+        while ('Bb.', True) not in tts.prompt_cache and time.time() - start < 5.0:
+            time.sleep(0.01)
+        self.assertIn(('Bb.', True), tts.prompt_cache)
+
+    def test_presynthesis_serial_engine(self):
+        self.cfg['TTS']['type'] = SerialTTS
+        self.cfg['TTS']['parallel_segments'] = 1
+        self.cfg['TTS']['presynthesis']['enabled'] = True
+        tts = TTS(self.cfg, None, None, None, None)
+        for prompt in ['Aa. Bb.', 'Cc. Dd.', 'Ee. Ff.']:
+            tts.presynthesis_queue.put((1, prompt))
+        tts.start_presynthesis()
+
+        self.synthesize('G. Hh. Iii.', tts)
+        while not tts.presynthesis_queue.empty():
+            time.sleep(0.01)
+
+        # the presynthesis thread never calls the engine together with the main synthesis
+        self.assertEqual(tts.tts.max_calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
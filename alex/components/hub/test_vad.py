@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import struct
+import unittest
+
+from alex.components.hub.messages import Frame
+from alex.components.hub.vad import VAD
+
+
+class Logger(object):
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class RecordingVAD(object):
+    """Records the resets and the sizes of the batches and classifies all frames as silence."""
+    def __init__(self):
+        self.calls = []
+
+    def reset(self):
+        self.calls.append('reset')
+
+    def decide_batch(self, frames):
+        self.calls.append(len(frames))
+        return [0.0] * len(frames)
+
+
+class TestVAD(unittest.TestCase):
+    def setUp(self):
+        self.cfg = {
+            'Logging': {
+                'system_logger': Logger(),
+                'session_logger': Logger(),
+            },
+            'Hub': {
+                'main_loop_wait_time': 0.5,
+                'latency_report_threshold': 5.0,
+            },
+            'VAD': {
+                'debug': False,
+                'type': 'power',
+                'speech_buffer_frames': 5,
+                'decision_frames_speech': 3,
+                'decision_frames_sil': 5,
+                'decision_speech_threshold': 0.7,
+                'decision_non_speech_threshold': 0.1,
+                'overload': {
+                    'max_queued_frames': 10,
+                    'policy': 'power',
+                },
+                'power': {
+                    'threshold': 70,
+                    'threshold_multiplier': 1.0,
+                    'adaptation_frames': 30,
+                },
+            },
+        }
+
+    def create_vad(self):
+        # keep the other ends of the pipes open
+        commands, self.commands = multiprocessing.Pipe()
+        audio_in, self.audio_in = multiprocessing.Pipe()
+        self.audio_out, audio_out = multiprocessing.Pipe()
+        return VAD(self.cfg, commands, audio_in, audio_out, multiprocessing.Event())
+
+    def queue_frames(self, vad):
+        silence = struct.pack('256h', *([0] * 256))
+        speech = struct.pack('256h', *([10000, -10000] * 128))
+        for i in range(30):
+            vad.local_audio_in.append(Frame(silence))
+        for i in range(30):
+            vad.local_audio_in.append(Frame(speech))
+
+    def read_output(self):
+        output = []
+        while self.audio_out.poll():
+            output.append(self.audio_out.recv())
+        return output
+
+    def test_process_all_frames(self):
+        vad = self.create_vad()
+        self.queue_frames(vad)
+        vad.read_write_audio()
+
+        self.assertEqual(len(vad.local_audio_in), 0)
+        stats = vad.get_queue_stats()
+        self.assertEqual(stats['queue_depth'], 60)
+        self.assertEqual(stats['max_queue_depth'], 60)
+        self.assertEqual(stats['n_overloads'], 1)
+
+        output = self.read_output()
+        frames = [data for data in output if isinstance(data, Frame)]
+        self.assertEqual(output[0].parsed['__name__'], 'speech_start')
+        # the speech frames and the frames buffered before the speech was detected
+        self.assertGreaterEqual(len(frames), 30)
+
+    def test_overload_drop(self):
+        self.cfg['VAD']['overload']['policy'] = 'drop'
+        vad = self.create_vad()
+        vad.vad = RecordingVAD()
+        self.queue_frames(vad)
+        vad.read_write_audio()
+
+        frames = [data for data in self.read_output() if isinstance(data, Frame)]
+        self.assertLessEqual(len(frames), 10)
+        self.assertEqual(vad.get_queue_stats()['n_overloads'], 1)
+        # the kept frames do not continue the audio processed before
+        self.assertEqual(vad.vad.calls, ['reset', 10])
+
+    def test_overload_power_reset(self):
+        vad = self.create_vad()
+        vad.vad = RecordingVAD()
+        self.queue_frames(vad)
+        vad.read_write_audio()
+        self.assertEqual(vad.vad.calls, [])
+
+        for i in range(5):
+            vad.local_audio_in.append(Frame(struct.pack('256h', *([0] * 256))))
+        vad.read_write_audio()
+        vad.local_audio_in.append(Frame(struct.pack('256h', *([0] * 256))))
+        vad.read_write_audio()
+
+        # the configured VAD is reset only when it gets the frames again after the skipped ones
+        self.assertEqual(vad.vad.calls, ['reset', 5, 1])
+
+    def test_no_overload(self):
+        self.cfg['VAD']['overload']['max_queued_frames'] = 100
+        vad = self.create_vad()
+        self.queue_frames(vad)
+        vad.read_write_audio()
+
+        self.assertEqual(vad.get_queue_stats()['n_overloads'], 0)
+        self.assertIsNone(vad.overload_vad)
+
+
+if __name__ == '__main__':
+    unittest.main()
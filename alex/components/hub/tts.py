@@ -10,12 +10,20 @@ import traceback
 import os
 import string
 import struct
+import threading
+import Queue
+import numpy as np
 
 from datetime import datetime
+from multiprocessing.pool import ThreadPool
 
 from alex.components.hub.messages import Command, Frame, TTSText
+from alex.components.hub.component import ComponentLoop
+from alex.components.nlg.template import AbstractTemplateNLG
 from alex.components.tts.common import get_tts_type, tts_factory
+from alex.components.tts.presynthesis import PromptCache, PromptPredictor
 
+from alex.utils.cache import persistent_cache_store
 from alex.utils.procname import set_proc_name
 from alex.utils.audio import save_wav
 import alex.utils.various as various
@@ -37,9 +45,26 @@ class TTS(multiprocessing.Process):
         self.audio_out = audio_out
         self.close_event = close_event
 
+        self.main_loop = ComponentLoop('TTS', cfg, [self.commands, self.text_in])
+
         tts_type = get_tts_type(cfg)
         self.tts = tts_factory(tts_type, cfg)
 
+        # the pool of threads synthesizing the segments, it is created in the TTS process when it is needed
+        self.pool = None
+        # serialises the calls of the engine from the presynthesis thread and the main synthesis path, unless
+        # parallel_segments > 1 declares the engine thread-safe
+        self.tts_lock = threading.Lock()
+
+        # the cache of the pre-synthesized prompts, see start_presynthesis()
+        self.presynthesis_cfg = cfg['TTS'].get('presynthesis', {'enabled': False})
+        self.prompt_cache = None
+        self.prompt_predictor = PromptPredictor()
+        self.presynthesis_queue = Queue.PriorityQueue()
+        self.presynthesis_thread = None
+        if self.presynthesis_cfg['enabled']:
+            self.prompt_cache = PromptCache(self.presynthesis_cfg['max_size'])
+
     def parse_into_segments(self, text):
         segments = []
         last_split = 0
@@ -68,13 +93,12 @@ class TTS(multiprocessing.Process):
         """
 
         if len(wav) > 0:
-            for i, x in enumerate(wav):
-                if ord(x) != 0:
-                    break
-
-            for j, x in enumerate(reversed(wav)):
-                if ord(x) != 0:
-                    break
+            non_zero = np.flatnonzero(np.frombuffer(wav, dtype=np.uint8))
+            if len(non_zero):
+                i = non_zero[0]
+                j = len(wav) - 1 - non_zero[-1]
+            else:
+                i = j = len(wav) - 1
 
             return wav[2*int(i/2):-2*int(j/2+1)]
         else:
@@ -90,6 +114,114 @@ class TTS(multiprocessing.Process):
 
         return struct.pack('h',0)*length
 
+    def synthesize_segment(self, segment_text, final, count=True):
+        """ Synthesizes one segment of the prompt and removes its silence.
+
+        If the prompt cache is enabled, the segment is looked up in the cache first and the synthesized segment
+        is stored in the cache.
+
+        :param segment_text: the text of the segment
+        :param final: whether it is the final segment of the prompt, only non-final segments are followed by silence
+        :param count: whether the lookup is counted in the statistics of the cache
+        :return: a wave audio signal of the segment
+        """
+        key = (segment_text, final)
+        if self.prompt_cache is not None:
+            segment_wav = self.prompt_cache.get(key) if count else None
+            if segment_wav is not None:
+                return segment_wav
+
+        start = time.time()
+
+        if self.cfg['TTS'].get('parallel_segments', 1) > 1:
+            segment_wav = self.tts.synthesize(segment_text)
+        else:
+            with self.tts_lock:
+                segment_wav = self.tts.synthesize(segment_text)
+        segment_wav = self.remove_start_and_final_silence(segment_wav)
+        if not final:
+            segment_wav += self.gen_silence()
+
+        if self.prompt_cache is not None:
+            self.prompt_cache.set(key, segment_wav, time.time() - start)
+
+        return segment_wav
+
+    def get_template_prompts(self):
+        """ Returns the prompts which the template NLG generates without filling in any slot values.
+        """
+        nlg_type = self.cfg['NLG']['type']
+        if nlg_type not in ['Template', 'TectoTemplate'] or 'model' not in self.cfg['NLG'][nlg_type]:
+            return []
+
+        nlg = AbstractTemplateNLG(self.cfg)
+        nlg.load_templates(self.cfg['NLG'][nlg_type]['model'])
+
+        return nlg.get_static_texts()
+
+    def start_presynthesis(self):
+        """ Starts the thread pre-synthesizing the prompts into the prompt cache.
+
+        At first, it pre-synthesizes the static prompts of the templates. Later, after each synthesized prompt,
+        it pre-synthesizes the prompts which most likely follow, while the user is speaking. These speculative
+        prompts have priority over the remaining template prompts.
+        """
+        if self.prompt_cache is None:
+            return
+
+        if self.presynthesis_cfg['templates']:
+            for prompt in self.get_template_prompts():
+                self.presynthesis_queue.put((1, prompt))
+
+        self.presynthesis_thread = threading.Thread(target=self.presynthesize)
+        self.presynthesis_thread.daemon = True
+        self.presynthesis_thread.start()
+
+    def presynthesize(self):
+        """ Pre-synthesizes the queued prompts, it runs in the presynthesis thread.
+        """
+        while 1:
+            priority, prompt = self.presynthesis_queue.get()
+
+            segments = self.parse_into_segments(prompt)
+            for i, segment_text in enumerate(segments):
+                if (segment_text, i == len(segments) - 1) in self.prompt_cache:
+                    continue
+
+                try:
+                    self.synthesize_segment(segment_text, i == len(segments) - 1, count=False)
+                except Exception:
+                    self.cfg['Logging']['system_logger'].exception('Pre-synthesis of "%s" failed.' % segment_text)
+
+    def predict_prompts(self, text):
+        """ Records the synthesized prompt and queues the prompts which most likely follow it for pre-synthesis.
+        """
+        self.prompt_predictor.observe(text)
+
+        if self.prompt_cache is not None:
+            for prompt in self.prompt_predictor.predict(self.presynthesis_cfg['n_speculative']):
+                self.presynthesis_queue.put((0, prompt))
+
+    def synthesize_segments(self, segments):
+        """ Returns an iterator over the wave audio signals of the segments in their order.
+
+        If cfg['TTS']['parallel_segments'] is greater than one, the segments are synthesized concurrently by
+        that many threads and each segment is returned as soon as it and all the previous segments are ready.
+        """
+        n_threads = self.cfg['TTS'].get('parallel_segments', 1)
+
+        if n_threads > 1 and len(segments) > 1:
+            if self.pool is None:
+                self.pool = ThreadPool(n_threads)
+
+            results = [self.pool.apply_async(self.synthesize_segment, (segment_text, i == len(segments) - 1))
+                       for i, segment_text in enumerate(segments)]
+
+            return (result.get() for result in results)
+        else:
+            return (self.synthesize_segment(segment_text, i == len(segments) - 1)
+                    for i, segment_text in enumerate(segments))
+
     def synthesize(self, user_id, text, log="true"):
         if text == "_silence_" or text == "silence()":
             # just let the TTS generate an empty wav
@@ -105,12 +237,12 @@ class TTS(multiprocessing.Process):
 
         segments = self.parse_into_segments(text)
 
-        for i, segment_text in enumerate(segments):
-            segment_wav = self.tts.synthesize(segment_text)
-            segment_wav = self.remove_start_and_final_silence(segment_wav)
-            if i <  len(segments) - 1:
-                # add silence only for non-final segments
-                segment_wav += self.gen_silence()
+        start = time.time()
+        first_audio_time = None
+
+        for segment_wav in self.synthesize_segments(segments):
+            if first_audio_time is None:
+                first_audio_time = time.time() - start
 
             wav.append(segment_wav)
 
@@ -119,6 +251,12 @@ class TTS(multiprocessing.Process):
             for frame in segment_wav:
                 self.audio_out.send(Frame(frame))
 
+        self.cfg['Logging']['system_logger'].info(
+            "TTS time to first audio: {t:0.4f} s, total: {total:0.4f} s, segments: {n}, fname: {fname}".format(
+                t=first_audio_time, total=time.time() - start, n=len(segments), fname=fname))
+
+        self.predict_prompts(text)
+
         self.commands.send(Command('tts_end(user_id="%s",text="%s",fname="%s")' % (user_id,text,fname), 'TTS', 'HUB'))
         self.audio_out.send(Command('utterance_end(user_id="%s",text="%s",fname="%s",log="%s")' %
                             (user_id, text, fname, log), 'TTS', 'AudioOut'))
@@ -136,6 +274,7 @@ class TTS(multiprocessing.Process):
 
         while self.commands.poll():
             command = self.commands.recv()
+            self.main_loop.record_latency(command)
             if self.cfg['TTS']['debug']:
                 self.cfg['Logging']['system_logger'].debug(command)
 
@@ -166,6 +305,7 @@ class TTS(multiprocessing.Process):
 
         if self.text_in.poll():
             data_tts = self.text_in.recv()
+            self.main_loop.record_latency(data_tts)
             if isinstance(data_tts, TTSText):
                 self.synthesize(None, data_tts.text)
 
@@ -174,13 +314,19 @@ class TTS(multiprocessing.Process):
             set_proc_name("Alex_TTS")
             self.cfg['Logging']['session_logger'].cancel_join_thread()
 
+            self.start_presynthesis()
+
             while 1:
                 # Check the close event.
                 if self.close_event.is_set():
                     print 'Received close event in: %s' % multiprocessing.current_process().name
+                    print self.main_loop
+                    if self.prompt_cache is not None:
+                        print self.prompt_cache
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # wait for the commands or texts to synthesize
+                self.main_loop.wait()
 
                 s = (time.time(), time.clock())
 
@@ -203,6 +349,9 @@ class TTS(multiprocessing.Process):
             self.cfg['Logging']['system_logger'].exception('Uncaught exception in the TTS process.')
             self.close_event.set()
             raise
+        finally:
+            # the exit handlers do not run in the TTS process
+            persistent_cache_store.close()
 
         print 'Exiting: %s. Setting close event' % multiprocessing.current_process().name
         self.close_event.set()
@@ -9,6 +9,7 @@ from datetime import datetime
 
 from alex.components.asr.exceptions import ASRException
 from alex.components.hub.messages import Command, Frame
+from alex.components.hub.component import ComponentLoop
 from alex.utils.procname import set_proc_name
 from alex.utils.exceptions import SessionClosedException
 
@@ -50,8 +51,21 @@ class VAD(multiprocessing.Process):
         self.audio_out = audio_out
         self.close_event = close_event
 
+        self.main_loop = ComponentLoop('VAD', cfg, [self.commands, self.audio_in])
+
         self.vad_fname = None
 
+        # the length of the queue of frames waiting for processing and their lag behind the input
+        self.queue_depth = 0
+        self.queue_lag = 0.0
+        self.max_queue_depth = 0
+        self.max_queue_lag = 0.0
+        self.n_overloads = 0
+        # the VAD used by the 'power' overload policy
+        self.overload_vad = None
+        # the configured VAD skipped some frames and must be reset before it processes the next ones
+        self.vad_skipped_frames = False
+
         if self.cfg['VAD']['type'] == 'power':
             self.vad = PVAD.PowerVAD(cfg)
         elif self.cfg['VAD']['type'] == 'gmm':
@@ -77,10 +91,12 @@ class VAD(multiprocessing.Process):
 
         while self.commands.poll():
             command = self.commands.recv()
+            self.main_loop.record_latency(command)
             self.local_commands.append(command)
 
         while self.audio_in.poll():
             frame = self.audio_in.recv()
+            self.main_loop.record_latency(frame)
             self.local_audio_in.append(frame)
 
     def process_pending_commands(self):
@@ -148,69 +164,123 @@ class VAD(multiprocessing.Process):
 
         return vad, change
 
+    def update_queue_stats(self):
+        """Measure the number of the queued frames and the time the oldest of them has been waiting."""
+        self.queue_depth = len(self.local_audio_in)
+        self.queue_lag = (datetime.now() - self.local_audio_in[0].time).total_seconds() if self.queue_depth else 0.0
+
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        self.max_queue_lag = max(self.max_queue_lag, self.queue_lag)
+
+        if self.cfg['VAD']['debug']:
+            self.system_logger.debug('VAD queue depth: %d lag: %0.3f' % (self.queue_depth, self.queue_lag))
+
+    def get_queue_stats(self):
+        """Return the current and maximal queue depth and lag and the number of overloads."""
+        return {
+            'queue_depth': self.queue_depth,
+            'queue_lag': self.queue_lag,
+            'max_queue_depth': self.max_queue_depth,
+            'max_queue_lag': self.max_queue_lag,
+            'n_overloads': self.n_overloads,
+        }
+
     def read_write_audio(self):
-        # read input audio
-        if self.local_audio_in:
-            if len(self.local_audio_in) > 10:
-                print "VAD unprocessed frames:", len(self.local_audio_in)
-                self.local_audio_in = deque(list(self.local_audio_in)[-10:])
+        """Process all queued frames at once.
+
+        If more than cfg['VAD']['overload']['max_queued_frames'] frames are queued, the VAD cannot keep up with
+        the input and the overload policy is applied:
+          'drop'  - discard all but the last max_queued_frames frames
+          'power' - classify the queued frames by the cheap PowerVAD instead of the configured VAD
+          'none'  - process all frames by the configured VAD
+
+        The configured VAD is reset before it processes the frames following the dropped or skipped ones,
+        so that its front end does not treat them as a continuation of the previous audio.
+        """
+        if not self.local_audio_in:
+            return
+
+        self.update_queue_stats()
+
+        vad = self.vad
+        if self.queue_depth > self.cfg['VAD']['overload']['max_queued_frames']:
+            self.n_overloads += 1
+            policy = self.cfg['VAD']['overload']['policy']
 
-            # read recorded audio
-            data_rec = self.local_audio_in.popleft()
+            self.system_logger.warning('VAD overloaded: queue depth: %d lag: %0.3f policy: %s' %
+                                       (self.queue_depth, self.queue_lag, policy))
 
-            if isinstance(data_rec, Frame):
-                # buffer the recorded and played audio
-                self.deque_audio_in.append(data_rec)
+            if policy == 'drop':
+                self.local_audio_in = deque(list(self.local_audio_in)[-self.cfg['VAD']['overload']['max_queued_frames']:])
+                self.vad_skipped_frames = True
+            elif policy == 'power':
+                if self.overload_vad is None:
+                    self.overload_vad = PVAD.PowerVAD(self.cfg)
+                vad = self.overload_vad
+                self.vad_skipped_frames = True
+            elif policy != 'none':
+                raise ASRException('Unsupported VAD overload policy: %s' % (policy, ))
 
-                #s = (time.time(), time.clock())
+        if vad is self.vad and self.vad_skipped_frames:
+            self.vad.reset()
+            self.vad_skipped_frames = False
 
-                decision = self.vad.decide(data_rec.payload)
-                vad, change = self.smoothe_decison(decision)
+        # read recorded audio
+        frames = [data_rec for data_rec in self.local_audio_in if isinstance(data_rec, Frame)]
+        self.local_audio_in.clear()
 
-                #d = (time.time() - s[0], time.clock() - s[1])
-                #if d[0] > 0.001:
-                #    print "VAD t = {t:0.4f} c = {c:0.4f}\n".format(t=d[0], c=d[1])
+        decisions = vad.decide_batch([data_rec.payload for data_rec in frames])
 
-                if self.cfg['VAD']['debug']:
-                    self.system_logger.debug("vad: %s change: %s" % (vad, change))
+        for data_rec, decision in zip(frames, decisions):
+            self.write_audio(data_rec, decision)
+
+    def write_audio(self, data_rec, decision):
+        """Smooth the decision for the recorded frame and send the frame if it is speech."""
+        # buffer the recorded and played audio
+        self.deque_audio_in.append(data_rec)
+
+        vad, change = self.smoothe_decison(decision)
+
+        if self.cfg['VAD']['debug']:
+            self.system_logger.debug("vad: %s change: %s" % (vad, change))
 
-                    if vad:
-                        self.system_logger.debug('+')
-                    else:
-                        self.system_logger.debug('-')
+            if vad:
+                self.system_logger.debug('+')
+            else:
+                self.system_logger.debug('-')
 
-                if change == 'speech':
-                    # Create new wave file.
-                    timestamp = datetime.now().strftime('%Y-%m-%d--%H-%M-%S.%f')
-                    self.vad_fname = 'vad-{stamp}.wav'.format(stamp=timestamp)
+        if change == 'speech':
+            # Create new wave file.
+            timestamp = datetime.now().strftime('%Y-%m-%d--%H-%M-%S.%f')
+            self.vad_fname = 'vad-{stamp}.wav'.format(stamp=timestamp)
 
-                    self.session_logger.turn("user")
-                    self.session_logger.rec_start("user", self.vad_fname)
+            self.session_logger.turn("user")
+            self.session_logger.rec_start("user", self.vad_fname)
 
-                    # Inform both the parent and the consumer.
-                    self.audio_out.send(Command('speech_start(fname="%s")' % self.vad_fname, 'VAD', 'AudioIn'))
-                    self.commands.send(Command('speech_start(fname="%s")' % self.vad_fname, 'VAD', 'HUB'))
+            # Inform both the parent and the consumer.
+            self.audio_out.send(Command('speech_start(fname="%s")' % self.vad_fname, 'VAD', 'AudioIn'))
+            self.commands.send(Command('speech_start(fname="%s")' % self.vad_fname, 'VAD', 'HUB'))
 
-                elif change == 'non-speech':
-                    self.session_logger.rec_end(self.vad_fname)
+        elif change == 'non-speech':
+            self.session_logger.rec_end(self.vad_fname)
 
-                    # Inform both the parent and the consumer.
-                    self.audio_out.send(Command('speech_end(fname="%s")' % self.vad_fname, 'VAD', 'AudioIn'))
-                    self.commands.send(Command('speech_end(fname="%s")' % self.vad_fname, 'VAD', 'HUB'))
+            # Inform both the parent and the consumer.
+            self.audio_out.send(Command('speech_end(fname="%s")' % self.vad_fname, 'VAD', 'AudioIn'))
+            self.commands.send(Command('speech_end(fname="%s")' % self.vad_fname, 'VAD', 'HUB'))
 
-                if vad:
-                    while self.deque_audio_in:
-                        # Send or save all potentially queued data.
-                        #   - When there is change to speech, there will be
-                        #     several frames of audio;
-                        #   - If there is no change, then there will be only
-                        #     one queued frame.
+        if vad:
+            while self.deque_audio_in:
+                # Send or save all potentially queued data.
+                #   - When there is change to speech, there will be
+                #     several frames of audio;
+                #   - If there is no change, then there will be only
+                #     one queued frame.
 
-                        data_rec = self.deque_audio_in.popleft()
+                data_rec = self.deque_audio_in.popleft()
 
-                        # Send the result.
-                        self.audio_out.send(data_rec)
-                        self.session_logger.rec_write(self.vad_fname, data_rec)
+                # Send the result.
+                self.audio_out.send(data_rec)
+                self.session_logger.rec_write(self.vad_fname, data_rec.payload)
 
     def run(self):
         try:
@@ -221,10 +291,12 @@ class VAD(multiprocessing.Process):
                 # Check the close event.
                 if self.close_event.is_set():
                     print 'Received close event in: %s' % multiprocessing.current_process().name
+                    print self.main_loop
+                    print 'VAD queue: %s' % self.get_queue_stats()
                     return
 
-                if not self.local_audio_in:
-                    time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # wait for the commands or audio unless there are frames left to process
+                self.main_loop.wait(busy=bool(self.local_audio_in))
 
                 s = (time.time(), time.clock())
 
@@ -239,9 +311,8 @@ class VAD(multiprocessing.Process):
                 # if self.session_logger.is_open:
                 # Process audio data.
                 try:
-                    for i in range(self.cfg['VAD']['n_rwa']):
-                        # process at least n_rwa frames
-                        self.read_write_audio()
+                    # process all queued frames
+                    self.read_write_audio()
                 except SessionClosedException as e:
                     self.system_logger.exception('VAD:read_write_audio: {ex!s}'.format(ex=e))
 
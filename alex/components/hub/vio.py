@@ -14,6 +14,7 @@ from datetime import datetime
 from collections import deque, defaultdict
 
 from alex.components.hub.messages import Command, Frame
+from alex.components.hub.component import ComponentLoop
 from alex.utils.exceptions import SessionLoggerException
 from alex.components.hub.exceptions import VoipIOException
 from alex.utils.exdec import catch_ioerror
@@ -333,6 +334,10 @@ class VoipIO(multiprocessing.Process):
 
         self.close_event = close_event
 
+        # the audio must be exchanged with PJSIP regularly, therefore wait at most main_loop_sleep_time
+        self.main_loop = ComponentLoop('VIO', cfg, [self.commands, self.audio_play],
+                                       timeout=cfg['Hub']['main_loop_sleep_time'])
+
         self.black_list = defaultdict(int)
 
     def recv_input_locally(self):
@@ -343,10 +348,12 @@ class VoipIO(multiprocessing.Process):
 
         while self.commands.poll():
             command = self.commands.recv()
+            self.main_loop.record_latency(command)
             self.local_commands.append(command)
 
         while self.audio_play.poll():
             frame = self.audio_play.recv()
+            self.main_loop.record_latency(frame)
             self.local_audio_play.append(frame)
 
     def process_pending_commands(self):
@@ -814,9 +821,11 @@ class VoipIO(multiprocessing.Process):
                 # Check the close event.
                 if self.close_event.is_set():
                     print 'Received close event in: %s' % multiprocessing.current_process().name
+                    print self.main_loop
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # wait for the commands or audio to play
+                self.main_loop.wait()
 
                 s = (time.time(), time.clock())
 
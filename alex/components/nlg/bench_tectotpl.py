@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Latency benchmark of the tecto-template NLG over the PTICS template set.
+
+All texts of the PTICS templates are generated in a random sequence of system turns, with the slots filled with
+values from a small pool, so that the same template is often reused with other slot values. The benchmark reports
+the latency of the generation from scratch (parsing the filled template), with the cached parsed templates, and with
+both the parsed templates and the generated texts cached, and the hit rates of the caches. The morphology model (with
+its inflection cache) is used if it is available, otherwise the word forms are the lemmas. Run as::
+
+    ./bench_tectotpl.py
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import os
+import random
+import time
+import unittest
+from string import Formatter
+
+if __name__ == '__main__':
+    import autopath
+from alex.components.nlg.template import TectoTemplateNLG
+from alex.utils.config import Config, as_project_path
+
+SCENARIO = [
+    {'block': 'read.TectoTemplates', 'args': {'encoding': None}},
+    {'block': 't2a.CopyTTree'},
+    {'block': 't2a.cs.ReverseNumberNounDependency'},
+    {'block': 't2a.cs.InitMorphcat'},
+    {'block': 't2a.cs.GeneratePossessiveAdjectives'},
+    {'block': 't2a.cs.MarkSubject'},
+    {'block': 't2a.cs.ImposePronZAgr'},
+    {'block': 't2a.cs.ImposeRelPronAgr'},
+    {'block': 't2a.cs.ImposeSubjPredAgr'},
+    {'block': 't2a.cs.ImposeAttrAgr'},
+    {'block': 't2a.cs.ImposeComplAgr'},
+    {'block': 't2a.cs.DropSubjPersProns'},
+    {'block': 't2a.cs.AddPrepositions'},
+    {'block': 't2a.cs.AddSubconjs'},
+    {'block': 't2a.cs.GenerateWordForms', 'args': {'model': 'flect/model-t253-l1_10_00001-alex.pickle.gz'}},
+    {'block': 't2a.cs.VocalizePrepos'},
+    {'block': 't2a.cs.CapitalizeSentStart'},
+    {'block': 'a2w.cs.ConcatenateTokens'},
+    {'block': 'a2w.cs.RemoveRepeatedTokens'},
+]
+
+DATA_DIR = as_project_path('applications/TectoTplTest/data/')
+
+SLOT_VALUES = ['Anděl', 'Hlavní nádraží', 'Malostranské náměstí', 'Brno', 'tramvaj', 'autobus', '10:30', '7']
+
+
+def get_scenario():
+    """Return the NLG scenario, replacing the morphology by the lemmas if the model is not available."""
+    scenario = []
+    for block in SCENARIO:
+        if block['block'] == 't2a.cs.GenerateWordForms' and \
+                not os.path.exists(os.path.join(DATA_DIR, block['args']['model'])):
+            block = {'block': 'util.Eval', 'args': {'anode': 'anode.form = anode.lemma'}}
+        scenario.append(block)
+    return scenario
+
+
+class BenchTectoTemplateNLG(unittest.TestCase):
+
+    n_turns = 2000
+
+    def report(self, name, times):
+        times = sorted(times)
+        print "%-36s mean %8.3f ms  median %8.3f ms  max %8.3f ms" % (
+            name, 1000.0 * sum(times) / len(times), 1000.0 * times[len(times) // 2], 1000.0 * times[-1])
+
+    @classmethod
+    def setUpClass(cls):
+        # do not log every applied block
+        logging.getLogger().setLevel(logging.WARNING)
+
+        cls.cfg = Config.load_configs(config={
+            'NLG': {
+                'TectoTemplate': {
+                    'model': as_project_path('applications/PublicTransportInfoCS/nlg_templates.cfg'),
+                    'scenario': get_scenario(),
+                    'global_args': {'language': 'cs', 'selector': ''},
+                    'data_dir': DATA_DIR,
+                    'cache_size': 1000,
+                },
+            },
+        }, use_default=False, log=False)
+        nlg = TectoTemplateNLG(cls.cfg)
+
+        texts = set()
+        for tpl in nlg.templates.itervalues():
+            texts.update(nlg.enumerate_alternatives(tpl))
+        texts = sorted(texts)
+
+        rng = random.Random(0)
+        cls.turns = []
+        for _ in xrange(cls.n_turns):
+            tpl = rng.choice(texts)
+            slots = set(name for _, name, _, _ in Formatter().parse(tpl) if name is not None)
+            cls.turns.append((tpl, [(slot, rng.choice(SLOT_VALUES)) for slot in sorted(slots)]))
+
+        print "%d templates, %d texts, %d turns" % (len(nlg.templates), len(texts), len(cls.turns))
+
+    def run_turns(self, generate):
+        times = []
+        for tpl, svs in self.turns:
+            start = time.time()
+            generate(tpl, svs)
+            times.append(time.time() - start)
+        return times
+
+    def test_bench_generate(self):
+        nlg = TectoTemplateNLG(self.cfg)
+
+        self.report("parsing filled templates",
+                    self.run_turns(lambda tpl, svs: nlg.nlg_rules.apply_to(tpl.format(**dict(svs)))))
+        self.report("cloning parsed templates",
+                    self.run_turns(lambda tpl, svs: nlg._generate_from_template(tpl, tuple(svs))))
+        self.report("cached texts and parsed templates",
+                    self.run_turns(nlg.fill_in_template))
+
+        for name, stats in sorted(nlg.get_cache_stats().iteritems()):
+            print "%-8s cache: hits %6d  misses %6d  hit rate %.3f" % (
+                name, stats['hits'], stats['misses'], stats['hit_rate'])
+        for block in nlg.nlg_rules.blocks:
+            if hasattr(block, 'get_cache_stats'):
+                stats = block.get_cache_stats()
+                print "%-8s cache: hits %6d  misses %6d  hit rate %.3f" % (
+                    'inflection', stats['hits'], stats['misses'], stats['hit_rate'])
+
+        for tpl, svs in self.turns[:100]:
+            self.assertEqual(nlg.fill_in_template(tpl, svs), nlg.nlg_rules.apply_to(tpl.format(**dict(svs))))
+
+
+if __name__ == '__main__':
+    unittest.main()
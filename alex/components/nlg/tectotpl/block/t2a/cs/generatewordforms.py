@@ -8,7 +8,9 @@ from __future__ import unicode_literals
 from alex.components.nlg.tectotpl.core.block import Block
 from alex.components.nlg.tectotpl.core.exception import LoadingException
 from alex.components.nlg.tectotpl.tool.ml.model import Model
-from alex.components.nlg.tectotpl.core.util import first
+from alex.components.nlg.tectotpl.core.util import first, file_stream
+from alex.components.nlg.tectotpl.core.log import log_info
+from collections import OrderedDict
 import re
 import os.path
 
@@ -21,9 +23,19 @@ class GenerateWordForms(Block):
     """
     Inflect word forms according to filled-in tags.
 
+    The inflections are cached by their features, so that the classifier
+    is used only for the lemma and tag combinations which were not
+    inflected recently. All a-trees of a document are inflected at once,
+    with one classifier call for the features not found in the cache.
+
     Arguments:
         language: the language of the target tree
         selector: the selector of the target tree
+        model: the inflection model file (relative to the data directory)
+        cache_size: the maximum number of cached inflections (default: 10000)
+        warm_up: a file with generated prompts, i.e. templates readable
+            by the first block of the scenario, one per line (relative to
+            the data directory); their inflections are cached on loading
     """
 
     BACK_REGEX = re.compile(r'^>([0-9]+)(.*)$')
@@ -37,19 +49,62 @@ class GenerateWordForms(Block):
             raise LoadingException('Language must be defined!')
         self.model = None
         self.model_file = args['model']
+        self.warm_up_file = args.get('warm_up')
+        self.cache_size = int(args.get('cache_size', 10000))
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
 
     def load(self):
         """\
-        Load the model from a pickle.
+        Load the model from a pickle, warm up the inflection cache
+        if required.
         """
         self.model = Model.load_from_file(os.path.join(self.scenario.data_dir,
                                                        self.model_file))
+        if self.warm_up_file is not None:
+            self.warm_up(os.path.join(self.scenario.data_dir,
+                                      self.warm_up_file))
+
+    def warm_up(self, filename):
+        """\
+        Fill the inflection cache with the word forms of the given prompts.
+        Each prompt is read in the same way as by Scenario.apply_to and
+        processed by the blocks preceding this one.
+        """
+        log_info('Warming up the inflection cache with ' + filename)
+        fh = file_stream(filename)
+        prompts = [line.rstrip('\r\n') for line in fh]
+        fh.close()
+        blocks = self.scenario.blocks
+        for prompt in prompts:
+            doc = self.scenario.read(prompt)
+            for block in blocks[1:blocks.index(self)]:
+                block.process_document(doc)
+            self.process_document(doc)
+        log_info('Inflection cache contains %d entries.' % len(self.cache))
+
+    def process_document(self, doc):
+        """\
+        Inflect word forms in the a-trees of all bundles in the document.
+        """
+        anodes = []
+        for bundle in doc.bundles:
+            zone = bundle.get_zone(self.language, self.selector)
+            if zone.has_atree():
+                anodes.extend(zone.atree.get_descendants(ordered=True))
+        self.inflect_anodes(anodes)
 
     def process_atree(self, aroot):
         """\
         Inflect word forms in the given a-tree.
         """
-        anodes = aroot.get_descendants(ordered=True)
+        self.inflect_anodes(aroot.get_descendants(ordered=True))
+
+    def inflect_anodes(self, anodes):
+        """\
+        Inflect word forms of the given a-nodes.
+        """
         # set hard form = lemma for non-inflected words
         for anode in [anode for anode in anodes
                       if anode.morphcat_pos in ['Z', 'J', 'R', '!']]:
@@ -58,9 +113,47 @@ class GenerateWordForms(Block):
         to_process = [anode for anode in anodes
                       if anode.morphcat_pos not in ['Z', 'J', 'R', '!']]
         instances = [self.__get_features(anode) for anode in to_process]
-        inflections = self.model.classify(instances)
-        for anode, inflection in zip(to_process, inflections):
-            self.__inflect(anode, inflection)
+        keys = [tuple(sorted(inst.iteritems())) for inst in instances]
+        # look up each distinct instance once, classify all instances which
+        # are not cached at once
+        distinct = OrderedDict(zip(keys, instances))
+        to_classify = OrderedDict()
+        for key, inst in distinct.iteritems():
+            if key in self.cache:
+                self.hits += 1
+            else:
+                self.misses += 1
+                to_classify[key] = inst
+        inflections = dict((key, self.cache[key]) for key in distinct
+                           if key in self.cache)
+        if to_classify:
+            inflections.update(zip(to_classify.keys(),
+                                   self.model.classify(to_classify.values())))
+        for key in distinct:
+            self.__cache_inflection(key, inflections[key])
+        for anode, key in zip(to_process, keys):
+            self.__inflect(anode, inflections[key])
+
+    def __cache_inflection(self, key, inflection):
+        """\
+        Store the inflection as the most recently used one, evict the least
+        recently used inflections if the cache is full.
+        """
+        self.cache.pop(key, None)
+        self.cache[key] = inflection
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def get_cache_stats(self):
+        """\
+        Return the number of entries, hits and misses and the hit rate
+        of the inflection cache.
+        """
+        n = self.hits + self.misses
+        return {'entries': len(self.cache),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / n if n else 0.0}
 
     def __get_features(self, anode):
         """\
@@ -111,6 +111,14 @@ class Document(object):
         self.bundles.append(Bundle(self, data, b_ord=len(self.bundles) + 1))
         return self.bundles[-1]
 
+    def clone(self):
+        """\
+        Return a deep copy of the document with all its bundles, zones,
+        trees and node indexes. The nodes keep their IDs, attribute values
+        other than lists and dicts and the file name are shared.
+        """
+        return _clone_value(self, {})
+
 
 class Bundle(object):
     """\
@@ -357,3 +365,26 @@ class Zone(object):
         if self.selector != '':
             ret += '_' + str(self.selector)
         return ret
+
+
+def _clone_value(value, memo):
+    """\
+    Copy a value within a document. Documents, bundles, zones and nodes
+    are copied only once (the copies are kept in memo), lists and dicts
+    are copied, all other values are shared.
+    """
+    if isinstance(value, (Document, Bundle, Zone,
+                          alex.components.nlg.tectotpl.core.node.Node)):
+        copied = memo.get(id(value))
+        if copied is None:
+            copied = value.__class__.__new__(value.__class__)
+            memo[id(value)] = copied
+            copied.__dict__.update((key, _clone_value(val, memo))
+                                   for key, val in value.__dict__.iteritems())
+        return copied
+    if isinstance(value, dict):
+        return dict((key, _clone_value(val, memo))
+                    for key, val in value.iteritems())
+    if isinstance(value, list):
+        return [_clone_value(val, memo) for val in value]
+    return value
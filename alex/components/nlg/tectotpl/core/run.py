@@ -53,18 +53,21 @@ class Scenario(object):
             # load models etc.
             self.blocks[-1].load()
 
-    def apply_to(self, string, language=None, selector=None):
+    def read(self, string):
         """
-        Apply the whole scenario to a string (which should be readable by
-        the first block of the scenario), return the sentence(s) of the
-        given target language and selector.
+        Read a string with the first block of the scenario (which is supposed
+        to be a reader) and return the created document.
+        """
+        return self.blocks[0].process_document(StringIO(string))
+
+    def apply_to_document(self, doc, language=None, selector=None):
+        """
+        Apply all blocks of the scenario except the reader to a document,
+        return the sentence(s) of the given target language and selector.
         """
         # check if we know the target language and selector
         language = language or self.global_args['language']
         selector = selector or self.global_args.get('selector', '')
-        # the first block is supposed to be a reader which creates the document
-        fh = StringIO(string)
-        doc = self.blocks[0].process_document(fh)
         # apply all other blocks
         for block_no, block in enumerate(self.blocks[1:], start=2):
             log_info('Applying block ' + str(block_no) + '/' +
@@ -73,3 +76,11 @@ class Scenario(object):
         # return the text of all bundles for the specified sentence
         return "\n".join([b.get_zone(language, selector).sentence
                           for b in doc.bundles])
+
+    def apply_to(self, string, language=None, selector=None):
+        """
+        Apply the whole scenario to a string (which should be readable by
+        the first block of the scenario), return the sentence(s) of the
+        given target language and selector.
+        """
+        return self.apply_to_document(self.read(string), language, selector)
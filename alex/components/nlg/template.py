@@ -7,8 +7,10 @@ import random
 import itertools
 import copy
 import re
+from string import Formatter
 
 from alex.components.slu.da import DialogueAct
+from alex.utils.cache import lru_cache
 from alex.utils.config import load_as_module
 from alex.components.nlg.tectotpl.core.run import Scenario
 from alex.components.nlg.exceptions import TemplateNLGException
@@ -215,6 +217,44 @@ class AbstractTemplateNLG(object):
         else:
             raise TemplateNLGException("Unsupported generation type.")
 
+    def enumerate_alternatives(self, tpl, max_alternatives=100):
+        """\
+        Return the list of all texts which random_select() can select from
+        the given template, at most max_alternatives of them.
+        """
+        if isinstance(tpl, basestring):
+            return [tpl]
+        elif isinstance(tpl, tuple):
+            texts = []
+            for tpl_or in tpl:
+                if isinstance(tpl_or, basestring):
+                    texts.append(tpl_or)
+                elif isinstance(tpl_or, list):
+                    tpl_and = [self.enumerate_alternatives(t, max_alternatives) for t in tpl_or]
+                    for t in itertools.islice(itertools.product(*tpl_and), max_alternatives - len(texts)):
+                        texts.append(u" ".join(t).replace(u'  ', u' '))
+
+                if len(texts) >= max_alternatives:
+                    break
+
+            return texts[:max_alternatives]
+
+        return []
+
+    def get_static_texts(self, max_alternatives=100):
+        """\
+        Return all texts which can be generated from the templates without
+        filling in any slot values, i.e. the texts of the exactly matching
+        templates which do not contain any variables.
+        """
+        texts = []
+        for tpl in self.templates.itervalues():
+            for text in self.enumerate_alternatives(tpl, max_alternatives):
+                if text and '{' not in text:
+                    texts.append(text)
+
+        return sorted(set(texts))
+
     def match_and_fill_generic(self, da, svs):
         """\
         Match a generic template and fill in the proper values for the slots
@@ -436,8 +476,21 @@ class TemplateNLGPostprocessing(object):
 class TectoTemplateNLG(AbstractTemplateNLG):
     """\
     Template generation using tecto-trees and NLG rules.
+
+    Each template is parsed into t-trees only once, with marks in place
+    of the slots. To fill in the template, the parsed document is cloned and
+    the slot values replace the marks in the t-lemmas of the clone. The
+    generated texts are kept in a bounded cache keyed by the template and
+    the slot values.
     """
 
+    # marks a slot (by its number) in the t-lemmas of a parsed template
+    SLOT_MARK = '\ue000%d\ue001'
+    SLOT_MARK_RE = re.compile('\ue000([0-9]+)\ue001')
+    # slot values which would not end up in a t-lemma as a whole
+    # if they were filled in before parsing
+    UNSAFE_VALUE_RE = re.compile(r'^\s|[\[\]|\n]', re.UNICODE)
+
     def __init__(self, cfg):
         """\
         Initialization, checking configuration, loading
@@ -457,12 +510,83 @@ class TectoTemplateNLG(AbstractTemplateNLG):
         # load NLG system
         self.nlg_rules = Scenario(mycfg)
         self.nlg_rules.load_blocks()
+        # caches of the parsed templates and of the generated texts
+        cache_size = mycfg.get('cache_size', 1000)
+        self.parse_template = lru_cache(maxsize=cache_size)(self._parse_template)
+        self.generate_from_template = lru_cache(maxsize=cache_size)(self._generate_from_template)
 
     def fill_in_template(self, tpl, svs):
         """\
         Filling in tecto-templates, i.e. filling-in strings to templates
         and using rules to generate the result.
         """
-        tpl = unicode(tpl)
-        filled_tpl = tpl.format(**dict(svs))
-        return self.nlg_rules.apply_to(filled_tpl)
+        return self.generate_from_template(unicode(tpl), tuple(tuple(sv) for sv in svs))
+
+    def _generate_from_template(self, tpl, svs):
+        """\
+        Generate the text for the given template and slot values (a tuple of
+        slot-value pairs), using the cached parse of the template if possible.
+        """
+        svs = dict(svs)
+        parsed = self.parse_template(tpl)
+        if parsed is None or \
+                any(self.UNSAFE_VALUE_RE.search(unicode(value)) for value in svs.itervalues()):
+            return self.nlg_rules.apply_to(tpl.format(**svs))
+
+        doc, slot_names, slot_node_ids = parsed
+        values = [unicode(svs[name]) for name in slot_names]
+
+        doc = doc.clone()
+        for node_id in slot_node_ids:
+            tnode = doc.get_node_by_id(node_id)
+            tnode.t_lemma = self.SLOT_MARK_RE.sub(lambda m: values[int(m.group(1))], tnode.t_lemma)
+        return self.nlg_rules.apply_to_document(doc)
+
+    def _parse_template(self, tpl):
+        """\
+        Parse a template into t-trees with its slots marked in the t-lemmas.
+
+        Returns the parsed document, the names of the slots and the IDs of
+        the t-nodes with slots in their t-lemmas. Returns None if the slot
+        values cannot be filled into the parsed template, i.e. if a slot
+        uses a format specification or if it is not a part of a t-lemma.
+        """
+        slot_names = []
+        for _, name, format_spec, conversion in Formatter().parse(tpl):
+            if name is None:
+                continue
+            if format_spec or conversion or not re.match(r'^[^\W\d]\w*$', name, re.UNICODE):
+                return None
+            if name not in slot_names:
+                slot_names.append(name)
+
+        marks = dict((name, self.SLOT_MARK % i) for i, name in enumerate(slot_names))
+        doc = self.nlg_rules.read(tpl.format(**marks))
+
+        slot_node_ids = []
+        for bundle in doc.bundles:
+            for zone in bundle.get_all_zones():
+                for tnode in zone.ttree.get_descendants():
+                    if self.SLOT_MARK_RE.search(tnode.t_lemma or ''):
+                        slot_node_ids.append(tnode.id)
+                    other_values = [tnode.formeme or ''] + tnode.gram.keys() + tnode.gram.values()
+                    if any(self.SLOT_MARK_RE.search(value) for value in other_values):
+                        return None
+
+        return doc, slot_names, slot_node_ids
+
+    def get_cache_stats(self):
+        """\
+        Return the number of hits and misses and the hit rate of the cache
+        of generated texts and of the cache of parsed templates.
+        """
+        stats = {}
+        for name, cache in [('output', self.generate_from_template),
+                            ('template', self.parse_template)]:
+            n = cache.hits + cache.misses
+            stats[name] = {
+                'hits': cache.hits,
+                'misses': cache.misses,
+                'hit_rate': float(cache.hits) / n if n else 0.0,
+            }
+        return stats
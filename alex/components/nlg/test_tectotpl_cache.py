@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import codecs
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+
+if __name__ == "__main__":
+    import autopath
+import __init__
+
+from alex.components.nlg.template import TectoTemplateNLG
+from alex.components.nlg.tectotpl.tool.ml.dataset import DataSet
+from alex.components.nlg.tectotpl.tool.ml.model import Model
+from alex.utils.config import Config, as_project_path
+
+# the NLG rules without the morphology model, the word forms are the lemmas
+CACHE_CONFIG_DICT = {
+    'NLG': {
+        'debug': True,
+        'type': 'TectoTemplate',
+        'TectoTemplate': {
+            'model': as_project_path('applications/TectoTplTest/nlgtemplates.cfg'),
+            'scenario': [
+                {'block': 'read.TectoTemplates', 'args': {'encoding': None}},
+                {'block': 't2a.CopyTTree'},
+                {'block': 't2a.cs.ReverseNumberNounDependency'},
+                {'block': 't2a.cs.InitMorphcat'},
+                {'block': 't2a.cs.AddPrepositions'},
+                {'block': 'util.Eval', 'args': {'anode': 'anode.form = anode.lemma'}},
+                {'block': 't2a.cs.CapitalizeSentStart'},
+                {'block': 'a2w.cs.ConcatenateTokens'},
+            ],
+            'global_args': {'language': 'cs', 'selector': ''},
+            'data_dir': as_project_path('applications/TectoTplTest/data/'),
+            'cache_size': 3,
+        },
+    }
+}
+
+TEMPLATES = ['Dobře, takže hledáte něco [{pricerange}|n:2|gender:neut,number:sg].',
+             '{greeting} hledáte nějaký [[{pricerange}|adj:attr] podnik|n:4|gender:inan,number:sg] '
+             '[[{food}|adj:attr] jídlo|n:s+7|gender:neut,number:sg], {greeting}?',
+             'Hledáte [{food}|n:1] nebo [{food:.3}|n:1]?',
+             '[{food}|{case}] jídlo.']
+
+SVS = [[('pricerange', 'levný'), ('food', 'čínský'), ('greeting', 'ahoj'), ('case', 'n:4')],
+       [('pricerange', 'drahý'), ('food', 'indický'), ('greeting', 'no tak'), ('case', 'n:2')],
+       [('pricerange', 'levný [a dobrý'), ('food', ' thajský'), ('greeting', 'a|b'), ('case', 'n:1')]]
+
+
+class TestTectoTemplateNLGCache(unittest.TestCase):
+
+    def setUp(self):
+        cfg = Config.load_configs(config=CACHE_CONFIG_DICT, use_default=False,
+                                  log=False)
+        self.nlg = TectoTemplateNLG(cfg)
+
+    def test_same_as_parsing_filled_templates(self):
+        for _ in range(2):
+            for tpl in TEMPLATES:
+                for svs in SVS:
+                    filled_tpl = tpl.format(**dict(svs))
+                    self.assertEqual(self.nlg.fill_in_template(tpl, svs),
+                                     self.nlg.nlg_rules.apply_to(filled_tpl))
+
+    def test_cache_stats(self):
+        cheap = self.nlg.fill_in_template(TEMPLATES[0], SVS[0])
+        expensive = self.nlg.fill_in_template(TEMPLATES[0], SVS[1])
+        self.assertIn('levný', cheap)
+        self.assertIn('drahý', expensive)
+        self.assertEqual(self.nlg.fill_in_template(TEMPLATES[0], [list(sv) for sv in SVS[0]]), cheap)
+
+        stats = self.nlg.get_cache_stats()
+        self.assertEqual((stats['output']['hits'], stats['output']['misses']), (1, 2))
+        self.assertEqual((stats['template']['hits'], stats['template']['misses']), (1, 1))
+        self.assertAlmostEqual(stats['output']['hit_rate'], 1.0 / 3)
+
+        # the slots are not cloned into the parsed template if they are
+        # a part of a formeme or have a format specification
+        self.assertIsNone(self.nlg.parse_template(TEMPLATES[2]))
+        self.assertIsNone(self.nlg.parse_template(TEMPLATES[3]))
+
+
+
+INFLECTIONS = [{'Lemma': 'levný', 'Tag_Cas': '2', 'Inflection': '>1ého'},
+               {'Lemma': 'levný', 'Tag_Cas': '4', 'Inflection': ''},
+               {'Lemma': 'podnik', 'Tag_Cas': '4', 'Inflection': ''},
+               {'Lemma': 'jídlo', 'Tag_Cas': '7', 'Inflection': '>1em'},
+               {'Lemma': 'čínský', 'Tag_Cas': '7', 'Inflection': '>1ým'}]
+
+
+class TestGenerateWordFormsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        # train a small inflection model
+        from sklearn.feature_extraction import DictVectorizer
+        from sklearn.tree import DecisionTreeClassifier
+        model = Model({'class_attr': 'Inflection',
+                       'select_attr': ['Lemma', 'Tag_Cas'],
+                       'vectorizer': DictVectorizer(),
+                       'classifier_class': DecisionTreeClassifier})
+        train = DataSet()
+        train.load_from_dict(INFLECTIONS)
+        model.train_on_data(train)
+        model.save_to_file(os.path.join(self.data_dir, 'flect.pickle.gz'))
+        # generated prompts for warming up the cache
+        with codecs.open(os.path.join(self.data_dir, 'prompts.txt'), 'w', 'UTF-8') as fh:
+            fh.write(TEMPLATES[0].format(pricerange='levný') + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def create_nlg(self, cache_size):
+        config = copy.deepcopy(CACHE_CONFIG_DICT)
+        mycfg = config['NLG']['TectoTemplate']
+        mycfg['data_dir'] = self.data_dir
+        mycfg['scenario'][5] = {'block': 't2a.cs.GenerateWordForms',
+                                'args': {'model': 'flect.pickle.gz',
+                                         'warm_up': 'prompts.txt',
+                                         'cache_size': cache_size}}
+        cfg = Config.load_configs(config=config, use_default=False, log=False)
+        nlg = TectoTemplateNLG(cfg)
+        block = nlg.nlg_rules.blocks[5]
+
+        # count the classifier calls
+        block.classify_calls = []
+        classify = block.model.classify
+
+        def counting_classify(instances):
+            block.classify_calls.append(len(instances))
+            return classify(instances)
+        block.model.classify = counting_classify
+
+        return nlg, block
+
+    def test_same_as_uncached(self):
+        nlg, block = self.create_nlg(100)
+        uncached_nlg, uncached_block = self.create_nlg(0)
+        prompts = [TEMPLATES[0].format(pricerange='levný'),
+                   TEMPLATES[1].format(greeting='Ahoj', pricerange='levný', food='čínský'),
+                   TEMPLATES[0].format(pricerange='levný') + '\n' + TEMPLATES[1].format(greeting='Ahoj',
+                                                                                    pricerange='drahý',
+                                                                                    food='čínský')]
+        for prompt in prompts:
+            self.assertEqual(nlg.nlg_rules.apply_to(prompt), uncached_nlg.nlg_rules.apply_to(prompt))
+        self.assertIn('levného', nlg.nlg_rules.apply_to(prompts[0]))
+        self.assertEqual(len(uncached_block.cache), 0)
+
+    def test_warm_up_and_batches(self):
+        nlg, block = self.create_nlg(100)
+        stats = block.get_cache_stats()
+        self.assertGreater(stats['entries'], 0)
+        self.assertEqual(stats['misses'], stats['entries'])
+
+        # the warm-up prompt is inflected without the classifier
+        nlg.nlg_rules.apply_to(TEMPLATES[0].format(pricerange='levný'))
+        self.assertEqual(block.classify_calls, [])
+        self.assertEqual(block.get_cache_stats()['hits'], stats['entries'])
+
+        # all bundles are inflected in one call, the repeated features only once
+        filled_tpl = TEMPLATES[1].format(greeting='Ahoj', pricerange='levný', food='čínský')
+        nlg.nlg_rules.apply_to(filled_tpl + '\n' + filled_tpl)
+        self.assertEqual(len(block.classify_calls), 1)
+        # each distinct instance is counted once per batch
+        self.assertEqual(block.classify_calls[0],
+                         block.get_cache_stats()['misses'] - stats['misses'])
+
+        # the cache is bounded
+        block.cache_size = 2
+        nlg.nlg_rules.apply_to(filled_tpl)
+        self.assertEqual(len(block.cache), 2)
+
+if __name__ == '__main__':
+    unittest.main()
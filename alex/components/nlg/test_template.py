@@ -50,6 +50,22 @@ class TestTemplateNLG(unittest.TestCase):
 
         self.assertEqual(unicode(correct_text), unicode(generated_text))
 
+    def test_static_texts(self):
+        nlg = TemplateNLG(self.cfg)
+        nlg.templates = {
+            'hello()': ([('Hello.', 'Hi.'), ('How are you?', 'Welcome.')], 'Hi my friend.'),
+            'bye()': 'Bye.',
+            'inform(from_stop="{from_stop}")': 'From {from_stop}.',
+        }
+
+        self.assertEqual(nlg.enumerate_alternatives(nlg.templates['hello()']),
+                         ['Hello. How are you?', 'Hello. Welcome.', 'Hi. How are you?', 'Hi. Welcome.',
+                          'Hi my friend.'])
+        self.assertEqual(len(nlg.enumerate_alternatives(nlg.templates['hello()'], max_alternatives=2)), 2)
+        self.assertEqual(nlg.get_static_texts(),
+                         ['Bye.', 'Hello. How are you?', 'Hello. Welcome.', 'Hi my friend.', 'Hi. How are you?',
+                          'Hi. Welcome.'])
+
     def test_template_nlg_r(self):
 
         cfg = self.cfg
@@ -4,14 +4,17 @@
 # http://www.python.org/dev/peps/pep-0008.
 
 import copy
+import heapq
 
-from collections import defaultdict, namedtuple
+from collections import defaultdict, namedtuple, OrderedDict
 from itertools import product
 
 from alex.components.asr.utterance import AbstractedUtterance, Utterance, \
     UtteranceConfusionNetwork, UtteranceHyp, UtteranceNBList, \
     UtteranceFeatures, UtteranceNBListFeatures, \
     UtteranceConfusionNetworkFeatures
+from alex.components.slu.cldbsnapshot import CLDBSnapshot, SnapshotForm2Value2CL, is_cldb_snapshot, \
+    write_cldb_snapshot
 from alex.components.slu.da import DialogueActItem, DialogueActConfusionNetwork, merge_slu_confnets
 from alex.components.slu.exceptions import SLUException
 from alex.utils.config import load_as_module
@@ -41,14 +44,30 @@ class CategoryLabelDatabase(object):
        - instead of testing all surface forms from the CLDB from the longest to the shortest in the utterance, we test
          all the substrings in the utterance from the longest to the shortest
 
+       - the surface forms are stored in a token trie (``form_trie``) so that the leftmost longest surface forms
+         can be found in a single left-to-right pass, see :meth:`find_forms`
+
+    Compiled snapshots
+    ------------------
+
+    The database can be compiled into a binary snapshot by :meth:`save_snapshot` or by the ``cldbsnapshot.py``
+    script. If the loaded file is a snapshot, it is memory mapped and shared by all processes. The surface forms are
+    then searched directly in the snapshot, ``form2value2cl`` is a read-only view of it, and the other attributes
+    (``database``, ``synonym_value_category``, ``form_value_cl``, ``forms`` and ``form_trie``) are built from
+    the snapshot only when they are used for the first time.
 
     """
+    # the attributes built from a snapshot when they are used for the first time
+    snapshot_views = ['database', 'synonym_value_category', 'form_value_cl', 'forms', 'form_trie']
+
     def __init__(self, file_name=None):
+        self.snapshot = None
         self.database = {}
         self.synonym_value_category = []
         self.forms = []
         self.form_value_cl = []
         self.form2value2cl = nesteddict()
+        self.form_trie = {}
 
         if file_name:
             self.load(file_name)
@@ -57,8 +76,33 @@ class CategoryLabelDatabase(object):
         self._form_val_upname = None
         self._form_upnames_vals = None
 
+    def __getattr__(self, name):
+        if name in CategoryLabelDatabase.snapshot_views and self.__dict__.get('snapshot') is not None:
+            if name == 'database':
+                value = defaultdict(lambda: defaultdict(list))
+                for form, val, cl in self.snapshot:
+                    value[cl][val].append(form)
+                value = dict((cl, dict(vals)) for cl, vals in value.iteritems())
+            elif name == 'form_trie':
+                self.gen_form_trie()
+                return self.form_trie
+            else:
+                value = sorted(self.snapshot, key=lambda fvc: len(fvc[0]), reverse=True)
+                if name == 'forms':
+                    value = [form for form, val, cl in value]
+
+            setattr(self, name, value)
+            return value
+
+        raise AttributeError(name)
+
     def __iter__(self):
         """Yields tuples (form, value, category) from the database."""
+        if self.snapshot is not None and 'synonym_value_category' not in self.__dict__:
+            for tup in self.snapshot:
+                yield tup
+            return
+
         for tup in self.synonym_value_category:
             yield tup
 
@@ -89,6 +133,13 @@ class CategoryLabelDatabase(object):
         return self._form_upnames_vals
 
     def load(self, file_name=None, db_mod=None):
+        if not db_mod and file_name and is_cldb_snapshot(file_name):
+            self.load_snapshot(file_name)
+            return
+
+        if self.snapshot is not None:
+            self.__init__()
+
         if not db_mod:
             db_mod = load_as_module(file_name, force=True)
             if not hasattr(db_mod, 'database'):
@@ -104,6 +155,21 @@ class CategoryLabelDatabase(object):
         self._form_val_upname = None
         self._form_upnames_vals = None
 
+    def load_snapshot(self, file_name):
+        """Loads a database snapshot compiled by save_snapshot()."""
+        self.snapshot = CLDBSnapshot(file_name)
+        self.form2value2cl = SnapshotForm2Value2CL(self.snapshot)
+
+        for name in CategoryLabelDatabase.snapshot_views:
+            self.__dict__.pop(name, None)
+
+        self._form_val_upname = None
+        self._form_upnames_vals = None
+
+    def save_snapshot(self, file_name):
+        """Compiles the loaded database into a snapshot file."""
+        write_cldb_snapshot(self, file_name)
+
     def normalise_database(self):
         """Normalise database. E.g., split utterances into sequences of words.
         """
@@ -154,6 +220,167 @@ class CategoryLabelDatabase(object):
 
         self.forms.sort(key=lambda f: len(f), reverse=True)
 
+        self.gen_form_trie()
+
+    def gen_form_trie(self):
+        """
+        Generates a token trie of all surface forms in form2value2cl. Each node of the trie is a dictionary mapping words
+        to child nodes; the node where a surface form ends stores the form under the ``None`` key.
+
+        :return: none
+        """
+        self.form_trie = {}
+        for form in self.form2value2cl:
+            if not form:
+                continue
+
+            node = self.form_trie
+            for word in form:
+                node = node.setdefault(word, {})
+            node[None] = form
+
+    def find_forms(self, utterance):
+        """
+        Finds all the surface forms from the database in the utterance. The search goes from left to right and always
+        takes the longest surface form starting at the current word; the words covered by a found surface form are
+        skipped. This is equivalent to testing all the substrings of the utterance from the longest to the shortest.
+
+        :param utterance: an Utterance instance or a sequence of words
+        :return: a list of (start, end, form) tuples, where form is the surface form found at utterance[start:end]
+        """
+        if self.snapshot is not None and 'form_trie' not in self.__dict__:
+            return self.snapshot.find_forms(utterance)
+
+        spans = []
+
+        start = 0
+        while start < len(utterance):
+            node = self.form_trie
+            match = None
+            for end in xrange(start, len(utterance)):
+                node = node.get(utterance[end])
+                if node is None:
+                    break
+                if None in node:
+                    match = (start, end + 1, node[None])
+
+            if match:
+                spans.append(match)
+                # skip all substring for this form
+                start = match[1]
+            else:
+                start += 1
+
+        return spans
+
+
+class TextNormaliser(object):
+    """Rewrites word sequences by an ordered list of (source, target) rules.
+
+    The result is the same as of calling Utterance.replace_all for each of the
+    rules in their order: a rule replaces all occurrences of its source,
+    including the ones created by its own replacements, and the following
+    rules see the rewritten words.
+
+    The rules are indexed by the first words of their sources, so that only
+    the rules whose words occur in the utterance are tried, and each of them
+    rewrites the list of words in one left-to-right pass.
+
+    """
+    def __init__(self, mapping):
+        self.rules = []
+        # the first word of the source -> the indices of the rules
+        self.index = defaultdict(list)
+
+        for source, target in mapping:
+            source = self._as_words(source)
+            target = self._as_words(target)
+            if not source:
+                raise SLUException("Empty source in the text normalisation mapping.")
+
+            self.index[source[0]].append(len(self.rules))
+            self.rules.append((source, target, self._find(target, source) != -1))
+
+    @staticmethod
+    def _as_words(phrase):
+        if isinstance(phrase, tuple):
+            return list(phrase)
+        if not isinstance(phrase, list):
+            return [phrase, ]
+        return phrase
+
+    @staticmethod
+    def _find(words, phrase, start=0):
+        """Returns the index of the first occurrence of the phrase in words
+        starting at or after start, or -1."""
+        initial = phrase[0]
+        n = len(phrase)
+        for idx in xrange(start, len(words) - n + 1):
+            if words[idx] == initial and words[idx:idx + n] == phrase:
+                return idx
+        return -1
+
+    def candidates(self, words):
+        """Returns the indices of the rules whose first source word is among
+        words."""
+        rule_idxs = []
+        for word in words:
+            rule_idxs.extend(self.index.get(word, ()))
+        return rule_idxs
+
+    def rewrite(self, rule_idx, words):
+        """Replaces all occurrences of the source of the rule in the list of
+        words. Returns the new list of words, or None if the source does not
+        occur in words."""
+        source, target, recursive = self.rules[rule_idx]
+
+        pos = self._find(words, source)
+        if pos == -1:
+            return None
+
+        while pos != -1:
+            words = words[:pos] + target + words[pos + len(source):]
+            if recursive:
+                # Utterance.replace_all would never stop, each replacement
+                # creates a new occurrence.
+                pos += len(target)
+            else:
+                # The replacement can complete an occurrence which starts
+                # before it; there is none which ends before it.
+                pos = max(0, pos - len(source) + 1)
+            pos = self._find(words, source, pos)
+
+        return words
+
+    def normalise(self, words):
+        """Returns the list of words rewritten by all rules, or None if no
+        rule applies."""
+        heap = self.candidates(set(words))
+        if not heap:
+            return None
+        heapq.heapify(heap)
+
+        rewritten = None
+        last_idx = -1
+        while heap:
+            rule_idx = heapq.heappop(heap)
+            if rule_idx == last_idx:
+                continue
+            last_idx = rule_idx
+
+            new_words = self.rewrite(rule_idx, words)
+            if new_words is None:
+                continue
+            words = rewritten = new_words
+
+            # The words introduced by the replacement can trigger the
+            # following rules.
+            for next_idx in self.candidates(set(self.rules[rule_idx][1])):
+                if next_idx > rule_idx:
+                    heapq.heappush(heap, next_idx)
+
+        return rewritten
+
 
 class SLUPreprocessing(object):
     """Implements preprocessing of utterances or utterances and dialogue acts.
@@ -190,8 +417,37 @@ class SLUPreprocessing(object):
         """
         self.cldb = cldb
 
-        if text_normalization:
-            self.text_normalization_mapping = text_normalization
+        # Subclasses extend the mapping, do not let them extend the one of
+        # the class.
+        self.text_normalization_mapping = list(text_normalization or self.text_normalization_mapping)
+        self._normaliser = None
+        self._normaliser_size = None
+
+    @property
+    def normaliser(self):
+        """The TextNormaliser compiled from text_normalization_mapping.
+
+        It is compiled when it is first used, so that the subclasses can
+        extend the mapping in their constructors.
+
+        """
+        if self._normaliser_size != len(self.text_normalization_mapping):
+            self._normaliser = TextNormaliser(self.text_normalization_mapping)
+            self._normaliser_size = len(self.text_normalization_mapping)
+        return self._normaliser
+
+    def _normalise_words(self, utterance, words):
+        """Returns an utterance with the normalised words, or the utterance
+        itself if they are the same as its words."""
+        normalised_words = self.normaliser.normalise(words)
+        if normalised_words is not None:
+            words = normalised_words
+        elif words is utterance.utterance:
+            return utterance
+
+        normalised = Utterance('')
+        normalised.utterance = words
+        return normalised
 
     def normalise_utterance(self, utterance):
         """
@@ -200,24 +456,23 @@ class SLUPreprocessing(object):
         E.g., it removes filler words such as UHM, UM, etc., converts "I'm"
         into "I am", etc.
 
+        BEWARE, the utterance is lowercased in place.
+
         """
         utterance.lower()
-
-        for mapping in self.text_normalization_mapping:
-            utterance = utterance.replace_all(mapping[0], mapping[1])
-        return utterance
+        return self._normalise_words(utterance, utterance.utterance)
 
     def normalise_nblist(self, nblist):
         """
         Normalises the N-best list (the output of an ASR).
 
-        :param nblist:
-        :return:
-        """
+        The utterances in the N-best list are left untouched, a new N-best
+        list is returned.
 
-        unb = copy.deepcopy(nblist)
-        for utt_idx, hyp in enumerate(unb):
-            unb[utt_idx][1] = self.normalise_utterance(hyp[1])
+        """
+        unb = copy.copy(nblist)
+        unb.n_best = [[prob, self._normalise_words(utterance, [word.lower() for word in utterance])]
+                      for prob, utterance in nblist.n_best]
         return unb
 
     def normalise_confnet(self, confnet):
@@ -227,10 +482,16 @@ class SLUPreprocessing(object):
         E.g., it removes filler words such as UHM, UM, etc., converts "I'm"
         into "I am", etc.
 
+        The confnet is left untouched, it is copied once and the copy is
+        lowercased and normalised in place.
+
         """
+        confnet = copy.deepcopy(confnet)
         confnet.lower()
-        for mapping in self.text_normalization_mapping:
-            confnet = confnet.replace(mapping[0], mapping[1])
+
+        for source, target, _ in self.normaliser.rules:
+            if source[0] in confnet._wordset:
+                confnet = confnet.replace(source, target, inplace=True)
         return confnet
 
     def normalise(self, utt_hyp):
@@ -310,8 +571,8 @@ class SLUInterface(object):
         if len(nblist) == 0:
             return DialogueActConfusionNetwork()
 
-        obs_wo_nblist = copy.deepcopy(obs)
-        del obs_wo_nblist['utt_nbl']
+        obs_wo_nblist = copy.deepcopy(dict((obs_type, value) for obs_type, value in obs.iteritems()
+                                           if obs_type != 'utt_nbl'))
         dacn_list = []
         for prob, utt in nblist:
             if "_other_" == utt:
@@ -353,8 +614,8 @@ class SLUInterface(object):
 
         # Separate the confnet from the observations.
         confnet = obs['utt_cn']
-        obs_wo_cn = copy.deepcopy(obs)
-        del obs_wo_cn['utt_cn']
+        obs_wo_cn = copy.deepcopy(dict((obs_type, value) for obs_type, value in obs.iteritems()
+                                       if obs_type != 'utt_cn'))
 
         # Generate the n-best list from the confnet.
         obs_wo_cn.setdefault('utt_nbl', confnet.get_utterance_nblist(n=n))
@@ -393,3 +654,106 @@ class SLUInterface(object):
             return self.parse_1_best(obs, *args, **kwargs)
 
         # raise DAILRException("Unsupported input in the SLU component.")
+
+
+class NormalisedUtteranceSLU(SLUInterface):
+    """
+    Defines a base of the SLU parsers which parse the normalised utterances.
+
+    The derived classes implement two methods:
+      1) parse_utt2da(utterance) -- returns the fixed parse of a raw utterance, or None if it has none
+      2) parse_normalised(utterance, verbose) -- parses an utterance normalised by self.preprocessing
+
+    Each hypothesis of an n-best list is normalised once, and the hypotheses that are equal after the normalisation
+    are parsed only once.
+    """
+
+    def parse_utt2da(self, utterance):
+        raise SLUException("Not implemented")
+
+    def parse_normalised(self, utterance, verbose=False):
+        raise SLUException("Not implemented")
+
+    def parse_1_best(self, obs, verbose=False, *args, **kwargs):
+        """Parse an utterance into a dialogue act.
+
+        :rtype DialogueActConfusionNetwork
+        """
+
+        utterance = obs['utt']
+
+        if isinstance(utterance, UtteranceHyp):
+            # Parse just the utterance and ignore the confidence score.
+            utterance = utterance.utterance
+
+        if verbose:
+            print 'Parsing utterance "{utt}".'.format(utt=utterance)
+
+        dict_cn = self.parse_utt2da(utterance)
+        if dict_cn is not None:
+            return dict_cn
+
+        utterance = self.preprocessing.normalise_utterance(utterance)
+        return self.parse_normalised(utterance, verbose)
+
+    def parse_nblist(self, obs, verbose=False, *args, **kwargs):
+        """Parse an n-best list of utterances into a dialogue act.
+
+        The result is the same as of SLUInterface.parse_nblist; however, the hypotheses that are equal after
+        the normalisation are parsed only once and their probabilities are summed up before merging.
+
+        :rtype DialogueActConfusionNetwork
+        """
+        nblist = obs['utt_nbl']
+        if len(nblist) == 0:
+            return DialogueActConfusionNetwork()
+
+        # the distinct hypotheses and their summed probabilities, in the order of the n-best list
+        hyp_probs = OrderedDict()
+        # parse keys of the raw hypotheses seen so far
+        utt_keys = {}
+        # the normalised utterances and the fixed parses of the distinct hypotheses
+        normalised_utts = {}
+        dict_cns = {}
+        for prob, utt in nblist:
+            if isinstance(utt, UtteranceHyp):
+                utt = utt.utterance
+
+            utt_str = unicode(utt)
+            key = utt_keys.get(utt_str)
+            if key is None:
+                if utt_str in ('_other_', '_silence_'):
+                    key = utt_str
+                else:
+                    dict_cn = self.parse_utt2da(utt)
+                    if dict_cn is not None:
+                        key = utt_str
+                        dict_cns[key] = dict_cn
+                    else:
+                        normalised = self.preprocessing.normalise_utterance(utt)
+                        key = tuple(normalised)
+                        normalised_utts.setdefault(key, normalised)
+                utt_keys[utt_str] = key
+
+            hyp_probs[key] = hyp_probs.get(key, 0.0) + prob
+
+        dacn_list = []
+        for key, prob in hyp_probs.iteritems():
+            if key == '_other_':
+                dacn = DialogueActConfusionNetwork()
+                dacn.add(1.0, DialogueActItem("other"))
+            elif key == '_silence_':
+                dacn = DialogueActConfusionNetwork()
+                dacn.add(1.0, DialogueActItem("silence"))
+            elif key in normalised_utts:
+                dacn = self.parse_normalised(normalised_utts[key], verbose)
+            else:
+                dacn = dict_cns[key]
+
+            dacn_list.append((prob, dacn))
+
+        dacn = merge_slu_confnets(dacn_list)
+        dacn.prune()
+        dacn.sort()
+
+        return dacn
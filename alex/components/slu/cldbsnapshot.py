@@ -0,0 +1,316 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+# This code is almost PEP8-compliant. See
+# http://www.python.org/dev/peps/pep-0008.
+
+"""
+Compiles a category label database into a binary snapshot and reads it.
+
+The snapshot is memory mapped read-only, therefore all processes loading the same snapshot share one copy of it
+in the page cache, and loading it takes constant time. The snapshot contains:
+
+    - an interned vocabulary of the tokens of the surface forms sorted by their UTF-8 encoding,
+    - the tables of the values and of the category labels,
+    - the surface forms as sequences of token ids sorted lexicographically,
+    - for each surface form, the list of its (value id, category label id) pairs.
+
+All integers are little-endian unsigned 32 bit integers.
+
+Usage:
+
+    cldbsnapshot.py database.py database.cldb
+
+"""
+
+if __name__ == '__main__':
+    import autopath
+
+import argparse
+import mmap
+import struct
+import numpy as np
+
+from alex.components.slu.exceptions import SLUException
+
+MAGIC = b'CLDB'
+VERSION = 1
+
+# magic, version, the number of tokens, values, labels, forms, tokens in all forms and (value, label) entries
+HEADER = struct.Struct('<4s7I')
+
+
+def is_cldb_snapshot(file_name):
+    """Return True if the file is a compiled category label database snapshot."""
+    try:
+        with open(file_name, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except IOError:
+        return False
+
+
+def _pad(data):
+    return data + b'\x00' * (-len(data) % 4)
+
+
+def _uint32(values):
+    return np.array(values, dtype='<u4').tostring()
+
+
+def _string_table(strings):
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.cumsum([0] + [len(s) for s in encoded])
+    return _uint32(offsets) + _pad(b''.join(encoded))
+
+
+def write_cldb_snapshot(cldb, file_name):
+    """Compile the loaded category label database into a snapshot file."""
+    entries = {}
+    for form, value, label in cldb:
+        entries.setdefault(tuple(unicode(w) for w in form), set()).add((unicode(value), unicode(label)))
+
+    tokens = sorted(set(w for form in entries for w in form), key=lambda w: w.encode('utf-8'))
+    token_ids = dict((w, i) for i, w in enumerate(tokens))
+    values = sorted(set(v for form_entries in entries.itervalues() for v, l in form_entries))
+    value_ids = dict((v, i) for i, v in enumerate(values))
+    labels = sorted(set(l for form_entries in entries.itervalues() for v, l in form_entries))
+    label_ids = dict((l, i) for i, l in enumerate(labels))
+
+    forms = sorted((tuple(token_ids[w] for w in form), form) for form in entries)
+
+    form_offsets = np.cumsum([0] + [len(ids) for ids, form in forms])
+    form_tokens = [i for ids, form in forms for i in ids]
+    form_entries = [sorted((value_ids[v], label_ids[l]) for v, l in entries[form]) for ids, form in forms]
+    entry_offsets = np.cumsum([0] + [len(e) for e in form_entries])
+    entry_ids = [i for e in form_entries for pair in e for i in pair]
+
+    with open(file_name, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(tokens), len(values), len(labels), len(forms),
+                            len(form_tokens), len(entry_ids) / 2))
+        f.write(_string_table(tokens))
+        f.write(_string_table(values))
+        f.write(_string_table(labels))
+        f.write(_uint32(form_offsets))
+        f.write(_uint32(form_tokens))
+        f.write(_uint32(entry_offsets))
+        f.write(_uint32(entry_ids))
+
+
+class StringTable(object):
+    """A table of UTF-8 strings in the snapshot."""
+    def __init__(self, mm, pos, n):
+        self.mm = mm
+        self.offsets = np.frombuffer(mm, dtype='<u4', count=n + 1, offset=pos)
+        self.data_pos = pos + 4 * (n + 1)
+        self.end = self.data_pos + int(self.offsets[-1])
+        self.end += -self.end % 4
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get_bytes(self, i):
+        return self.mm[self.data_pos + int(self.offsets[i]):self.data_pos + int(self.offsets[i + 1])]
+
+    def __getitem__(self, i):
+        return self.get_bytes(i).decode('utf-8')
+
+    def index(self, s):
+        """Return the index of the string in the sorted table or None."""
+        s = s.encode('utf-8')
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.get_bytes(mid) < s:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self.get_bytes(lo) == s:
+            return lo
+        return None
+
+
+class CLDBSnapshot(object):
+    """A memory mapped category label database snapshot."""
+    def __init__(self, file_name):
+        with open(file_name, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n_tokens, n_values, n_labels, n_forms, n_form_tokens, n_entries = \
+            HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise SLUException("%s is not a category label database snapshot." % file_name)
+        if version != VERSION:
+            raise SLUException("The category label database snapshot %s has version %d, version %d is required. "
+                               "Compile it again." % (file_name, version, VERSION))
+
+        self.tokens = StringTable(self.mm, HEADER.size, n_tokens)
+        self.values = StringTable(self.mm, self.tokens.end, n_values)
+        self.labels = StringTable(self.mm, self.values.end, n_labels)
+
+        pos = self.labels.end
+        self.form_offsets = np.frombuffer(self.mm, dtype='<u4', count=n_forms + 1, offset=pos)
+        pos += 4 * (n_forms + 1)
+        self.form_tokens = np.frombuffer(self.mm, dtype='<u4', count=n_form_tokens, offset=pos)
+        pos += 4 * n_form_tokens
+        self.entry_offsets = np.frombuffer(self.mm, dtype='<u4', count=n_forms + 1, offset=pos)
+        pos += 4 * (n_forms + 1)
+        self.entries = np.frombuffer(self.mm, dtype='<u4', count=2 * n_entries, offset=pos).reshape((n_entries, 2))
+
+        # the ids of the words looked up in this process
+        self.token_ids = {}
+
+    def __len__(self):
+        return len(self.form_offsets) - 1
+
+    def token_id(self, word):
+        try:
+            return self.token_ids[word]
+        except KeyError:
+            token_id = self.token_ids[word] = self.tokens.index(unicode(word))
+            return token_id
+
+    def form_ids(self, i):
+        return self.form_tokens[self.form_offsets[i]:self.form_offsets[i + 1]].tolist()
+
+    def form(self, i):
+        return tuple(self.tokens[t] for t in self.form_ids(i))
+
+    def form_index(self, form):
+        """Return the index of the surface form (a sequence of words) or None."""
+        ids = [self.token_id(w) for w in form]
+        if not ids or None in ids:
+            return None
+
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.form_ids(mid) < ids:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self.form_ids(lo) == ids:
+            return lo
+        return None
+
+    def value_labels(self, i):
+        """Return the list of (value, category label) pairs of the i-th surface form."""
+        return [(self.values[v], self.labels[l])
+                for v, l in self.entries[self.entry_offsets[i]:self.entry_offsets[i + 1]].tolist()]
+
+    def __iter__(self):
+        """Yields tuples (form, value, category) from the snapshot."""
+        for i in xrange(len(self)):
+            form = self.form(i)
+            for value, label in self.value_labels(i):
+                yield form, value, label
+
+    def _narrow(self, lo, hi, depth, token_id):
+        """Return the range of the forms in [lo, hi) which have the token at the depth.
+
+        All forms in [lo, hi) share the same first depth tokens; the forms with exactly depth tokens are first.
+        """
+        def key(i):
+            if self.form_offsets[i + 1] - self.form_offsets[i] <= depth:
+                return -1
+            return self.form_tokens[self.form_offsets[i] + depth]
+
+        a, b = lo, hi
+        while a < b:
+            mid = (a + b) // 2
+            if key(mid) < token_id:
+                a = mid + 1
+            else:
+                b = mid
+        start = a
+
+        b = hi
+        while a < b:
+            mid = (a + b) // 2
+            if key(mid) <= token_id:
+                a = mid + 1
+            else:
+                b = mid
+
+        return start, a
+
+    def find_forms(self, utterance):
+        """Finds the leftmost longest surface forms in the utterance, see CategoryLabelDatabase.find_forms."""
+        spans = []
+
+        start = 0
+        while start < len(utterance):
+            lo, hi = 0, len(self)
+            match = None
+            for end in xrange(start, len(utterance)):
+                token_id = self.token_id(utterance[end])
+                if token_id is None:
+                    break
+                lo, hi = self._narrow(lo, hi, end - start, token_id)
+                if lo == hi:
+                    break
+                if self.form_offsets[lo + 1] - self.form_offsets[lo] == end - start + 1:
+                    match = (start, end + 1, lo)
+
+            if match:
+                spans.append((match[0], match[1], self.form(match[2])))
+                # skip all substring for this form
+                start = match[1]
+            else:
+                start += 1
+
+        return spans
+
+
+class SnapshotForm2Value2CL(object):
+    """A read-only view of a snapshot with the interface of CategoryLabelDatabase.form2value2cl.
+
+    For a surface form, it returns a dictionary mapping the values to dictionaries of their category labels.
+    """
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __contains__(self, form):
+        return self.snapshot.form_index(form) is not None
+
+    def __getitem__(self, form):
+        i = self.snapshot.form_index(form)
+        if i is None:
+            return {}
+
+        value2cl = {}
+        for value, label in self.snapshot.value_labels(i):
+            value2cl.setdefault(value, {})[label] = 1
+        return value2cl
+
+    def __iter__(self):
+        for i in xrange(len(self.snapshot)):
+            yield self.snapshot.form(i)
+
+    def __len__(self):
+        return len(self.snapshot)
+
+    def iterkeys(self):
+        return iter(self)
+
+    def keys(self):
+        return list(self)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="""Compiles a category label database into a binary snapshot which can be loaded by
+        CategoryLabelDatabase instead of the database module.""")
+
+    parser.add_argument('database', help='the category label database module, e.g. data/database.py')
+    parser.add_argument('snapshot', help='the output snapshot file, e.g. data/database.cldb')
+
+    args = parser.parse_args()
+
+    from alex.components.slu.base import CategoryLabelDatabase
+
+    cldb = CategoryLabelDatabase(args.database)
+    write_cldb_snapshot(cldb, args.snapshot)
+
+
+if __name__ == '__main__':
+    main()
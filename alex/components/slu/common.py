@@ -35,7 +35,7 @@ def slu_factory(cfg, slu_type=None):
         cldb = CategoryLabelDatabase(cfg['SLU'][slu_type]['cldb_fname'])
         preprocessing = cfg['SLU'][slu_type]['preprocessing_cls'](cldb)
         slu = slu_type(cldb, preprocessing)
-        slu.load_model(cfg['SLU'][slu_type]['model_fname'])
+        slu.load_model(cfg['SLU'][slu_type]['model_fname'], compiled=cfg['SLU'][slu_type].get('compiled', False))
         return slu
     elif inspect.isclass(slu_type) and issubclass(slu_type, SLUInterface):
         cldb = CategoryLabelDatabase(cfg['SLU'][slu_type]['cldb_fname'])
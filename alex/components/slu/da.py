@@ -9,13 +9,14 @@ import codecs
 
 from operator import xor
 from collections import defaultdict
+from itertools import islice
 
 from alex.corpustools.wavaskey import load_wavaskey, save_wavaskey
 from alex.components.slu.exceptions import SLUException, DialogueActException, DialogueActItemException, \
     DialogueActConfusionNetworkException
 from alex.ml.exceptions import NBListException
 from alex.ml.features import Abstracted
-from alex.ml.hypothesis import Hypothesis, NBList, ConfusionNetwork
+from alex.ml.hypothesis import Hypothesis, NBList, ConfusionNetwork, iter_kbest
 from alex.utils.text import split_by
 
 
@@ -659,33 +660,21 @@ class DialogueActNBList(SLUHypothesis, NBList):
         except NBListException as e:
             raise DialogueActNBListException(e)
 
-    def merge(self):
-        """Adds up probabilities for the same hypotheses.  Takes care to keep
-        track of original, unnormalised DAI values.  Returns self."""
-        if len(self.n_best) <= 1:
-            return
-        else:
-            new_n_best = self.n_best[:1]
-
-            for cur_idx in xrange(1, len(self.n_best)):
-                cur_hyp = self.n_best[cur_idx]
-                for new_idx, new_hyp in enumerate(new_n_best):
-                    if new_hyp[1] == cur_hyp[1]:
-                        # Merge, add the probabilities.
-                        new_da = new_hyp[1]
-                        for dai in cur_hyp[1]:
-                            new_dais = (new_dai for new_dai in new_da if
-                                        new_dai == dai)
-                            for new_dai in new_dais:
-                                new_dai._unnorm_values.update(
-                                    dai._unnorm_values)
-                        new_hyp[0] += cur_hyp[0]
-                        break
-                else:
-                    new_n_best.append(cur_hyp)
+    def _fact_key(self, da):
+        # DAs are equal regardless of the order of their DAIs.
+        return tuple(sorted(da.dais))
 
-        self.n_best = sorted(new_n_best, reverse=True)
-        return self
+    def _merge_hyp(self, new_hyp, cur_hyp):
+        """Adds up probabilities for the same hypotheses.  Takes care to keep
+        track of original, unnormalised DAI values."""
+        new_da = new_hyp[1]
+        for dai in cur_hyp[1]:
+            new_dais = (new_dai for new_dai in new_da if
+                        new_dai == dai)
+            for new_dai in new_dais:
+                new_dai._unnorm_values.update(
+                    dai._unnorm_values)
+        new_hyp[0] += cur_hyp[0]
 
     def get_confnet(self):
         confnet = DialogueActConfusionNetwork()
@@ -827,46 +816,6 @@ class DialogueActConfusionNetwork(SLUHypothesis, ConfusionNetwork):
         # probabilities.
         return DialogueActHyp(logprob if use_log else prob, da)
 
-    def _get_prob(self, hyp_index, cn=None):
-        """Return a probability of the given hypothesis."""
-
-        if not cn:
-            cn = self
-
-        prob = 1.0
-        for i, (p, dai) in zip(hyp_index, cn):
-            if i == 0:
-                prob *= p
-            else:
-                prob *= (1 - p)
-
-        return prob
-
-    def _get_next_worse_candidates(self, hyp_index, cn=None):
-        """
-        Returns such hypotheses that will have lower probability.
-
-        """
-        if not cn:
-            cn = list(self)
-        worse_hyp = []
-
-        for i in range(len(hyp_index)):
-            wh = list(hyp_index)
-            wh[i] += 1
-            if cn[i][0] < 0.5 and wh[i] >= 2:
-                wh[i] = 0
-
-            if wh[i] >= 2:
-                # this generate inadmissible da hypothesis
-                # because there are only two alternatives - the DAI and the
-                # null() dialogue act
-                continue
-
-            worse_hyp.append(tuple(wh))
-
-        return worse_hyp
-
     def _get_hyp_index_dialogue_act(self, hyp_index, cn=None):
         if not cn:
             cn = self
@@ -881,78 +830,53 @@ class DialogueActConfusionNetwork(SLUHypothesis, ConfusionNetwork):
 
         return da
 
-    def get_da_nblist(self, n=10, prune_prob=0.005):
-        """Parses the input dialogue act item confusion network and generates N-best hypotheses.
+    def iter_da_hyps(self):
+        """Lazily generates the dialogue act hypotheses from the most to the
+        least probable one.
 
-        The result is a list of dialogue act hypotheses each with a with
-        assigned probability.  The list also include a dialogue act for not
-        having the correct dialogue act in the list - other().
+        Each dialogue act item has two alternatives, either it is present in
+        the dialogue act or not.
 
-        Generation of hypotheses will stop when the probability of the hypotheses is smaller then the ``prune_prob``.
+        Yields (probability, dialogue act) tuples.
 
         """
-
-        #print "cn", [(p, unicode(dai)) for p, dai in self.cn]
-
-        open_hyp = []
-        closed_hyp = {}
-
         cn = sorted(self, reverse=True)
 
-        for j, (p, dai) in enumerate(cn):
-            if p < 0.5:
-                i = j
-                break
-        else:
-            i = len(cn)
-
-        # create index for the best hypothesis
-        best_hyp = tuple([0,] * i + [1,] * (len(cn) - i))
-        best_prob = self._get_prob(best_hyp, cn=cn)
-        open_hyp.append((best_prob, best_hyp))
-        #print "i, bp, bh", i, best_prob, best_hyp
-
-        i = 0
-        while open_hyp and i < n*100:
-            i += 1
-
-            current_prob, current_hyp_index = open_hyp.pop(0)
+        # the more probable alternative comes first, 0 means that the DAI is present
+        alternatives = []
+        alt_hyp_index = []
+        for p, dai in cn:
+            if p >= 0.5:
+                alternatives.append([p, 1 - p])
+                alt_hyp_index.append((0, 1))
+            else:
+                alternatives.append([1 - p, p])
+                alt_hyp_index.append((1, 0))
 
-            if current_hyp_index not in closed_hyp:
-                # process only those hypotheses which were not processed so far
+        for prob, alt_index in iter_kbest(alternatives):
+            hyp_index = [alt_hyp_index[i][alt_idx] for i, alt_idx in enumerate(alt_index)]
+            yield (prob, self._get_hyp_index_dialogue_act(hyp_index, cn=cn))
 
-                closed_hyp[current_hyp_index] = current_prob
-                # print "current_prob, current_hyp_index:", current_prob, current_hyp_index
+    def get_da_nblist(self, n=10, prune_prob=0.005):
+        """Parses the input dialogue act item confusion network and generates N-best hypotheses.
 
-                for hyp_index in self._get_next_worse_candidates(current_hyp_index, cn=cn):
-                    # print hyp_index
-                    prob = self._get_prob(hyp_index, cn=cn)
-                    open_hyp.append((prob, hyp_index))
+        The result is a list of dialogue act hypotheses each with a with
+        assigned probability.  The list also include a dialogue act for not
+        having the correct dialogue act in the list - other().
 
-                open_hyp.sort(reverse=True)
+        Generation of hypotheses will stop when the probability of the hypotheses is smaller then the ``prune_prob``.
 
-            if len(closed_hyp) >= n:
-                break
+        """
 
         nblist = DialogueActNBList()
-        for idx in closed_hyp:
-            # print "p = ",closed_hyp[idx], "hyp = ", self._get_hyp_index_dialogue_act(idx)
-            nblist.add(closed_hyp[idx], self._get_hyp_index_dialogue_act(idx, cn=cn))
-
-        #print nblist
-        #print
+        for prob, da in islice(self.iter_da_hyps(), n):
+            nblist.add(prob, da)
 
         nblist.merge()
         nblist.add_other()
 
-        #print nblist
-        #print
-
         return nblist
 
-
-
-
     @classmethod
     def make_from_da(self, da):
         cn = DialogueActConfusionNetwork()
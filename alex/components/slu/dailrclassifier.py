@@ -13,7 +13,8 @@ import cPickle as pickle
 
 from collections import defaultdict
 from sklearn.linear_model import LogisticRegression
-from scipy.sparse import lil_matrix
+from scipy.sparse import lil_matrix, csr_matrix
+from scipy.special import expit
 
 from alex.components.asr.utterance import Utterance, UtteranceHyp, UtteranceNBList, UtteranceConfusionNetwork
 from alex.components.slu.exceptions import DAILRException
@@ -185,6 +186,8 @@ class DAILogRegClassifier(SLUInterface):
         self.cldb = cldb
         self.preprocessing = preprocessing
 
+        self.compiled_weights = None
+
     def __repr__(self):
         r = "DAILogRegClassifier({cldb},{preprocessing},{features_size})"\
             .format(cldb=self.cldb, preprocessing=self.preprocessing, features_size=self.features_size)
@@ -200,31 +203,12 @@ class DAILogRegClassifier(SLUInterface):
 
         abs_utts = []
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            u = copy.deepcopy(utterance)
-                            u = u.replace2(start, end, 'CL_' + c.upper())
-
-                            abs_utts.append((u, f, v, c))
-
-                    #print f
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    u = utterance.replace2(start, end, 'CL_' + c.upper())
 
+                    abs_utts.append((u, f, v, c))
 
         return abs_utts
 
@@ -243,21 +227,15 @@ class DAILogRegClassifier(SLUInterface):
         if not form:
             return abs_utt
 
+        form = list(form)
         start = 0
         while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f, form
-
-                if f == form:
-                    abs_utt = abs_utt.replace2(start, end, c)
+            end = start + len(form)
+            if utterance[start:end] == form:
+                abs_utt = abs_utt.replace2(start, end, c)
 
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
+                # skip all substring for this form
+                start = end
             else:
                 start += 1
 
@@ -273,25 +251,10 @@ class DAILogRegClassifier(SLUInterface):
 
         abs_utt = copy.deepcopy(utterance)
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            abs_utt = abs_utt.replace2(start, end, 'CL_OTHER_' + c.upper())
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    abs_utt = abs_utt.replace2(start, end, 'CL_OTHER_' + c.upper())
 
         return abs_utt
 
@@ -325,26 +288,13 @@ class DAILogRegClassifier(SLUInterface):
 
         fvcs = set()
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-
-                # this looks for an exact surface form in the CLDB
-                # however, we could also search for those withing a some distance from the exact surface form,
-                # for example using a string edit distance
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            fvcs.add((f, v, c))
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        # this looks for an exact surface form in the CLDB
+        # however, we could also search for those withing a some distance from the exact surface form,
+        # for example using a string edit distance
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    fvcs.add((f, v, c))
 
         return fvcs
 
@@ -667,6 +617,7 @@ class DAILogRegClassifier(SLUInterface):
 
     def train(self, inverse_regularisation=1.0, verbose=True):
         self.trained_classifiers = {}
+        self.compiled_weights = None
 
         if verbose:
             print '=' * 120
@@ -708,7 +659,14 @@ class DAILogRegClassifier(SLUInterface):
         with open_meth(file_name, 'wb') as outfile:
             pickle.dump(data, outfile)
 
-    def load_model(self, file_name):
+    def load_model(self, file_name, compiled=False):
+        """
+        Loads the trained classifiers from a file.
+
+        :param file_name: a name of the model file
+        :param compiled: if True, the loaded classifiers are converted into the compiled form used for fast parsing,
+                         see :meth:`compile_model`
+        """
         # Handle gzipped files.
         if file_name.endswith('gz'):
             import gzip
@@ -721,6 +679,92 @@ class DAILogRegClassifier(SLUInterface):
             (self.classifiers_features_list, self.classifiers_features_mapping, self.trained_classifiers,
              self.parsed_classifiers, self.features_size) = pickle.load(model_file)
 
+        self.compiled_weights = None
+        if compiled:
+            self.compile_model()
+
+    def compile_model(self):
+        """
+        Stacks the weights of all trained classifiers into a single sparse weight matrix over a shared feature index.
+
+        Each classifier uses its own feature mapping; here, all features with a non-zero weight in any classifier
+        are mapped into one shared index so that one turn can be scored by a single matrix product in
+        :meth:`parse_X_compiled` instead of calling ``predict_proba`` of every classifier.
+        """
+        self.compiled_classifiers = sorted(self.trained_classifiers)
+        self.compiled_features_mapping = {}
+        self.compiled_category_labels = set()
+
+        data, rows, cols = [], [], []
+        intercepts = np.zeros(len(self.compiled_classifiers))
+        for j, clser in enumerate(self.compiled_classifiers):
+            lr = self.trained_classifiers[clser]
+            coef = lr.coef_[0]
+            for f, i in self.classifiers_features_mapping[clser].iteritems():
+                if coef[i] != 0.0:
+                    k = self.compiled_features_mapping.setdefault(f, len(self.compiled_features_mapping))
+                    data.append(coef[i])
+                    rows.append(k)
+                    cols.append(j)
+            intercepts[j] = lr.intercept_[0]
+
+            value = self.parsed_classifiers[clser].value
+            if value and value.startswith('CL_'):
+                self.compiled_category_labels.add(value)
+
+        self.compiled_weights = csr_matrix((data, (rows, cols)),
+                                           shape=(len(self.compiled_features_mapping), len(self.compiled_classifiers)))
+        self.compiled_intercepts = intercepts
+
+    def parse_X_compiled(self, utterance, utterance_fvcs, verbose=False):
+        """
+        Parses the already normalised utterance using the compiled model.
+
+        The features are extracted once for the concrete classifiers and once for each form, value, category label
+        tuple matching some abstracted classifier. All of them are scored by all classifiers in one matrix product.
+
+        :param utterance: the utterance being processed in multiple formats
+        :param utterance_fvcs: the form, value, category label tuples found in the utterance
+        :return: the dialogue act confusion network
+        """
+        contexts = [(None, None, None), ]
+        for f, v, c in utterance_fvcs:
+            cc = "CL_" + c.upper()
+            if cc in self.compiled_category_labels:
+                contexts.append((f, v, cc))
+
+        data, rows, cols = [], [], []
+        for i, fvc in enumerate(contexts):
+            d, c = self.get_features(utterance, fvc, utterance_fvcs).get_feature_vector_lil(self.compiled_features_mapping)
+            data.extend(d)
+            cols.extend(c)
+            rows.extend([i] * len(c))
+
+        inputs = csr_matrix((data, (rows, cols)), shape=(len(contexts), len(self.compiled_features_mapping)))
+        probs = expit(inputs.dot(self.compiled_weights).toarray() + self.compiled_intercepts)
+
+        da_confnet = DialogueActConfusionNetwork()
+        for j, clser in enumerate(self.compiled_classifiers):
+            parsed_clser = self.parsed_classifiers[clser]
+
+            if parsed_clser.value and parsed_clser.value.startswith('CL_'):
+                # process abstracted classifiers
+                for i, (f, v, cc) in enumerate(contexts):
+                    if parsed_clser.value == cc:
+                        dai = DialogueActItem(parsed_clser.dat, parsed_clser.name, v)
+                        da_confnet.add_merge(probs[i, j], dai, combine='max')
+            else:
+                # process concrete classifiers
+                da_confnet.add_merge(probs[0, j], parsed_clser, combine='max')
+
+            if verbose:
+                print "Using classifier: ", unicode(clser)
+                print '  Probabilities:', probs[:, j]
+
+        da_confnet.sort().prune()
+
+        return da_confnet
+
     def parse_X(self, utterance, verbose=False):
         if verbose:
             print '='*120
@@ -736,6 +780,8 @@ class DAILogRegClassifier(SLUInterface):
             print unicode(utterance)
             print unicode(utterance_fvcs)
 
+        if self.compiled_weights is not None:
+            return self.parse_X_compiled(utterance, utterance_fvcs, verbose)
 
         da_confnet = DialogueActConfusionNetwork()
         for clser in self.trained_classifiers:
@@ -17,7 +17,7 @@ from alex.components.asr.utterance import Utterance, UtteranceHyp, UtteranceNBLi
 from alex.components.slu.exceptions import DAILRException
 from alex.components.slu.base import SLUInterface
 from alex.components.slu.da import DialogueActItem, DialogueActConfusionNetwork
-from alex.ml import tffnn
+from alex.ml import nffnn
 from alex.utils.cache import lru_cache
 
 CONFNET2NBLIST_EXPANSION_APPROX = 40
@@ -198,31 +198,12 @@ class DAINNClassifier(SLUInterface):
 
         abs_utts = []
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            u = copy.deepcopy(utterance)
-                            u = u.replace2(start, end, 'CL_' + c.upper())
-
-                            abs_utts.append((u, f, v, c))
-
-                    #print f
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    u = utterance.replace2(start, end, 'CL_' + c.upper())
 
+                    abs_utts.append((u, f, v, c))
 
         return abs_utts
 
@@ -241,21 +222,15 @@ class DAINNClassifier(SLUInterface):
         if not form:
             return abs_utt
 
+        form = list(form)
         start = 0
         while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f, form
+            end = start + len(form)
+            if utterance[start:end] == form:
+                abs_utt = abs_utt.replace2(start, end, c)
 
-                if f == form:
-                    abs_utt = abs_utt.replace2(start, end, c)
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
+                # skip all substring for this form
+                start = end
             else:
                 start += 1
 
@@ -271,25 +246,10 @@ class DAINNClassifier(SLUInterface):
 
         abs_utt = copy.deepcopy(utterance)
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            abs_utt = abs_utt.replace2(start, end, 'CL_OTHER_' + c.upper())
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    abs_utt = abs_utt.replace2(start, end, 'CL_OTHER_' + c.upper())
 
         return abs_utt
 
@@ -323,26 +283,13 @@ class DAINNClassifier(SLUInterface):
 
         fvcs = set()
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-
-                # this looks for an exact surface form in the CLDB
-                # however, we could also search for those withing a some distance from the exact surface form,
-                # for example using a string edit distance
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            fvcs.add((f, v, c))
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        # this looks for an exact surface form in the CLDB
+        # however, we could also search for those withing a some distance from the exact surface form,
+        # for example using a string edit distance
+        for start, end, f in self.cldb.find_forms(utterance):
+            for v in self.cldb.form2value2cl[f]:
+                for c in self.cldb.form2value2cl[f][v]:
+                    fvcs.add((f, v, c))
 
         return fvcs
 
@@ -664,6 +611,9 @@ class DAINNClassifier(SLUInterface):
             self.prune_features(clser, min_pos_feature_count, min_neg_feature_count, verbose = (verbose or verbose2))
 
     def train(self, inverse_regularisation=1.0, verbose=True):
+        # Theano is needed only for training, the trained classifiers are loaded without it
+        from alex.ml import tffnn
+
         self.trained_classifiers = {}
 
         if verbose:
@@ -798,11 +748,11 @@ class DAINNClassifier(SLUInterface):
         with open_meth(file_name, 'rb') as model_file:
             (self.classifiers_features_list, self.classifiers_features_mapping,
              self.trained_classifiers_params, self.parsed_classifiers,
-             self.features_size) = pickle.load(model_file)
+             self.features_size) = nffnn.load_pickle(model_file)
 
         self.trained_classifiers = {}
         for clser in self.trained_classifiers_params:
-            self.trained_classifiers[clser] = tffnn.TheanoFFNN()
+            self.trained_classifiers[clser] = nffnn.NumpyFFNN()
             self.trained_classifiers[clser].set_params(self.trained_classifiers_params[clser])
     		
     def parse_X(self, utterance, verbose=False):
@@ -0,0 +1,169 @@
+# encoding: utf8
+from __future__ import unicode_literals
+
+import os
+import tempfile
+
+from unittest import TestCase
+
+from alex.components.slu.base import CategoryLabelDatabase, SLUPreprocessing
+from alex.components.slu.exceptions import SLUException
+from alex.components.asr.utterance import Utterance, UtteranceNBList, UtteranceConfusionNetwork
+
+
+class TestCategoryLabelDatabase(TestCase):
+    def setUp(self):
+        class db:
+            database = {
+                "task": {
+                    "find_connection": ["najít spojení", "najít spoj", "spojení", "spoj"],
+                    "find_platform": ["najít nástupiště"],
+                },
+                "stop": {
+                    "Anděl": ["anděl", "na anděl"],
+                    "Malostranská": ["malostranská"],
+                },
+            }
+
+        self.cldb = CategoryLabelDatabase()
+        self.cldb.load(db_mod=db)
+
+    def test_find_forms(self):
+        utterance = Utterance('chci najít spojení na anděl z anděl')
+        self.assertEqual(self.cldb.find_forms(utterance),
+                         [(1, 3, ('najít', 'spojení')),
+                          (3, 5, ('na', 'anděl')),
+                          (6, 7, ('anděl',))])
+
+    def test_find_forms_longest_match(self):
+        # "najít" alone is not a form; "najít nástupiště" is the longest match
+        self.assertEqual(self.cldb.find_forms(Utterance('najít nástupiště')),
+                         [(0, 2, ('najít', 'nástupiště'))])
+        self.assertEqual(self.cldb.find_forms(Utterance('najít spoj malostranská')),
+                         [(0, 2, ('najít', 'spoj')),
+                          (2, 3, ('malostranská',))])
+        self.assertEqual(self.cldb.find_forms(Utterance('najít')), [])
+        self.assertEqual(self.cldb.find_forms(Utterance('')), [])
+
+    def test_find_forms_matches_substring_search(self):
+        words = ['najít', 'spojení', 'spoj', 'na', 'anděl', 'nástupiště', 'z']
+
+        def substring_search(utterance):
+            spans = []
+            start = 0
+            while start < len(utterance):
+                for end in range(len(utterance), start, -1):
+                    f = tuple(utterance[start:end])
+                    if f in self.cldb.form2value2cl:
+                        spans.append((start, end, f))
+                        start = end
+                        break
+                else:
+                    start += 1
+            return spans
+
+        for i in range(len(words)):
+            for j in range(len(words)):
+                utterance = Utterance(' '.join(words[i:] + words[:j]))
+                self.assertEqual(self.cldb.find_forms(utterance), substring_search(utterance))
+
+
+class TestCategoryLabelDatabaseSnapshot(TestCategoryLabelDatabase):
+    """Runs the tests above with the database loaded from a compiled snapshot."""
+    def setUp(self):
+        super(TestCategoryLabelDatabaseSnapshot, self).setUp()
+        self.source_cldb = self.cldb
+
+        handle, self.file_name = tempfile.mkstemp('.cldb')
+        os.close(handle)
+        self.source_cldb.save_snapshot(self.file_name)
+
+        self.cldb = CategoryLabelDatabase(self.file_name)
+
+    def tearDown(self):
+        os.remove(self.file_name)
+
+    def test_views(self):
+        self.assertNotIn('synonym_value_category', self.cldb.__dict__)
+
+        self.assertEqual(self.cldb.form2value2cl[('na', 'anděl')], {'Anděl': {'stop': 1}})
+        self.assertIn(('spoj', ), self.cldb.form2value2cl)
+        self.assertNotIn(('na', ), self.cldb.form2value2cl)
+        self.assertEqual(sorted(self.cldb.form2value2cl), sorted(self.source_cldb.form2value2cl))
+
+        self.assertEqual(sorted(self.cldb), sorted(self.source_cldb))
+        self.assertEqual(sorted(self.cldb.synonym_value_category), sorted(self.source_cldb.synonym_value_category))
+        self.assertEqual(len(self.cldb.forms[0]), 2)
+        self.assertEqual(self.cldb.database['stop']['Anděl'], [('anděl', ), ('na', 'anděl')])
+        self.assertEqual(self.cldb.form_trie, self.source_cldb.form_trie)
+
+    def test_version(self):
+        with open(self.file_name, 'r+b') as f:
+            f.seek(4)
+            f.write(b'\xff')
+
+        self.assertRaises(SLUException, CategoryLabelDatabase, self.file_name)
+
+
+class TestSLUPreprocessing(TestCase):
+    def setUp(self):
+        self.mapping = [
+            (['uhm'], []),
+            (["i'm"], ['i', 'am']),
+            (['a', 'a'], ['a']),
+            (['b', 'c'], ['c', 'd', 'b']),
+            (['d', 'b'], ['e']),
+            (['i', 'am'], ['iam']),
+        ]
+        self.preprocessing = SLUPreprocessing(None, self.mapping)
+
+    def replace_all(self, utterance):
+        utterance = Utterance(utterance).lower()
+        for source, target in self.mapping:
+            utterance = utterance.replace_all(source, target)
+        return utterance
+
+    def test_normalise_utterance(self):
+        for text in ["uhm I'm here", "a a a a", "b c c", "x b c b c y", "a a b c uhm", "", "nothing to do"]:
+            self.assertEqual(self.preprocessing.normalise_utterance(Utterance(text)), self.replace_all(text))
+
+        utterance = Utterance("x y")
+        self.assertIs(self.preprocessing.normalise_utterance(utterance), utterance)
+
+    def test_mapping_not_shared(self):
+        class Preprocessing(SLUPreprocessing):
+            def __init__(self, cldb):
+                super(Preprocessing, self).__init__(cldb)
+                self.text_normalization_mapping += [(['x'], ['y'])]
+
+        Preprocessing(None)
+        preprocessing = Preprocessing(None)
+        self.assertEqual(len(preprocessing.text_normalization_mapping),
+                         len(SLUPreprocessing.text_normalization_mapping) + 1)
+        self.assertEqual(preprocessing.normalise_utterance(Utterance("UM x")), Utterance("y"))
+
+    def test_normalise_nblist(self):
+        nblist = UtteranceNBList()
+        nblist.add(0.6, Utterance("UHM I'm a a"))
+        nblist.add(0.4, Utterance("b c"))
+
+        normalised = self.preprocessing.normalise_nblist(nblist)
+
+        self.assertEqual([[p, unicode(u)] for p, u in normalised],
+                         [[0.6, "iam a"], [0.4, "c e"]])
+        # the original n-best list is not modified
+        self.assertEqual([[p, unicode(u)] for p, u in nblist],
+                         [[0.6, "UHM I'm a a"], [0.4, "b c"]])
+
+    def test_normalise_confnet(self):
+        confnet = UtteranceConfusionNetwork()
+        confnet.add([[0.7, "UHM"], [0.3, "I'm"]])
+        confnet.add([[0.8, "here"], [0.2, "there"]])
+
+        normalised = self.preprocessing.normalise_confnet(confnet)
+
+        self.assertNotIn("uhm", normalised._wordset)
+        self.assertNotIn("i'm", normalised._wordset)
+        self.assertIn("iam", normalised._wordset)
+        # the original confnet is not modified
+        self.assertEqual(confnet._wordset, set(["UHM", "I'm", "here", "there"]))
@@ -36,6 +36,18 @@ class TestDA(unittest.TestCase):
 
         self.assertEqual(nblist1, nblist2)
 
+    def test_merge_reordered_dais(self):
+        nblist = DialogueActNBList()
+        nblist.add(0.4, DialogueAct("inform(food=chinese)&hello()"))
+        nblist.add(0.3, DialogueAct("bye()"))
+        nblist.add(0.2, DialogueAct("hello()&inform(food=chinese)"))
+        nblist.merge()
+
+        self.assertEqual(len(nblist), 2)
+        self.assertAlmostEqual(nblist[0][0], 0.6)
+        self.assertEqual(nblist[0][1], DialogueAct("hello()&inform(food=chinese)"))
+        self.assertEqual(nblist[1][1], DialogueAct("bye()"))
+
     def test_merge_slu_nblists_full_nbest_lists(self):
         # make sure the alex.components.slu.da.merge_slu_nblists merges nblists correctly
 
@@ -116,10 +128,10 @@ class TestDialogueActConfusionNetwork(TestCase):
         dai = DialogueActItem(dai='inform(food=chinese)')
         dacn = DialogueActConfusionNetwork()
         dacn.add_merge(0.5, dai, combine='add')
-        self.assertEqual(dacn._get_prob([0]), 0.5)
+        self.assertEqual(dacn.get_prob(dai), 0.5)
 
         dacn.add_merge(0.5, dai, combine='add')
-        self.assertEqual(dacn._get_prob([0]), 1.0)
+        self.assertEqual(dacn.get_prob(dai), 1.0)
 
     def test_get_best_da(self):
         dacn = DialogueActConfusionNetwork()
@@ -226,14 +238,24 @@ class TestDialogueActConfusionNetwork(TestCase):
         self.assertEqual(len(best_hyp.da), 2)
         self.assertTrue(DialogueActItem(dai='inform(food=czech)') in best_hyp.da)
 
-    def test_get_prob(self):
+    def test_iter_da_hyps(self):
         dacn = DialogueActConfusionNetwork()
         dacn.add(0.2, DialogueActItem(dai='inform(food=chinese)'))
         dacn.add(0.7, DialogueActItem(dai='inform(food=czech)'))
         dacn.add(0.1, DialogueActItem(dai='inform(food=russian)'))
 
-        self.assertAlmostEqual(dacn._get_prob([0, 1, 1]), 0.2 * 0.3 * 0.9)
-        self.assertAlmostEqual(dacn._get_prob([0, 0, 0]), 0.2 * 0.7 * 0.1)
+        hyps = list(dacn.iter_da_hyps())
+        self.assertEqual(len(hyps), 8)
+        self.assertAlmostEqual(sum(prob for prob, da in hyps), 1.0)
+
+        probs = dict((frozenset(unicode(dai) for dai in da), prob)
+                     for prob, da in hyps)
+        chinese = 'inform(food="chinese")'
+        czech = 'inform(food="czech")'
+        russian = 'inform(food="russian")'
+        self.assertAlmostEqual(probs[frozenset([chinese])], 0.2 * 0.3 * 0.9)
+        self.assertAlmostEqual(probs[frozenset([chinese, czech, russian])],
+                               0.2 * 0.7 * 0.1)
 
     def test_get_da_nblist(self):
         # Simple case with one good hypothesis.
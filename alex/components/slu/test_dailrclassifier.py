@@ -9,7 +9,7 @@ from alex.components.asr.utterance import Utterance, UtteranceNBList
 from alex.components.slu.da import DialogueAct, DialogueActItem
 
 class TestDAILogRegClassifier(TestCase):
-    def test_parse_X(self):
+    def _train_classifier(self):
         cldb = CategoryLabelDatabase()
         class db:
             database = {
@@ -52,6 +52,11 @@ class TestDAILogRegClassifier(TestCase):
 
         clf.train(inverse_regularisation=1e1, verbose=False)
 
+        return clf
+
+    def test_parse_X(self):
+        clf = self._train_classifier()
+
         # Parse some sentences.
         utterance_list = UtteranceNBList()
         utterance_list.add(0.7, Utterance('pocasi'))
@@ -62,4 +67,24 @@ class TestDAILogRegClassifier(TestCase):
 
 
         self.assertTrue(da_confnet.get_prob(DialogueActItem(dai='inform(task=weather)')) > 0.5)
-        self.assertTrue(da_confnet.get_prob(DialogueActItem(dai='inform(time=now)')) < 0.5)
\ No newline at end of file
+        self.assertTrue(da_confnet.get_prob(DialogueActItem(dai='inform(time=now)')) < 0.5)
+
+    def test_parse_X_compiled(self):
+        clf = self._train_classifier()
+
+        utterance_list = UtteranceNBList()
+        utterance_list.add(0.7, Utterance('pocasi'))
+        utterance_list.add(0.7, Utterance('pocasi jak bude teď'))
+        utterance_list.add(0.2, Utterance('hned'))
+
+        observations = [utterance_list, Utterance('jak bude pocasi'), Utterance('hned'), Utterance('')]
+        da_confnets = [clf.parse_X(obs) for obs in observations]
+
+        clf.compile_model()
+
+        for obs, da_confnet in zip(observations, da_confnets):
+            da_confnet_compiled = clf.parse_X(obs)
+
+            self.assertEqual(len(da_confnet), len(da_confnet_compiled))
+            for p, dai in da_confnet:
+                self.assertAlmostEqual(p, da_confnet_compiled.get_prob(dai))
@@ -80,3 +80,13 @@ class TestDAINNClassifier(TestCase):
 
         self.assertTrue(da_confnet.get_prob(DialogueActItem(dai='inform(task=weather)')) != 0.0)
         self.assertTrue(da_confnet.get_prob(DialogueActItem(dai='inform(time=now)')) != 0.0)
+
+        # The saved classifiers are loaded without Theano and parse the same.
+        model_file = os.path.join(self.tmp_dir, 'dainn.model')
+        clf.save_model(model_file)
+        loaded_clf = DAINNClassifier(cldb, preprocessing, features_size=4)
+        loaded_clf.load_model(model_file)
+        loaded_da_confnet = loaded_clf.parse_X(utterance_list, verbose=False)
+
+        for prob, dai in da_confnet:
+            self.assertAlmostEqual(loaded_da_confnet.get_prob(dai), prob, places=5)
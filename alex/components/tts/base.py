@@ -1,9 +1,16 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+from alex.utils.cache import persistent_cache_store
+
+
 class TTSInterface(object):
     def __init__(self, cfg):
         self.cfg = cfg
 
+        # the persistent cache of the synthesized audio shared by the TTS engines
+        cache_cfg = self.cfg['TTS'].get('persistent_cache', {})
+        persistent_cache_store.configure(cache_cfg.get('file_name'), cache_cfg.get('max_size'))
+
     def synthesize(self, text):
         raise NotImplementedError("TTS")
@@ -24,7 +24,7 @@ class FliteTTS(TTSInterface):
         super(FliteTTS, self).__init__(cfg)
         self.preprocessing = TTSPreprocessing(self.cfg, self.cfg['TTS']['Flite']['preprocessing'])
 
-    @cache.persistent_cache(True, 'FliteTTS.get_tts_wav.')
+    @cache.persistent_cache(True, 'FliteTTS.get_tts_wav.', store=cache.persistent_cache_store)
     def get_tts_wav(self, voice, text):
         """Runs flite from the command line and gets the synthesized audio.
         Note that the returned audio is in the re-sampled PCM audio format.
@@ -30,7 +30,7 @@ class GoogleTTS(TTSInterface):
         self.preprocessing = TTSPreprocessing(
             self.cfg, self.cfg['TTS']['Google']['preprocessing'])
 
-    @cache.persistent_cache(True, 'GoogleTTS.get_tts_mp3.')
+    @cache.persistent_cache(True, 'GoogleTTS.get_tts_mp3.', store=cache.persistent_cache_store)
     def get_tts_mp3(self, language, text, rate=1.0):
         """
         Access Google TTS service and get synthesized audio.
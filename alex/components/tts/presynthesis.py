@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import collections
+import threading
+
+
+class PromptCache(object):
+    """Bounded in-memory cache of synthesized audio.
+
+    The least recently used entries are evicted when the total size of the stored audio exceeds max_size bytes.
+    For each entry, the time which its synthesis took is stored, so that the cache can report how much time
+    the hits saved. The cache can be used from several threads.
+
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_time = 0.0
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def get(self, key):
+        """Return the audio stored under the key or None, and count the hit or the miss."""
+        with self.lock:
+            try:
+                wav, synthesis_time = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+
+            # make it the most recently used entry
+            self.entries[key] = wav, synthesis_time
+            self.hits += 1
+            self.saved_time += synthesis_time
+
+            return wav
+
+    def set(self, key, wav, synthesis_time):
+        """Store the audio and the time which its synthesis took."""
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key)[0])
+
+            self.entries[key] = wav, synthesis_time
+            self.size += len(wav)
+
+            while self.size > self.max_size and len(self.entries) > 1:
+                self.size -= len(self.entries.popitem(last=False)[1][0])
+
+    def get_stats(self):
+        """Return the number of entries, hits and misses, the hit rate, and the synthesis time saved by the hits."""
+        with self.lock:
+            n = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'size': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / n if n else 0.0,
+                'saved_time': self.saved_time,
+            }
+
+    def __str__(self):
+        return "PROMPT CACHE: entries = {entries} size = {size} hits = {hits} misses = {misses} " \
+               "hit rate = {hit_rate:0.3f} saved t = {saved_time:0.4f}".format(**self.get_stats())
+
+
+class PromptPredictor(object):
+    """Predicts the next system prompt from the counts of the prompts which followed the previous prompts."""
+
+    def __init__(self):
+        self.last_prompt = None
+        self.counts = collections.defaultdict(collections.Counter)
+
+    def observe(self, prompt):
+        if self.last_prompt is not None:
+            self.counts[self.last_prompt][prompt] += 1
+        self.last_prompt = prompt
+
+    def predict(self, n):
+        """Return at most n prompts most likely following the last observed prompt."""
+        if self.last_prompt not in self.counts:
+            return []
+
+        return [prompt for prompt, count in self.counts[self.last_prompt].most_common(n)]
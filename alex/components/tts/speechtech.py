@@ -24,7 +24,7 @@ class SpeechtechTTS(TTSInterface):
         self.preprocessing = TTSPreprocessing(self.cfg, self.cfg['TTS']['SpeechTech']['preprocessing'])
 
     @cache.lru_cache(10000)
-    @cache.persistent_cache(True, 'SpeechtechTTS.get_tts_mp3.')
+    @cache.persistent_cache(True, 'SpeechtechTTS.get_tts_mp3.', store=cache.persistent_cache_store)
     def get_tts_mp3(self, voice, text):
         """ Access SpeechTech TTS service and get synthesized audio.
 
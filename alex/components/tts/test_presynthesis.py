@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+if __name__ == "__main__":
+    import autopath
+
+from alex.components.tts.presynthesis import PromptCache, PromptPredictor
+
+
+class TestPromptCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = PromptCache(30)
+
+        cache.set('a', 'a' * 10, 0.5)
+        cache.set('b', 'b' * 10, 0.5)
+        cache.set('c', 'c' * 10, 0.5)
+        # make 'a' the most recently used entry
+        self.assertEqual(cache.get('a'), 'a' * 10)
+        cache.set('d', 'd' * 10, 0.5)
+
+        self.assertNotIn('b', cache)
+        self.assertIn('a', cache)
+        self.assertIsNone(cache.get('b'))
+
+        stats = cache.get_stats()
+        self.assertEqual(stats['entries'], 3)
+        self.assertEqual(stats['size'], 30)
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+        self.assertEqual(stats['saved_time'], 0.5)
+
+        # an entry bigger than the whole cache is kept alone
+        cache.set('e', 'e' * 40, 0.5)
+        self.assertEqual(cache.get('e'), 'e' * 40)
+        self.assertEqual(cache.get_stats()['entries'], 1)
+
+
+class TestPromptPredictor(unittest.TestCase):
+    def test_predict(self):
+        predictor = PromptPredictor()
+        self.assertEqual(predictor.predict(2), [])
+
+        for prompt in ['hello', 'where from', 'where to', 'hello', 'where from', 'hello', 'where to']:
+            predictor.observe(prompt)
+
+        predictor.observe('hello')
+        self.assertEqual(predictor.predict(1), ['where from'])
+        self.assertEqual(predictor.predict(3), ['where from', 'where to'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,7 +24,7 @@ class VoiceRssTTS(TTSInterface):
         super(VoiceRssTTS, self).__init__(cfg)
         self.preprocessing = TTSPreprocessing(self.cfg, self.cfg['TTS']['VoiceRss']['preprocessing'])
 
-    @cache.persistent_cache(True, 'VoiceRssTTS.get_tts_mp3.')
+    @cache.persistent_cache(True, 'VoiceRssTTS.get_tts_mp3.', store=cache.persistent_cache_store)
     def get_tts_mp3(self, language, text):
         """Access the VoiceRss TTS service and get synthesized audio
         for a text.
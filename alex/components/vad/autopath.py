@@ -0,0 +1 @@
+../../utils/autopath.py
\ No newline at end of file
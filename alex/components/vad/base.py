@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import deque
+import numpy as np
+
+
+# the log posteriors of speech are clamped to this floor, so that a zero posterior does not make the running sum
+# infinite, and NaN once the -inf leaves the window
+LOG_PROB_FLOOR = np.log(np.finfo(np.float64).tiny)
+
+
+class MFCCVAD(object):
+    """ This is a base class of the voice activity detectors which classify frames of MFCC features.
+
+    It splits the input audio into frames, computes their features and smooths the log posteriors of speech
+    over the last filter_length frames. The derived classes implement only the scoring of the features.
+    """
+    def __init__(self, front_end, framesize, frameshift, filter_length):
+        self.front_end = front_end
+        self.framesize = framesize
+        self.frameshift = frameshift
+
+        self.audio_recorded_in = np.zeros((0, ), dtype=np.int16)
+
+        # the normalised log posteriors of speech for the last frames and their running sum
+        self.log_probs_speech = deque(maxlen=filter_length)
+        self.log_probs_speech_sum = 0.0
+
+        self.last_decision = 0.0
+
+    def reset(self):
+        """Forget the previous audio, e.g. after some frames were skipped and the input is not continuous."""
+        self.front_end.reset()
+        self.audio_recorded_in = np.zeros((0, ), dtype=np.int16)
+
+        self.log_probs_speech.clear()
+        self.log_probs_speech_sum = 0.0
+
+        self.last_decision = 0.0
+
+    def score(self, mfccs):
+        """Returns the normalised log posteriors of speech for a matrix of features, one row per frame."""
+        raise NotImplementedError()
+
+    def decide(self, data):
+        """Processes the input frame whether the input segment is speech or non speech.
+
+        The returned values can be in range from 0.0 to 1.0.
+        It returns 1.0 for 100% speech segment and 0.0 for 100% non speech segment.
+        """
+        return self.decide_batch([data])[0]
+
+    def decide_batch(self, data_list):
+        """Processes several consecutive input frames at once.
+
+        All features are computed and scored together. It returns the same decisions, one for each input frame,
+        as calling decide for each of them.
+        """
+        data_list = [np.frombuffer(data[:len(data) / 2 * 2], dtype=np.int16) for data in data_list]
+        ends = len(self.audio_recorded_in) + np.cumsum([len(data) for data in data_list], dtype=np.int64)
+        self.audio_recorded_in = np.concatenate([self.audio_recorded_in, ] + data_list)
+
+        # the number of frames processed after each input frame, a frame is processed only when it is followed
+        # by at least one more sample
+        n_frames = np.maximum(ends - self.framesize - 1, -1) // self.frameshift + 1
+        n_total = n_frames[-1] if len(n_frames) else 0
+
+        mfccs = self.front_end.param_block(
+            self.audio_recorded_in[:(n_total - 1) * self.frameshift + self.framesize], self.frameshift)
+        self.audio_recorded_in = self.audio_recorded_in[n_total * self.frameshift:]
+
+        probs_speech_avg = []
+        if len(mfccs):
+            for log_prob_speech in np.maximum(self.score(mfccs), LOG_PROB_FLOOR):
+                if len(self.log_probs_speech) == self.log_probs_speech.maxlen:
+                    self.log_probs_speech_sum -= self.log_probs_speech[0]
+                self.log_probs_speech.append(log_prob_speech)
+                self.log_probs_speech_sum += log_prob_speech
+
+                log_prob_speech_avg = self.log_probs_speech_sum / len(self.log_probs_speech)
+
+                probs_speech_avg.append(np.exp(log_prob_speech_avg))
+
+        decisions = []
+        for n in n_frames:
+            if n:
+                self.last_decision = probs_speech_avg[n - 1]
+            decisions.append(self.last_decision)
+
+        # returns a speech / non-speech decisions
+        return decisions
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the throughput of the VAD engines in frames per second.
+
+The batched decide and decide_batch of each engine are compared against
+a reference implementation, which computes the features, scores them and
+smooths the posteriors frame by frame. All must give the same decisions.
+Run as::
+
+    ./bench_vad.py
+"""
+
+# pylint: disable=C0111,C0103
+
+import os
+import unittest
+import time
+
+from collections import deque
+from math import log
+
+import numpy as np
+from scipy.misc import logsumexp
+
+if __name__ == '__main__':
+    import autopath
+from alex.components.vad.gmm import GMMVAD
+from alex.utils.config import as_project_path, online_update
+
+cfg = {
+    'Audio': {
+        'sample_rate': 16000,
+    },
+    'VAD': {
+        'gmm': {
+            'frontend': 'MFCC',
+            'framesize': 512,
+            'frameshift': 160,
+            'usehamming': True,
+            'preemcoef': 0.97,
+            'numchans': 26,
+            'ceplifter': 22,
+            'numceps': 12,
+            'enormalise': True,
+            'zmeansource': True,
+            'usepower': True,
+            'usec0': False,
+            'usecmn': False,
+            'usedelta': True,
+            'useacc': True,
+            'n_last_frames': 0,
+            'lofreq': 125,
+            'hifreq': 3800,
+            'speech_model': as_project_path('resources/vad/voip/vad_speech_sds_mfcc_m064_f100000.gmm'),
+            'sil_model': as_project_path('resources/vad/voip/vad_sil_sds_mfcc_m064_f100000.gmm'),
+            'filter_length': 2,
+        },
+    },
+}
+
+
+def loop_decide(vad, score, framesize, frameshift, filter_length, packets):
+    """Reference implementation of decide, which processes one frame at a time.
+
+    :param score: a function returning the log probs of speech and silence for a feature vector
+    :return: the list of decisions, one for each packet
+    """
+    audio_recorded_in = []
+    log_probs_speech = deque(maxlen=filter_length)
+    log_probs_sil = deque(maxlen=filter_length)
+    last_decision = 0.0
+    decisions = []
+
+    for data in packets:
+        audio_recorded_in.extend(np.frombuffer(data, dtype=np.int16))
+
+        while len(audio_recorded_in) > framesize:
+            frame = audio_recorded_in[:framesize]
+            audio_recorded_in = audio_recorded_in[frameshift:]
+
+            log_prob_speech, log_prob_sil = score(vad.front_end.param(frame))
+
+            log_probs_speech.append(log_prob_speech)
+            log_probs_sil.append(log_prob_sil)
+
+            log_prob_speech_avg = 0.0
+            for log_prob_speech, log_prob_sil in zip(log_probs_speech, log_probs_sil):
+                log_prob_speech_avg += log_prob_speech - logsumexp([log_prob_speech, log_prob_sil])
+            log_prob_speech_avg /= len(log_probs_speech)
+
+            last_decision = np.exp(log_prob_speech_avg)
+
+        decisions.append(last_decision)
+
+    return decisions
+
+
+def generate_packets(n_seconds, samples_per_packet, sample_rate=16000):
+    """Generate noise with louder bursts of a tone, split into packets."""
+    np.random.seed(0)
+    t = np.arange(n_seconds * sample_rate, dtype=np.float64) / sample_rate
+    audio = np.random.randn(len(t)) * 100
+    audio += (np.sin(2 * np.pi * 300 * t) * 5000) * (np.sin(2 * np.pi * 0.5 * t) > 0)
+    audio = audio.astype(np.int16).tostring()
+
+    n_bytes = 2 * samples_per_packet
+    return [audio[i:i + n_bytes] for i in range(0, len(audio), n_bytes)]
+
+
+class BenchVAD(unittest.TestCase):
+
+    n_seconds = 10
+    # the packet size in the VAD hub and a larger one, e.g. when the hub falls behind
+    samples_per_packet = [256, 4096]
+    # the number of queued packets processed at once
+    packets_per_batch = 16
+
+    def report(self, name, n_frames, loop_time, vec_time):
+        print "%-36s loop %8.1f frames/s  batched %8.1f frames/s  speedup %6.1fx" % (
+            name, n_frames / loop_time, n_frames / vec_time, loop_time / max(vec_time, 1e-9))
+
+    def bench(self, name, create_vad, score, framesize, frameshift, filter_length):
+        for samples_per_packet in self.samples_per_packet:
+            packets = generate_packets(self.n_seconds, samples_per_packet)
+            n_frames = (self.n_seconds * 16000 - framesize) / frameshift
+
+            vad = create_vad()
+            start = time.time()
+            loop_decisions = loop_decide(vad, score(vad), framesize, frameshift, filter_length, packets)
+            loop_time = time.time() - start
+
+            vad = create_vad()
+            start = time.time()
+            decisions = [vad.decide(data) for data in packets]
+            vec_time = time.time() - start
+
+            self.assertTrue(np.allclose(decisions, loop_decisions, rtol=1e-5, atol=1e-8))
+            self.report("%s, %d samples per packet" % (name, samples_per_packet), n_frames, loop_time, vec_time)
+
+            # the VAD hub passes all queued packets to decide_batch
+            vad = create_vad()
+            start = time.time()
+            batch_decisions = []
+            for i in range(0, len(packets), self.packets_per_batch):
+                batch_decisions.extend(vad.decide_batch(packets[i:i + self.packets_per_batch]))
+            batch_time = time.time() - start
+
+            self.assertTrue(np.allclose(batch_decisions, loop_decisions, rtol=1e-5, atol=1e-8))
+            self.report("%s, %d packets per batch" % (name, self.packets_per_batch), n_frames, loop_time, batch_time)
+
+    def test_bench_gmm(self):
+        def score(vad):
+            return lambda mfcc: (vad.gmm_speech.score(mfcc), vad.gmm_sil.score(mfcc))
+
+        gmm_cfg = cfg['VAD']['gmm']
+        self.bench('GMMVAD', lambda: GMMVAD(cfg), score,
+                   gmm_cfg['framesize'], gmm_cfg['frameshift'], gmm_cfg['filter_length'])
+
+    def test_bench_ffnn(self):
+        try:
+            from alex.components.vad.ffnn import FFNNVADGeneral
+        except ImportError as e:
+            self.skipTest("FFNN VAD is not available: %s" % e)
+
+        model = online_update('resources/vad/voip/vad_nnt_1196_hu512_hl1_hla3_pf30_nf15_acf_4.0_mfr32000000_mfl1000000_mfps0_ts0_usec00_usedelta0_useacc0_mbo1_bs1000.tffnn')
+        if not os.path.exists(model):
+            self.skipTest("FFNN VAD model is not available: %s" % model)
+
+        def create_vad():
+            return FFNNVADGeneral(model, 2, 16000, 512, 160, True, 0.97, 26, 22, 12, True, True, True, False, False,
+                                  False, False, 30, 15, 125, 3800, True)
+
+        def score(vad):
+            def score_frame(mfcc):
+                prob_sil, prob_speech = vad.ffnn.predict_normalise(mfcc.reshape(1, len(mfcc)))[0]
+                return log(prob_speech), log(prob_sil)
+            return score_frame
+
+        self.bench('FFNNVAD', create_vad, score, 512, 160, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
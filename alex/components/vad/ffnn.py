@@ -1,19 +1,15 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from collections import deque
 import numpy as np
-from scipy.misc import logsumexp
-import struct
-
-from math import log
 
 from alex.components.asr.exceptions import ASRException
-from alex.ml.tffnn import TheanoFFNN
+from alex.components.vad.base import MFCCVAD
+from alex.ml.nffnn import NumpyFFNN
 from alex.utils.mfcc import MFCCFrontEnd
 
 
-class FFNNVADGeneral(object):
+class FFNNVADGeneral(MFCCVAD):
     """ This is implementation of a FFNN based voice activity detector.
 
     It only implements decisions whether input frame is speech of non speech.
@@ -24,18 +20,10 @@ class FFNNVADGeneral(object):
                  enormalise, zmeansource, usepower, usec0, usecmn, usedelta,
                  useacc, n_last_frames, n_prev_frames, lofreq, hifreq,
                  mel_banks_only):
-        self.audio_recorded_in = []
-
-        self.ffnn = TheanoFFNN()
+        self.ffnn = NumpyFFNN()
         self.ffnn.load(model)
 
-        self.log_probs_speech = deque(maxlen=filter_length)
-        self.log_probs_sil = deque(maxlen=filter_length)
-
-        self.last_decision = 0.0
-
-
-        self.front_end = MFCCFrontEnd(
+        front_end = MFCCFrontEnd(
             sample_rate, framesize,
             usehamming, preemcoef,
             numchans, ceplifter,
@@ -47,46 +35,15 @@ class FFNNVADGeneral(object):
             lofreq, hifreq,
             mel_banks_only)
 
-        self.framesize = framesize
-        self.frameshift = frameshift
-
-    def decide(self, data):
-        """Processes the input frame whether the input segment is speech or non speech.
-
-        The returned values can be in range from 0.0 to 1.0.
-        It returns 1.0 for 100% speech segment and 0.0 for 100% non speech segment.
-        """
-
-        data = struct.unpack('%dh' % (len(data) / 2, ), data)
-        self.audio_recorded_in.extend(data)
-
-        while len(self.audio_recorded_in) > self.framesize:
-            frame = self.audio_recorded_in[:self.framesize]
-            self.audio_recorded_in = self.audio_recorded_in[self.frameshift:]
-
-            mfcc = self.front_end.param(frame)
-
-            prob_sil, prob_speech = self.ffnn.predict_normalise(mfcc.reshape(1,len(mfcc)))[0]
-
-            # print prob_sil, prob_speech
-
-            self.log_probs_speech.append(log(prob_speech))
-            self.log_probs_sil.append(log(prob_sil))
-
-            log_prob_speech_avg = 0.0
-            for log_prob_speech, log_prob_sil in zip(self.log_probs_speech, self.log_probs_sil):
-                log_prob_speech_avg += log_prob_speech - logsumexp([log_prob_speech, log_prob_sil])
-            log_prob_speech_avg /= len(self.log_probs_speech)
-
-            prob_speech_avg = np.exp(log_prob_speech_avg)
-
-            # print 'prob_speech_avg: %5.3f' % prob_speech_avg
+        super(FFNNVADGeneral, self).__init__(front_end, framesize, frameshift, filter_length)
 
-            self.last_decision = prob_speech_avg
+    def score(self, mfccs):
+        probs = np.asarray(self.ffnn.predict_normalise(mfccs), dtype=np.float64)
+        log_probs_sil, log_probs_speech = np.log(probs[:, 0]), np.log(probs[:, 1])
 
-        # returns a speech / non-speech decisions
-        return self.last_decision
+        # print log_probs_sil, log_probs_speech
 
+        return log_probs_speech - np.logaddexp(log_probs_speech, log_probs_sil)
 
 
 class FFNNVAD(FFNNVADGeneral):
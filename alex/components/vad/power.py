@@ -15,6 +15,10 @@ class PowerVAD():
         self.power_threshold_adapted = self.cfg['VAD']['power']['threshold']
         self.in_frames = 0
 
+    def reset(self):
+        """Nothing to forget, each frame is classified on its own."""
+        pass
+
     def decide(self, frame):
         """Returns whether the input segment is speech or non speech.
 
@@ -40,3 +44,7 @@ class PowerVAD():
             speech_segment = 1.0
 
         return speech_segment
+
+    def decide_batch(self, frames):
+        """Returns the decisions for several consecutive input frames."""
+        return [self.decide(frame) for frame in frames]
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import unittest
+
+import numpy as np
+
+from alex.components.vad.base import MFCCVAD
+from alex.utils.mfcc import MFCCFrontEnd
+
+
+class ScriptedVAD(MFCCVAD):
+    """Scores the frames by the given log posteriors of speech, one per frame."""
+    def __init__(self, log_probs, filter_length):
+        super(ScriptedVAD, self).__init__(MFCCFrontEnd(framesize=512), 512, 160, filter_length)
+        self.log_probs = list(log_probs)
+
+    def score(self, mfccs):
+        scores, self.log_probs = self.log_probs[:len(mfccs)], self.log_probs[len(mfccs):]
+        return np.array(scores)
+
+
+class TestMFCCVAD(unittest.TestCase):
+    def test_zero_posterior(self):
+        # the first frame has a zero posterior of speech, the others are certain speech
+        vad = ScriptedVAD([-np.inf] + [0.0] * 99, filter_length=5)
+        packet = np.zeros(160 * 10, dtype=np.int16).tostring()
+
+        decisions = []
+        for i in range(10):
+            decisions.extend(vad.decide_batch([packet]))
+
+        self.assertTrue(np.isfinite(vad.log_probs_speech_sum))
+        self.assertEqual(decisions[-1], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 from collections import deque
+import multiprocessing
 import os
 import shutil
+import time
 import wave
 import logging
 
@@ -38,6 +40,9 @@ default_vad_cfg = {
     'filter_length': 2,
 }
 
+# the file in the output dir which lists the split files
+MANIFEST_FILE_NAME = 'split_manifest.txt'
+
 def pdb_on_error():
     import sys
 
@@ -62,6 +67,39 @@ def pdb_on_error():
     sys.excepthook = info
 
 
+class BufferedWaveWriter(object):
+    """Writes audio into a wave file through a buffer of a bounded size."""
+
+    def __init__(self, file_name, nchannels, sampwidth, framerate, buffer_size):
+        self.file_name = file_name
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.n_buffered = 0
+        self.n_written = 0
+
+        self.wf = wave.open(file_name, 'wb')
+        self.wf.setnchannels(nchannels)
+        self.wf.setsampwidth(sampwidth)
+        self.wf.setframerate(framerate)
+
+    def write(self, data):
+        self.buffer.append(data)
+        self.n_buffered += len(data)
+        self.n_written += len(data)
+
+        if self.n_buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.wf.writeframesraw(b''.join(self.buffer))
+        self.buffer = []
+        self.n_buffered = 0
+
+    def close(self):
+        self.flush()
+        self.wf.close()
+
+
 class RecordingSplitter(object):
     CHANGE_TO_NON_SPEECH = 2
     CHANGE_TO_SPEECH = 1
@@ -70,15 +108,21 @@ class RecordingSplitter(object):
     non_speech_thresh = 0.1
 
     read_buffer_size = 128
+    # the number of read buffers whose VAD decisions are computed at once
+    vad_batch_size = 1024
+    # the number of bytes of a part which are kept in memory before they are written
+    write_buffer_size = 1024 * 1024
 
-    def __init__(self, vad_cfg, speech_thresh=0.7, non_speech_thresh=0.1):
+    def __init__(self, vad_cfg, speech_thresh=0.7, non_speech_thresh=0.1, vad=None):
         self.vad_cfg = vad_cfg
 
         self.speech_thresh = speech_thresh
         self.non_speech_thresh = non_speech_thresh
 
-        logging.info('Loading VAD model.')
-        self.vad = FFNNVADGeneral(**vad_cfg)
+        if vad is None:
+            logging.info('Loading VAD model.')
+            vad = FFNNVADGeneral(**vad_cfg)
+        self.vad = vad
 
     def split_single_channel_wav(self, file_name, out_dir, out_prefix):
         logging.info('Splitting %s' % file_name)
@@ -98,39 +142,47 @@ class RecordingSplitter(object):
         res_files = []
         res_file_cntr = 0
 
-        frames = []
+        part = None
 
         is_speech = False
         n_read = 0
         n_read_beg = None
 
+        read_buffer_bytes = self.read_buffer_size * sample_width
+
         while 1:
-            audio_data = wave_in.readframes(self.read_buffer_size)
-            n_read += self.read_buffer_size
+            audio_data = wave_in.readframes(self.read_buffer_size * self.vad_batch_size)
 
             if len(audio_data) == 0:
                 break
 
-            raw_vad_decision = self.vad.decide(audio_data)
-            is_speech, change = self._smoothe_decison(raw_vad_decision, is_speech, detection_window_speech, detection_window_sil)
+            buffers = [audio_data[i:i + read_buffer_bytes] for i in xrange(0, len(audio_data), read_buffer_bytes)]
+
+            for buffer_data, raw_vad_decision in zip(buffers, self.vad.decide_batch(buffers)):
+                n_read += self.read_buffer_size
 
-            if not is_speech:
-                pre_detection_buffer.append(audio_data)
+                is_speech, change = self._smoothe_decison(raw_vad_decision, is_speech, detection_window_speech, detection_window_sil)
 
-            if change == self.CHANGE_TO_SPEECH:
-                n_read_beg = n_read - self.read_buffer_size
-                frames = []
-            elif change == self.CHANGE_TO_NON_SPEECH:
-                #if not is_speech and len(frames) > 1:
-                self._save_part(res_file_cntr, list(pre_detection_buffer) + frames, out_dir, res_files, wave_in, out_prefix, n_read_beg, n_read, bytes_per_second)
-                res_file_cntr += 1
-                pre_detection_buffer.extend(frames[-pre_detection_buffer.maxlen:])
+                if change == self.CHANGE_TO_SPEECH:
+                    n_read_beg = n_read - self.read_buffer_size
+                    part = self._open_part(res_file_cntr, out_dir, wave_in, out_prefix)
+                    for pre_data in pre_detection_buffer:
+                        part.write(pre_data)
 
-            if is_speech:
-                frames.append(audio_data)
+                if part:
+                    part.write(buffer_data)
 
-        if n_read_beg:
-            self._save_part(res_file_cntr, frames, out_dir, res_files, wave_in, out_prefix, n_read_beg, n_read, bytes_per_second)
+                if change == self.CHANGE_TO_NON_SPEECH:
+                    self._close_part(res_file_cntr, part, res_files, n_read_beg, n_read, bytes_per_second)
+                    res_file_cntr += 1
+                    part = None
+
+                pre_detection_buffer.append(buffer_data)
+
+        if part:
+            self._close_part(res_file_cntr, part, res_files, n_read_beg, n_read, bytes_per_second)
+
+        wave_in.close()
 
         return res_files
 
@@ -167,23 +219,20 @@ class RecordingSplitter(object):
 
         return vad, change
 
-    def _save_part(self, cntr, frames, out_dir, res_files, wave_in, out_prefix, n_read_beg, n_read_end, bytes_per_second):
-        content = b''.join(frames)
-        logging.info('Saving part %d (%.1f s).' % (cntr, len(content) * 1.0 / bytes_per_second))
-
+    def _open_part(self, cntr, out_dir, wave_in, out_prefix):
         res_file = os.path.join(out_dir, 'part.%s.%.3d.wav' % (out_prefix, cntr, ))
-        wf = wave.open(res_file, 'wb')
-        wf.setnchannels(wave_in.getnchannels())
-        wf.setsampwidth(wave_in.getsampwidth())
-        wf.setframerate(wave_in.getframerate())
-        wf.writeframes(content)
-        wf.close()
+        return BufferedWaveWriter(res_file, wave_in.getnchannels(), wave_in.getsampwidth(), wave_in.getframerate(),
+                                  self.write_buffer_size)
+
+    def _close_part(self, cntr, part, res_files, n_read_beg, n_read_end, bytes_per_second):
+        part.close()
+        logging.info('Saving part %d (%.1f s).' % (cntr, part.n_written * 1.0 / bytes_per_second))
 
-        res_files.append(((n_read_beg * 1.0 / bytes_per_second, n_read_end * 1.0 / bytes_per_second), res_file))
+        res_files.append(((n_read_beg * 1.0 / bytes_per_second, n_read_end * 1.0 / bytes_per_second), part.file_name))
 
 
 def main(input_dir, pcm_sample_rate, output_dir, ignore_first, ignore_pcm_smaller_than, max_call_log_size,
-         min_wav_duration, v, keep_aux_recordings):
+         min_wav_duration, v, keep_aux_recordings, n_jobs=1):
     if v:
         logging.basicConfig(level=logging.DEBUG, format=LOGGING_FORMAT)
     else:
@@ -197,10 +246,8 @@ def main(input_dir, pcm_sample_rate, output_dir, ignore_first, ignore_pcm_smalle
     vad_cfg = default_vad_cfg
     _download_vad_model_if_not_exists(vad_cfg)
 
-    rs = RecordingSplitter(vad_cfg=vad_cfg)
-
-    _split_files(rs, output_dir, to_process, pcm_sample_rate, ignore_first, max_call_log_size, min_wav_duration,
-                 keep_aux_recordings)
+    _split_files(vad_cfg, output_dir, to_process, pcm_sample_rate, ignore_first, max_call_log_size, min_wav_duration,
+                 keep_aux_recordings, n_jobs)
 
 
 def _mkdir_if_not_exists(output_dir):
@@ -228,46 +275,119 @@ def _find_files_to_split(input_dir, ignore_pcm_smaller_than):
     return to_process
 
 
-def _split_files(rs, output_dir, to_process, pcm_sample_rate, ignore_first, max_call_log_size, min_wav_duration,
-                 keep_aux_recordings):
-    logging.info('Processing files.')
-    for file_name, root, abs_root in to_process:
-        file_out_dir = os.path.join(output_dir, root, file_name)
+def _read_manifest(manifest_file_name):
+    """Returns the set of the files which were split in the previous runs."""
+    completed = set()
+    if os.path.exists(manifest_file_name):
+        with open(manifest_file_name) as f_in:
+            for line in f_in:
+                if line.strip():
+                    completed.add(line.split('\t')[0])
+    return completed
+
+
+def _split_files(vad_cfg, output_dir, to_process, pcm_sample_rate, ignore_first, max_call_log_size, min_wav_duration,
+                 keep_aux_recordings, n_jobs=1):
+    """Splits the files in a pool of n_jobs processes.
 
-        files = _split_2chan_pcm(rs, abs_root, file_name, file_out_dir, pcm_sample_rate, root, ignore_first)
+    Each split file is recorded in the manifest in the output dir together with the duration of its audio and
+    the time it took to split it. The files recorded in the manifest are skipped, so that an interrupted run
+    can be resumed.
+    """
+    manifest_file_name = os.path.join(output_dir, MANIFEST_FILE_NAME)
+    completed = _read_manifest(manifest_file_name)
+    to_process = [f for f in to_process if os.path.join(f[1], f[0]) not in completed]
+    logging.info('Processing files: %d, already split: %d.' % (len(to_process), len(completed)))
+
+    tasks = [(file_name, root, abs_root, output_dir, pcm_sample_rate, ignore_first, max_call_log_size,
+              min_wav_duration, keep_aux_recordings) for file_name, root, abs_root in to_process]
+
+    if n_jobs == 1:
+        _init_worker(vad_cfg)
+        pool = None
+        results = (_split_file(task) for task in tasks)
+    else:
+        pool = multiprocessing.Pool(n_jobs, _init_worker, (vad_cfg, ))
+        results = pool.imap_unordered(_split_file, tasks)
 
-        bulk_cntr = 0
-        while files:
-            to_index = max_call_log_size if max_call_log_size > 0 else None
-            bulk = files[:to_index]
-            files = files[to_index:]
-            bulk_out_dir = "%s_%d" % (file_out_dir, bulk_cntr, )
+    start = time.time()
+    total_duration = 0.0
+    total_split_time = 0.0
+    try:
+        with open(manifest_file_name, 'a') as manifest:
+            for file_path, duration, split_time in results:
+                manifest.write('%s\t%.3f\t%.3f\n' % (file_path, duration, split_time))
+                manifest.flush()
 
-            if not os.path.exists(bulk_out_dir):
-                os.makedirs(bulk_out_dir)
+                total_duration += duration
+                total_split_time += split_time
+                logging.info('Split %s (%.1f s) with RTF %.3f.' % (file_path, duration, _rtf(split_time, duration)))
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
 
-            if min_wav_duration > 0.0:
-                bulk = _filter_short_wavs(bulk, min_wav_duration)
+    logging.info('Split %d files (%.1f s of audio), RTF per process %.3f, RTF of the run %.3f.' % (
+        len(tasks), total_duration, _rtf(total_split_time, total_duration), _rtf(time.time() - start, total_duration)))
 
-            for _, wav_path in bulk:
-                wav_file_name = os.path.basename(wav_path)
-                os.rename(wav_path, os.path.join(bulk_out_dir, wav_file_name))
 
-            _create_session_xml(bulk_out_dir, bulk)
+def _rtf(split_time, duration):
+    return split_time / duration if duration else 0.0
 
-            bulk_cntr += 1
 
-        if not keep_aux_recordings:
-            shutil.rmtree(file_out_dir)
+_worker_splitter = None
+
+
+def _init_worker(vad_cfg):
+    global _worker_splitter
+    _worker_splitter = RecordingSplitter(vad_cfg=vad_cfg)
+
+
+def _split_file(task):
+    """Splits one file with the recording splitter of the worker process.
+
+    :return: the path of the file relative to the input dir, the duration of its audio and the time of splitting
+    """
+    (file_name, root, abs_root, output_dir, pcm_sample_rate, ignore_first, max_call_log_size, min_wav_duration,
+     keep_aux_recordings) = task
+
+    start = time.time()
+    file_out_dir = os.path.join(output_dir, root, file_name)
+
+    files, duration = _split_2chan_pcm(_worker_splitter, abs_root, file_name, file_out_dir, pcm_sample_rate, root,
+                                       ignore_first)
+
+    bulk_cntr = 0
+    while files:
+        to_index = max_call_log_size if max_call_log_size > 0 else None
+        bulk = files[:to_index]
+        files = files[to_index:]
+        bulk_out_dir = "%s_%d" % (file_out_dir, bulk_cntr, )
+
+        if not os.path.exists(bulk_out_dir):
+            os.makedirs(bulk_out_dir)
+
+        if min_wav_duration > 0.0:
+            bulk = _filter_short_wavs(bulk, min_wav_duration)
+
+        for _, wav_path in bulk:
+            wav_file_name = os.path.basename(wav_path)
+            os.rename(wav_path, os.path.join(bulk_out_dir, wav_file_name))
+
+        _create_session_xml(bulk_out_dir, bulk)
+
+        bulk_cntr += 1
+
+    if not keep_aux_recordings:
+        shutil.rmtree(file_out_dir)
+
+    return os.path.join(root, file_name), duration, time.time() - start
 
 
 def _filter_short_wavs(wavs, min_wav_duration):
     res = []
     for wav_t, wav in wavs:
-        fwav = wave.open(wav)
-        frames = fwav.getnframes()
-        rate = fwav.getframerate()
-        duration = frames / float(rate)
+        duration = _get_wav_duration(wav)
 
         if duration >= min_wav_duration:
             res.append((wav_t, wav))
@@ -275,6 +395,14 @@ def _filter_short_wavs(wavs, min_wav_duration):
     return res
 
 
+def _get_wav_duration(wav_path):
+    fwav = wave.open(wav_path)
+    duration = fwav.getnframes() / float(fwav.getframerate())
+    fwav.close()
+
+    return duration
+
+
 def _split_2chan_pcm(rs, abs_root, file_name, out_dir, sample_rate, root, ignore_first):
     file_path = os.path.join(abs_root, file_name)
 
@@ -292,7 +420,7 @@ def _split_2chan_pcm(rs, abs_root, file_name, out_dir, sample_rate, root, ignore
     res = res_files1 + res_files2
     res.sort(key=lambda ((tb, te, ), fn, ): tb)
 
-    return res
+    return res, _get_wav_duration(wav_path_a)
 
 
 def _convert_to_wav(in_file, sample_rate, out_file, chan, ignore_first):
@@ -358,6 +486,8 @@ if __name__ == '__main__':
     parser.add_argument('--min_wav_duration', type=float, default=0.0)
     parser.add_argument('-v', default=False, action='store_true')
     parser.add_argument('--keep_aux_recordings', action='store_true', default=False)
+    parser.add_argument('--n_jobs', type=int, default=1,
+                        help='the number of processes splitting the files in parallel')
 
     args = parser.parse_args()
 
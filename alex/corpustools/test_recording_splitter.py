@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import os
+import shutil
+import tempfile
+import unittest
+import wave
+
+import numpy as np
+
+from alex.components.vad.power import PowerVAD
+from alex.corpustools.recording_splitter import RecordingSplitter, _read_manifest
+
+
+class TestRecordingSplitter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+        # noise with five louder tone bursts
+        np.random.seed(0)
+        sample_rate = 8000
+        t = np.arange(10 * sample_rate, dtype=np.float64) / sample_rate
+        audio = np.random.randn(len(t)) * 30
+        audio += np.sin(2 * np.pi * 300 * t) * 5000 * (np.sin(2 * np.pi * 0.5 * t - 1.0) > 0.5)
+        self.audio = audio.astype(np.int16).tostring()
+
+        self.wav_file_name = os.path.join(self.tmp_dir, 'all.a.wav')
+        wf = wave.open(self.wav_file_name, 'wb')
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(self.audio)
+        wf.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def split(self, out_prefix, **kwargs):
+        vad = PowerVAD({'VAD': {'power': {'threshold': 70, 'threshold_multiplier': 2.0, 'adaptation_frames': 30}}})
+        rs = RecordingSplitter(None, vad=vad)
+        for name, value in kwargs.items():
+            setattr(rs, name, value)
+
+        parts = []
+        for (start, end), file_name in rs.split_single_channel_wav(self.wav_file_name, self.tmp_dir, out_prefix):
+            wf = wave.open(file_name)
+            parts.append(((start, end), wf.readframes(wf.getnframes())))
+            wf.close()
+
+        return parts
+
+    def test_split(self):
+        parts = self.split('a')
+
+        self.assertEqual(len(parts), 5)
+        for (start, end), audio in parts:
+            self.assertLess(start, end)
+            self.assertIn(audio, self.audio)
+
+    def test_split_same_in_batches(self):
+        self.assertEqual(self.split('a'), self.split('b', vad_batch_size=1, write_buffer_size=100))
+
+    def test_read_manifest(self):
+        manifest_file_name = os.path.join(self.tmp_dir, 'manifest.txt')
+        self.assertEqual(_read_manifest(manifest_file_name), set())
+
+        with open(manifest_file_name, 'w') as f_out:
+            f_out.write('2015/call1.pcm\t60.000\t1.500\n2015/call2.pcm\t30.000\t0.800\n')
+        self.assertEqual(_read_manifest(manifest_file_name), set(['2015/call1.pcm', '2015/call2.pcm']))
+
+
+if __name__ == '__main__':
+    unittest.main()
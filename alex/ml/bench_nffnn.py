@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the numpy inference of feed-forward networks trained by TheanoFFNN.
+
+The network has the size of the VAD model, i.e. 46 frames of 26 mel banks on the input and one hidden layer with
+512 units. The benchmark reports the time needed to load the saved network and the throughput in frames per second of
+NumpyFFNN, which is compared against TheanoFFNN if Theano is available. Run as::
+
+    ./bench_nffnn.py
+"""
+
+# pylint: disable=C0111,C0103
+
+import cPickle as pickle
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+if __name__ == '__main__':
+    import autopath
+from alex.ml.nffnn import NumpyFFNN
+
+
+def vad_sized_params(n_features=26, prev_frames=30, next_frames=15, n_hidden=512, n_outputs=2):
+    """Generate random parameters in the format of TheanoFFNN.get_params."""
+    rng = np.random.RandomState(0)
+    n_context = prev_frames + 1 + next_frames
+    n_inputs = n_features * n_context
+    layers = [n_inputs, n_hidden, n_outputs]
+
+    params = []
+    for n1, n2 in zip(layers[:-1], layers[1:]):
+        params.append(rng.uniform(-np.sqrt(6. / (n1 + n2)), np.sqrt(6. / (n1 + n2)), (n1, n2)).astype(np.float32))
+        params.append(np.zeros(n2, dtype=np.float32))
+
+    amp = [0.25 + 0.75 * i / prev_frames for i in range(prev_frames)] + [1.0] + \
+          [0.25 + 0.75 * i / next_frames for i in reversed(range(next_frames))]
+
+    return (rng.randn(n_inputs).astype(np.float32), rng.uniform(0.5, 2.0, n_inputs).astype(np.float32), params,
+            [n_hidden], 'tanh', n_inputs, n_outputs, 1e-6, prev_frames, next_frames, 1000, amp,
+            np.repeat(amp, n_features))
+
+
+class BenchNumpyFFNN(unittest.TestCase):
+
+    n_frames = 20000
+
+    def report(self, name, n_frames, elapsed):
+        print "%-44s %10.0f frames/s" % (name, n_frames / elapsed)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.params = vad_sized_params()
+
+        fd, cls.model = tempfile.mkstemp(suffix='.tffnn')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(cls.params, f)
+
+        rng = np.random.RandomState(1)
+        cls.frames = rng.randn(cls.n_frames, 26).astype(np.float32)
+        cls.inputs = rng.randn(cls.n_frames // 10, cls.params[5]).astype(np.float32)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.model)
+
+    def theano_ffnn(self):
+        try:
+            from theano import tensor as T
+            from alex.ml.tffnn import TheanoFFNN
+        except ImportError:
+            return None
+
+        tffnn = TheanoFFNN()
+        start = time.time()
+        tffnn.set_params(self.params[:4] + (T.tanh, ) + self.params[5:])
+        print "TheanoFFNN model compiled in %.2f s" % (time.time() - start)
+
+        return tffnn
+
+    def test_bench_load(self):
+        start = time.time()
+        nffnn = NumpyFFNN()
+        nffnn.load(self.model)
+        print "NumpyFFNN model loaded in %.3f s" % (time.time() - start)
+
+    def test_bench_predict_normalise(self):
+        nffnn = NumpyFFNN()
+        nffnn.set_params(self.params)
+        tffnn = self.theano_ffnn()
+
+        start = time.time()
+        batch_probs = nffnn.predict_normalise(self.inputs)
+        self.report("NumpyFFNN predict_normalise, batched", len(self.inputs), time.time() - start)
+
+        start = time.time()
+        for x in self.inputs:
+            nffnn.predict_normalise(x.reshape(1, len(x)))
+        self.report("NumpyFFNN predict_normalise, frame by frame", len(self.inputs), time.time() - start)
+
+        if tffnn is not None:
+            start = time.time()
+            theano_probs = np.vstack([tffnn.predict_normalise(x.reshape(1, len(x)).copy()) for x in self.inputs])
+            self.report("TheanoFFNN predict_normalise, frame by frame", len(self.inputs), time.time() - start)
+
+            self.assertTrue(np.allclose(batch_probs, theano_probs, atol=1e-5))
+
+    def test_bench_predict_context_windows(self):
+        nffnn = NumpyFFNN()
+        nffnn.set_params(self.params)
+        tffnn = self.theano_ffnn()
+        prev_frames, next_frames = self.params[8], self.params[9]
+
+        start = time.time()
+        probs = nffnn.predict(self.frames, 1000, prev_frames, next_frames)
+        self.report("NumpyFFNN predict with context windows", len(probs), time.time() - start)
+
+        if tffnn is not None:
+            start = time.time()
+            theano_probs = tffnn.predict(self.frames, 1000, prev_frames, next_frames)
+            self.report("TheanoFFNN predict with context windows", len(theano_probs), time.time() - start)
+
+            self.assertTrue(np.allclose(probs, theano_probs, atol=1e-5))
+
+
+if __name__ == '__main__':
+    unittest.main()
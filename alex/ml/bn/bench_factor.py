@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+
+"""
+Benchmark of the factor operations at sizes which occur in belief tracking,
+e.g. slots with hundreds of stop names.
+
+The vectorised operations of :class:`Factor` are compared against reference
+implementations, which walk every cell of the factor table in a Python loop.
+Run as::
+
+    ./bench_factor.py
+"""
+
+# pylint: disable=W0212,C0111,C0103
+
+import unittest
+import time
+
+from collections import defaultdict
+
+import numpy as np
+
+if __name__ == '__main__':
+    import autopath
+from alex.ml.bn.factor import Factor
+
+
+def loop_apply_op_different(f, g, op):
+    """Reference implementation of :meth:`Factor._apply_op_different`."""
+    new_variables = sorted(set(f.variables).union(g.variables))
+    new_cardinalities = dict(f.cardinalities)
+    new_cardinalities.update(g.cardinalities)
+    new_factor_length = f._factor_table_length(new_cardinalities)
+    new_factor_table = np.empty(new_factor_length, np.float32)
+
+    assignment = defaultdict(int)
+    index_f = 0
+    index_g = 0
+    reversed_variables = new_variables[::-1]
+
+    for i in range(new_factor_length):
+        new_factor_table[i] = op(f.factor_table[index_f],
+                                 g.factor_table[index_g])
+
+        for var in reversed_variables:
+            assignment[var] += 1
+            if assignment[var] == new_cardinalities[var]:
+                assignment[var] = 0
+                index_f -= ((new_cardinalities[var] - 1) *
+                            f.strides.get(var, 0))
+                index_g -= ((new_cardinalities[var] - 1) *
+                            g.strides.get(var, 0))
+            else:
+                index_f += f.strides.get(var, 0)
+                index_g += g.strides.get(var, 0)
+                break
+
+    return new_factor_table
+
+
+def loop_marginalize(f, keep):
+    """Reference implementation of :meth:`Factor.marginalize`."""
+    assignment = defaultdict(int)
+    new_cardinalities = {x: f.cardinalities[x] for x in keep}
+    new_factor_length = f._factor_table_length(new_cardinalities)
+    new_factor_table = np.empty(new_factor_length, np.float32)
+    new_factor_table[:] = f._zero
+    new_strides = f._compute_strides(keep, f.cardinalities, new_factor_length)
+    index = 0
+
+    for i in range(f.factor_length):
+        new_factor_table[index] = f._add(new_factor_table[index],
+                                         f.factor_table[i])
+
+        for var in keep:
+            if (i + 1) % f.strides[var] == 0:
+                assignment[var] += 1
+                index += new_strides[var]
+            if assignment[var] == f.cardinalities[var]:
+                assignment[var] = 0
+                index -= (f.cardinalities[var] * new_strides[var])
+
+    return new_factor_table
+
+
+def random_factor(variables, cardinalities, logarithmetic=True):
+    variable_values = {var: range(card)
+                       for var, card in zip(variables, cardinalities)}
+    table = np.random.uniform(0.01, 1.0, np.prod(cardinalities))
+    table = table.astype(np.float32)
+    if logarithmetic:
+        table = np.log(table)
+    return Factor(variables, variable_values, table, logarithmetic)
+
+
+def timeit(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.time()
+        result = fn()
+        best = min(best, time.time() - start)
+    return best, result
+
+
+class BenchFactor(unittest.TestCase):
+
+    # A slot with a few hundreds of values (e.g. stop names) and its
+    # dependence on the previous turn value.
+    slot_cardinality = 200
+    obs_cardinality = 10
+
+    def shape(self, f):
+        return tuple(f.cardinalities[var] for var in f.variables)
+
+    def report(self, name, loop_time, vec_time):
+        print "%-36s loop %8.4fs  vectorised %8.4fs  speedup %8.1fx" % (
+            name, loop_time, vec_time, loop_time / max(vec_time, 1e-9))
+
+    def test_bench_multiplication(self):
+        f = random_factor(['A', 'B'],
+                          [self.slot_cardinality, self.slot_cardinality])
+        g = random_factor(['B', 'C'],
+                          [self.slot_cardinality, self.obs_cardinality])
+
+        loop_time, loop_table = timeit(
+            lambda: loop_apply_op_different(f, g, f._mul), repeat=1)
+        vec_time, h = timeit(lambda: f * g)
+
+        self.assertTrue(np.allclose(h.factor_table, loop_table, atol=1e-4))
+        self.report("multiplication %dx%dx%d" % self.shape(h),
+                    loop_time, vec_time)
+
+    def test_bench_division(self):
+        f = random_factor(['A', 'B'],
+                          [self.slot_cardinality, self.slot_cardinality])
+        g = random_factor(['B'], [self.slot_cardinality])
+
+        loop_time, loop_table = timeit(
+            lambda: loop_apply_op_different(f, g, f._div), repeat=1)
+        vec_time, h = timeit(lambda: f / g)
+
+        self.assertTrue(np.allclose(h.factor_table, loop_table, atol=1e-4))
+        self.report("division %dx%d" % self.shape(h), loop_time, vec_time)
+
+    def test_bench_marginalize(self):
+        f = random_factor(['A', 'B', 'C'],
+                          [self.slot_cardinality, self.slot_cardinality,
+                           self.obs_cardinality])
+
+        for keep in (['A'], ['B'], ['A', 'C']):
+            loop_time, loop_table = timeit(
+                lambda: loop_marginalize(f, keep), repeat=1)
+            vec_time, h = timeit(lambda: f.marginalize(keep))
+
+            self.assertTrue(np.allclose(h.factor_table, loop_table,
+                                        rtol=1e-4))
+            self.report("marginalize %s" % "".join(keep), loop_time, vec_time)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,7 +9,6 @@ with probability distributions.
 import numpy as np
 import operator
 
-from collections import defaultdict
 from scipy.misc import logsumexp
 
 ZERO = 1e-20
@@ -135,6 +134,7 @@ class Factor(object):
             self._decode = from_log
             self._zero = np.log(ZERO)
             self._sum = logsumexp
+            self._add_reduce = np.logaddexp.reduce
         else:
             self._add = np.add
             self._sub = np.subtract
@@ -145,6 +145,7 @@ class Factor(object):
             self._decode = lambda x: x
             self._zero = ZERO
             self._sum = np.sum
+            self._add_reduce = np.add.reduce
 
         # Create a translation table from variable values to indexes.
         self._create_translation_table()
@@ -256,40 +257,13 @@ class Factor(object):
         new_cardinalities = dict(self.cardinalities)
         new_cardinalities.update(other.cardinalities)
 
-        # Compute the length of new factor table.
-        new_factor_length = self._factor_table_length(new_cardinalities)
-
-        # Create a new factor table.
-        new_factor_table = np.empty(new_factor_length, np.float32)
-
-        assignment = defaultdict(int)
-        index_self = 0
-        index_other = 0
-        reversed_variables = new_variables[::-1]
-
-        for i in range(new_factor_length):
-            # Apply the operator.
-            new_factor_table[i] = op(self.factor_table[index_self],
-                                     other.factor_table[index_other])
-
-            # Update indexes, start with variable with smallest stride.
-            for var in reversed_variables:
-                # Move to next value of a variable.
-                assignment[var] += 1
-                # If we go past the last value of one variable, we need to
-                # move onto next variable.
-                if assignment[var] == new_cardinalities[var]:
-                    assignment[var] = 0
-                    index_self -= ((new_cardinalities[var] - 1) *
-                                   self.strides.get(var, 0))
-                    index_other -= ((new_cardinalities[var] - 1) *
-                                    other.strides.get(var, 0))
-                # Otherwise we just update this variable and don't have to do
-                # anything with other variables.
-                else:
-                    index_self += self.strides.get(var, 0)
-                    index_other += other.strides.get(var, 0)
-                    break
+        # View both factor tables as multi-dimensional arrays over the new
+        # variables, where the variables missing in a factor have dimension
+        # of size 1. The operator is then broadcast over the missing
+        # variables.
+        new_factor_table = op(self._table_view(new_variables),
+                              other._table_view(new_variables))
+        new_factor_table = np.asarray(new_factor_table, np.float32).ravel()
 
         return Factor(new_variables,
                       new_variable_values,
@@ -330,6 +304,42 @@ class Factor(object):
                       op(self.factor_table, other),
                       self.logarithmetic)
 
+    def _table_view(self, variables):
+        """View of the factor table as a multi-dimensional array.
+
+        The array has one dimension for each of the given variables, which
+        must include all variables of this factor. The dimensions of variables
+        not in this factor have size 1.
+        """
+        table = self.factor_table.reshape(
+            [self.cardinalities[var] for var in self.variables])
+        if variables != self.variables:
+            table = table.transpose(sorted(
+                range(len(self.variables)),
+                key=lambda i: variables.index(self.variables[i])))
+            table = table.reshape(
+                [self.cardinalities.get(var, 1) for var in variables])
+        return table
+
+    def _sum_out(self, keep):
+        """Sum out all variables not in `keep` from the factor table.
+
+        :returns: Array with one dimension for each variable of this factor,
+                  the dimensions of summed out variables have size 1.
+        """
+        table = self._table_view(self.variables)
+        shape = table.shape
+        axes = [i for i, var in enumerate(self.variables) if var not in keep]
+        kept_axes = [i for i in range(table.ndim) if i not in axes]
+
+        # Move the summed out variables to the last dimension and reduce it.
+        table = table.transpose(kept_axes + axes).reshape(
+            [shape[i] for i in kept_axes] + [-1])
+        sums = self._add(self._zero, self._add_reduce(table, axis=-1))
+
+        return sums.reshape([1 if i in axes else dim
+                             for i, dim in enumerate(shape)])
+
     def _compute_strides(self, variables, cardinalities, factor_length):
         """Strides for variables of given factor table.
 
@@ -417,39 +427,15 @@ class Factor(object):
         :rtype: :class:`Factor`
 
         """
-        # Assignment counter
-        assignment = defaultdict(int)
-        # New cardinalities and new factor table.
-        new_cardinalities = {x: self.cardinalities[x] for x in keep}
-        new_factor_length = self._factor_table_length(new_cardinalities)
-        new_factor_table = np.empty(new_factor_length, np.float32)
-        new_factor_table[:] = self._zero
-        # Strides for resulting variables in the new factor table.
-        new_strides = self._compute_strides(keep,
-                                            self.cardinalities,
-                                            new_factor_length)
-        # Index into the new factor table.
-        index = 0
-
-        # Iterate over every element in the old factor table and add them to
-        # the correct element in the new factor table.
-        for i in range(self.factor_length):
-            new_factor_table[index] = self._add(new_factor_table[index],
-                                                self.factor_table[i])
-
-            # Update the assignment and indexes.
-            for var in keep:
-                # The assignment of variable var changed, so we must add its
-                # stride to the index.
-                if (i + 1) % self.strides[var] == 0:
-                    assignment[var] += 1
-                    index += new_strides[var]
-                # The assignment of variable var overflowed to 0, we must
-                # subtract the cardinality from index.
-                if assignment[var] == self.cardinalities[var]:
-                    assignment[var] = 0
-                    index -= (self.cardinalities[var] *
-                              new_strides[var])
+        new_factor_table = self._sum_out(keep)
+        # The summed table follows the order of self.variables, the new
+        # factor table must follow the order of keep.
+        kept = [var for var in self.variables if var in keep]
+        new_factor_table = new_factor_table.reshape(
+            [self.cardinalities[var] for var in kept])
+        new_factor_table = new_factor_table.transpose(
+            [kept.index(var) for var in keep])
+        new_factor_table = np.asarray(new_factor_table, np.float32).ravel()
 
         # Return new factor with marginalized variables.
         new_variable_values = {v: self.variable_values[v] for v in keep}
@@ -504,16 +490,9 @@ class Factor(object):
         :type parents: list
         """
         if parents is not None:
-            sums = defaultdict(lambda: self._zero)
-            assignments = {}
-
-            for i in range(self.factor_length):
-                value = self.factor_table[i]
-                assignments[i] = self._get_assignment_from_index(i, parents)
-                sums[assignments[i]] = self._add(sums[assignments[i]], value)
-
-            for i in range(self.factor_length):
-                self.factor_table[i] = self._div(self.factor_table[i], sums[assignments[i]])
+            table = self._table_view(self.variables)
+            new_factor_table = self._div(table, self._sum_out(parents))
+            self.factor_table = np.asarray(new_factor_table, self.factor_table.dtype).ravel()
         else:
             self.factor_table = self._div(self.factor_table, self._sum(self.factor_table))
 
@@ -75,6 +75,16 @@ class GMM:
 
         return log_prob
 
+    def score_block(self, X):
+        """Get the log probs of the rows of X being generated by the mixture."""
+        n_dim = X.shape[1]
+
+        lpr = np.log(self.weights) + (- 0.5 * (n_dim * np.log(2 * np.pi) + np.sum(
+            np.log(self.covars), 1)) - 0.5 * np.sum(((X[:, np.newaxis, :] - self.means) ** 2 / self.covars), 2))
+        log_probs = logsumexp(lpr, axis=1)
+
+        return log_probs
+
     def mixup(self, n_new_mixies):
         """Add n new mixies to the mixture."""
 
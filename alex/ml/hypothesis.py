@@ -7,9 +7,11 @@ value of a base type instance.
 """
 
 from __future__ import unicode_literals
+import heapq
 import operator
 
 from collections import namedtuple, OrderedDict
+from math import log
 from alex.ml.exceptions import NBListException
 # from operator import mul
 
@@ -17,6 +19,65 @@ from alex.ml.exceptions import NBListException
 _HypWithEv = namedtuple('HypothesisWithEvidence', ['prob', 'fact', 'evidence'])
 
 
+def iter_kbest(alternatives):
+    """Lazily enumerates the combinations of alternatives from the most to
+    the least probable one.
+
+    The combinations are kept in a heap ordered by their log-probabilities.
+    The log-probability of a combination is computed incrementally from the
+    combination it was expanded from, by replacing one alternative with the
+    next worse one at the same position. Only the combinations actually
+    yielded get their probability computed as the product of the
+    alternatives. Since this is a generator, the caller can stop as soon as
+    it has enough hypotheses.
+
+    Arguments:
+        alternatives -- a sequence of positions, each being a list of
+            probabilities of the alternatives at that position, sorted from
+            the most to the least probable one
+
+    Yields (probability, index) tuples where `index' is a tuple of indices of
+    the chosen alternatives at each position.
+
+    """
+    neg_inf = float('-inf')
+    logprobs = [[log(p) if p > 0.0 else neg_inf for p in alts]
+                for alts in alternatives]
+    if not all(logprobs):
+        return
+
+    best_idx = (0, ) * len(logprobs)
+    open_hyps = [(-sum(alts[0] for alts in logprobs), best_idx)]
+    seen = set([best_idx])
+
+    while open_hyps:
+        neg_logprob, hyp_idx = heapq.heappop(open_hyps)
+        logprob = -neg_logprob
+        # The reported probability is the exact product, not exp(logprob).
+        yield (reduce(operator.mul,
+                      (alts[alt_idx]
+                       for alts, alt_idx in zip(alternatives, hyp_idx)),
+                      1.),
+               hyp_idx)
+
+        for pos, alt_idx in enumerate(hyp_idx):
+            if alt_idx + 1 >= len(logprobs[pos]):
+                continue
+
+            worse_idx = hyp_idx[:pos] + (alt_idx + 1, ) + hyp_idx[pos + 1:]
+            if worse_idx in seen:
+                continue
+            seen.add(worse_idx)
+
+            if logprob == neg_inf:
+                # The alternatives are sorted, hence a worse one stays zero.
+                worse_logprob = neg_inf
+            else:
+                worse_logprob = (logprob - logprobs[pos][alt_idx]
+                                 + logprobs[pos][alt_idx + 1])
+            heapq.heappush(open_hyps, (-worse_logprob, worse_idx))
+
+
 class Hypothesis(object):
     """This is the base class for all forms of probabilistic hypotheses
     representations.
@@ -41,12 +102,31 @@ class NBList(Hypothesis):
 
     """
     # NOTE the class invariant: self.n_best is always sorted from the most to
-    # the least probable hypothesis.
+    # the least probable hypothesis.  The hypotheses are stored in
+    # self._n_best in the order they were added and they are sorted lazily,
+    # when self.n_best is accessed.
 
     def __init__(self):
-        self.n_best = []
+        self._n_best = []
+        self._n_best_sorted = True
         self.tolerance_over1 = 1e-2
 
+    @property
+    def n_best(self):
+        """The list of [probability, fact] pairs sorted from the most to the
+        least probable hypothesis."""
+        if not self._n_best_sorted:
+            # The sort is stable, hence hypotheses with the same probability
+            # stay in the order in which they were added.
+            self._n_best.sort(key=operator.itemgetter(0), reverse=True)
+            self._n_best_sorted = True
+        return self._n_best
+
+    @n_best.setter
+    def n_best(self, n_best):
+        self._n_best = n_best
+        self._n_best_sorted = True
+
     def __str__(self):
         return unicode(self).encode('ascii', 'replace')
 
@@ -80,35 +160,42 @@ class NBList(Hypothesis):
 
     def add(self, probability, fact):
         """\
-        Finds the last hypothesis with a lower probability and inserts the
-        new item before that one.  Optimised for adding objects from the
-        highest probability ones to the lowest probability ones.
+        Adds the new item after all hypotheses with the same or higher
+        probability.  The item is appended and the list is sorted only when
+        it is accessed next time.
 
         """
-        insert_idx = len(self.n_best)
-        while insert_idx > 0:
-            insert_idx -= 1
-            if probability <= self.n_best[insert_idx][0]:
-                insert_idx += 1
-                break
-        self.n_best.insert(insert_idx, [probability, fact])
+        if self._n_best and probability > self._n_best[-1][0]:
+            self._n_best_sorted = False
+        self._n_best.append([probability, fact])
         return self
 
+    def _fact_key(self, fact):
+        """Returns a hashable key of the fact such that equal facts have
+        equal keys.  Used to index the hypotheses when merging."""
+        return fact
+
+    def _merge_hyp(self, new_hyp, cur_hyp):
+        """Merges the hypothesis `cur_hyp' into the hypothesis `new_hyp'
+        with the same fact."""
+        # Merge, add the probabilities.
+        new_hyp[0] += cur_hyp[0]
+
     def merge(self):
         """Adds up probabilities for the same hypotheses. Returns self."""
         if len(self.n_best) <= 1:
             return
         else:
-            new_n_best = self.n_best[:1]
-
-            for cur_idx in xrange(1, len(self.n_best)):
-                cur_hyp = self.n_best[cur_idx]
-                for new_idx, new_hyp in enumerate(new_n_best):
-                    if new_hyp[1] == cur_hyp[1]:
-                        # Merge, add the probabilities.
-                        new_hyp[0] += cur_hyp[0]
-                        break
+            new_n_best = []
+            index = {}
+
+            for cur_hyp in self.n_best:
+                key = self._fact_key(cur_hyp[1])
+                new_hyp = index.get(key)
+                if new_hyp is not None:
+                    self._merge_hyp(new_hyp, cur_hyp)
                 else:
+                    index[key] = cur_hyp
                     new_n_best.append(cur_hyp)
 
         self.n_best = sorted(new_n_best, reverse=True)
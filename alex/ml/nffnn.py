@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import cPickle as pickle
+import sys
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from scipy.special import expit
+
+from exceptions import FFNNException
+
+
+def _relu(y):
+    return np.maximum(y, 0, out=y)
+
+
+def _softplus(y):
+    return np.logaddexp(0, y, out=y)
+
+
+# The hidden activations by the name of the Theano scalar op stored in a saved network.
+ACTIVATIONS = {
+    'tanh': np.tanh,
+    'Tanh': np.tanh,
+    'sigmoid': expit,
+    'ScalarSigmoid': expit,
+    'UltraFastScalarSigmoid': expit,
+    'softplus': _softplus,
+    'ScalarSoftplus': _softplus,
+    'relu': _relu,
+}
+
+
+class _TheanoObject(object):
+    """ Stands in for any Theano object in a pickle so that it can be loaded without Theano.
+
+    The object keeps the state it was pickled with.
+    """
+    def __init__(self, *args, **kwargs):
+        self.args = args
+
+    def __setstate__(self, state):
+        self.state = state
+
+
+def _find_global(module, name):
+    if module == 'theano' or module.startswith('theano.'):
+        return type(str(name), (_TheanoObject,), {'__module__': module})
+
+    __import__(module)
+    return getattr(sys.modules[module], name)
+
+
+def load_pickle(f):
+    """ Loads a pickle which may contain Theano objects, e.g. parameters of a TheanoFFNN, without importing Theano.
+
+    :param f: file object
+    :return: the unpickled object
+    """
+    unpickler = pickle.Unpickler(f)
+    unpickler.find_global = _find_global
+    return unpickler.load()
+
+
+def get_activation(hidden_activation):
+    """ Returns a numpy function computing the hidden activation in place.
+
+    :param hidden_activation: activation name or the Theano activation loaded by load_pickle
+    """
+    if isinstance(hidden_activation, _TheanoObject):
+        hidden_activation = type(hidden_activation.state['scalar_op']).__name__
+
+    try:
+        return ACTIVATIONS[hidden_activation]
+    except (KeyError, TypeError):
+        raise FFNNException("Unsupported hidden activation: %s" % (hidden_activation, ))
+
+
+class NumpyFFNN(object):
+    """ Implements inference of a feed-forward neural network trained by TheanoFFNN in numpy.
+
+    It loads the same saved parameters as TheanoFFNN and returns the same outputs of predict and predict_normalise,
+    however, it does not need Theano. All inputs are processed by float32 matrix multiplications at once.
+    The context window of the previous and next frames is a strided view of the input frames and the amplification
+    of the frames in the window is multiplied into the weights of the first layer.
+    """
+    def __init__(self):
+        self.weights = []
+        self.biases = []
+
+    def set_params(self, params):
+        """ Set the NN params as returned by TheanoFFNN.get_params.
+        """
+        self.input_m, \
+        self.input_std, \
+        params, \
+        self.n_hidden, \
+        self.hidden_activation, \
+        self.n_inputs, \
+        self.n_outputs, \
+        self.weight_l2, \
+        self.prev_frames, \
+        self.next_frames, \
+        self.batch_size, \
+        self.amp, \
+        self.amp_vec = params
+
+        self.activation = get_activation(self.hidden_activation)
+        self.weights = [np.asarray(w, dtype=np.float32) for w in params[0::2]]
+        self.biases = [np.asarray(b, dtype=np.float32) for b in params[1::2]]
+
+        # the first layer applied to normalised and amplified inputs
+        scale = np.asarray(self.amp_vec, dtype=np.float64) / self.input_std
+        w = self.weights[0].astype(np.float64)
+        self.norm_weight = (w * scale[:, np.newaxis]).astype(np.float32)
+        self.norm_bias = (self.biases[0] - np.dot(self.input_m * scale, w)).astype(np.float32)
+
+        # the first layer applied to the context windows of amplified frames
+        self.n_context = self.prev_frames + 1 + self.next_frames
+        self.window_weight = (w * np.repeat(self.amp, self.n_inputs // self.n_context)[:, np.newaxis]).astype(np.float32)
+
+    def load(self, file_name):
+        """ Loads NN saved by TheanoFFNN.
+
+        :param file_name: file name of the saved NN
+        :return: None
+        """
+        with open(file_name, "rb") as f:
+            self.set_params(load_pickle(f))
+
+    def forward(self, x, weight=None, bias=None):
+        """ Returns the output of the last layer for the input rows x.
+
+        :param weight: weights of the first layer which replace the loaded ones
+        :param bias: biases of the first layer which replace the loaded ones
+        """
+        y = np.dot(x, self.weights[0] if weight is None else weight)
+        y += self.biases[0] if bias is None else bias
+
+        for w, b in zip(self.weights[1:], self.biases[1:]):
+            y = np.dot(self.activation(y), w)
+            y += b
+
+        y -= y.max(axis=1)[:, np.newaxis]
+        np.exp(y, out=y)
+        y /= y.sum(axis=1)[:, np.newaxis]
+        return y
+
+    def context_windows(self, x):
+        """ Returns the context windows of the frames in x as a read-only view of x.
+
+        As in TheanoFFNN.frame_multiply_x, the window of each row contains prev_frames + 1 + next_frames consecutive
+        frames and the last window is dropped.
+        """
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        n_features = x.shape[1]
+        if n_features * self.n_context != self.n_inputs:
+            raise FFNNException("Frames with %d features do not fit the context window of %d inputs" %
+                                (n_features, self.n_inputs))
+
+        n_windows = max(len(x) - self.n_context, 0)
+        windows = as_strided(x, shape=(n_windows, self.n_inputs), strides=x.strides)
+        windows.flags.writeable = False
+        return windows
+
+    def predict(self, data_x, batch_size=0, prev_frames=0, next_frames=0, data_y=None):
+        """ Returns the output of the network as TheanoFFNN.predict does.
+
+        If prev_frames or next_frames is set, the network is applied to the context windows of the frames in data_x,
+        which are cut into blocks of batch_size frames first.
+        """
+        if not batch_size:
+            batch_size = max(len(data_x), 1)
+
+        res = []
+        resy = []
+        for i in range(0, len(data_x), batch_size):
+            if prev_frames or next_frames:
+                res.append(self.forward(self.context_windows(data_x[i:i + batch_size]), weight=self.window_weight))
+            else:
+                res.append(self.forward(np.asarray(data_x[i:i + batch_size], dtype=np.float32)))
+
+            if data_y is not None:
+                resy.append(self.frame_multiply_y(data_y[i:i + batch_size], prev_frames, next_frames))
+
+        res = np.vstack(res) if res else np.zeros((0, self.n_outputs), dtype=np.float32)
+        if data_y is not None:
+            return res, np.concatenate(resy)
+
+        return res
+
+    def frame_multiply_y(self, y, prev_frames, next_frames):
+        return y[prev_frames:len(y) - 1 - next_frames]
+
+    def predict_normalise(self, input):
+        """ Returns the output of the network for the normalised and amplified inputs.
+
+        Unlike TheanoFFNN.predict_normalise, the input is not modified.
+        """
+        return self.forward(np.asarray(input, dtype=np.float32), weight=self.norm_weight, bias=self.norm_bias)
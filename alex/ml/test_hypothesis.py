@@ -1,6 +1,7 @@
 from unittest import TestCase
+from itertools import islice, product
 
-from alex.ml.hypothesis import ConfusionNetwork
+from alex.ml.hypothesis import ConfusionNetwork, NBList, iter_kbest
 
 class TestConfusionNetwork(TestCase):
     def test_iter(self):
@@ -29,4 +30,66 @@ class TestConfusionNetwork(TestCase):
         dacn.remove(3)
 
         self.assertTrue(2 in dacn)
-        self.assertTrue(len(dacn) == 1)
\ No newline at end of file
+        self.assertTrue(len(dacn) == 1)
+
+
+class TestNBList(TestCase):
+    def test_add(self):
+        nblist = NBList()
+        nblist.add(0.2, 'a')
+        nblist.add(0.5, 'b')
+        nblist.add(0.2, 'c')
+        nblist.add(0.1, 'd')
+        nblist.add(0.5, 'e')
+
+        self.assertEqual([fact for prob, fact in nblist], ['b', 'e', 'a', 'c', 'd'])
+        self.assertEqual(nblist.get_best(), 'b')
+
+    def test_merge(self):
+        nblist = NBList()
+        nblist.add(0.2, 'a')
+        nblist.add(0.1, 'b')
+        nblist.add(0.3, 'a')
+        nblist.add(0.1, 'c')
+        nblist.add(0.05, 'b')
+        nblist.merge()
+
+        self.assertEqual(len(nblist), 3)
+        self.assertEqual(nblist[0], [0.5, 'a'])
+        self.assertEqual(nblist[1][1], 'b')
+        self.assertAlmostEqual(nblist[1][0], 0.15)
+        self.assertEqual(nblist[2], [0.1, 'c'])
+
+
+class TestKBest(TestCase):
+    def test_iter_kbest(self):
+        alternatives = [[0.9, 0.05, 0.05], [0.5, 0.35, 0.15], [0.6, 0.3, 0.1]]
+
+        all_hyps = []
+        for idx in product(*[range(len(alts)) for alts in alternatives]):
+            prob = 1.0
+            for alts, i in zip(alternatives, idx):
+                prob *= alts[i]
+            all_hyps.append((prob, idx))
+        all_hyps.sort(reverse=True)
+
+        kbest = list(iter_kbest(alternatives))
+        self.assertEqual(len(kbest), len(all_hyps))
+        self.assertEqual(len(set(idx for prob, idx in kbest)), len(all_hyps))
+        for (prob, idx), (exp_prob, exp_idx) in zip(kbest, all_hyps):
+            self.assertAlmostEqual(prob, exp_prob)
+
+    def test_iter_kbest_lazy(self):
+        alternatives = [[0.5, 0.5]] * 100
+
+        kbest = list(islice(iter_kbest(alternatives), 5))
+        self.assertEqual(len(kbest), 5)
+        self.assertEqual(kbest[0][1], (0, ) * 100)
+
+    def test_iter_kbest_zero_prob(self):
+        kbest = list(iter_kbest([[1.0, 0.0], [0.7, 0.3]]))
+
+        self.assertEqual([idx for prob, idx in kbest[:2]], [(0, 0), (0, 1)])
+        self.assertAlmostEqual(kbest[0][0], 0.7)
+        self.assertAlmostEqual(kbest[1][0], 0.3)
+        self.assertEqual([prob for prob, idx in kbest[2:]], [0.0, 0.0])
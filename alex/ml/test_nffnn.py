@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+if __name__ == "__main__":
+    import autopath
+
+from alex.ml.exceptions import FFNNException
+from alex.ml.nffnn import NumpyFFNN
+
+
+class TestNumpyFFNN(unittest.TestCase):
+    def save_theano_ffnn(self, hidden_activation, prev_frames=0, next_frames=0):
+        try:
+            from alex.ml.tffnn import TheanoFFNN
+        except ImportError as e:
+            self.skipTest("Theano is not available: %s" % e)
+
+        n_features = 6
+        tffnn = TheanoFFNN(n_features * (prev_frames + 1 + next_frames), 8, 2, 3, prev_frames=prev_frames,
+                           next_frames=next_frames, amplify_center_frame=4.0, hidden_activation=hidden_activation)
+        tffnn.set_input_norm(np.random.randn(tffnn.n_inputs).astype(np.float32),
+                             np.random.uniform(0.5, 2.0, tffnn.n_inputs).astype(np.float32))
+
+        fd, file_name = tempfile.mkstemp(suffix='.tffnn')
+        os.close(fd)
+        self.addCleanup(os.remove, file_name)
+        tffnn.save(file_name)
+
+        return tffnn, file_name
+
+    def load_numpy_ffnn(self, file_name):
+        # hide Theano so that the model cannot be loaded with its help
+        theano_modules = dict((m, sys.modules[m]) for m in sys.modules if m == 'theano' or m.startswith('theano.'))
+        sys.modules.update((m, None) for m in theano_modules)
+        try:
+            nffnn = NumpyFFNN()
+            nffnn.load(file_name)
+        finally:
+            sys.modules.update(theano_modules)
+
+        return nffnn
+
+    def test_predict_same_as_theano(self):
+        for hidden_activation in ['tanh', 'sigmoid', 'softplus']:
+            tffnn, file_name = self.save_theano_ffnn(hidden_activation)
+            nffnn = self.load_numpy_ffnn(file_name)
+
+            x = np.random.randn(50, tffnn.n_inputs).astype(np.float32)
+            self.assertTrue(np.allclose(nffnn.predict(x), tffnn.predict(x), atol=1e-6))
+            self.assertTrue(np.allclose(nffnn.predict(x, batch_size=7), tffnn.predict(x, batch_size=7), atol=1e-6))
+            self.assertTrue(np.allclose(nffnn.predict_normalise(x), tffnn.predict_normalise(x.copy()), atol=1e-6))
+
+    def test_predict_context_windows_same_as_theano(self):
+        tffnn, file_name = self.save_theano_ffnn('tanh', prev_frames=3, next_frames=2)
+        nffnn = self.load_numpy_ffnn(file_name)
+
+        x = np.random.randn(200, 6).astype(np.float32)
+        y = np.arange(200)
+        for batch_size in [0, 30]:
+            tpred = tffnn.predict(x, batch_size, 3, 2)
+            npred, ny = nffnn.predict(x, batch_size, 3, 2, y)
+
+            self.assertEqual(npred.dtype, np.float32)
+            self.assertEqual(npred.shape, tpred.shape)
+            self.assertTrue(np.allclose(npred, tpred, atol=1e-6))
+            self.assertEqual(len(ny), len(npred))
+            self.assertEqual(ny[0], 3)
+
+    def test_context_windows_are_views(self):
+        nffnn = NumpyFFNN()
+        nffnn.set_params((np.zeros(6), np.ones(6), [np.zeros((6, 2), np.float32), np.zeros(2, np.float32)], [],
+                          'tanh', 6, 2, 0.0, 1, 1, 0, [0.5, 1.0, 0.5], np.repeat([0.5, 1.0, 0.5], 2)))
+
+        x = np.arange(20, dtype=np.float32).reshape(10, 2)
+        windows = nffnn.context_windows(x)
+
+        self.assertTrue(np.may_share_memory(windows, x))
+        self.assertEqual(windows.shape, (7, 6))
+        self.assertTrue(np.array_equal(windows[4], x[4:7].ravel()))
+        self.assertRaises(FFNNException, nffnn.context_windows, np.zeros((10, 3), np.float32))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -55,9 +55,7 @@ learning_rate_decay = 100.0
 weight_l2=1e-6
 batch_size= 500000 
 
-fetures_file_name = "model_voip/lid_mb_mfr%d_mfl%d_mfps%d_ts%d_usec0%d_usedelta%d_useacc%d_mbo%d.npc" % \
-                             (max_frames, max_files, max_frames_per_segment, trim_segments, 
-                              usec0, usedelta, useacc, mel_banks_only)
+features_store_dir = "model_voip/lid_features"
 
 
 def load_mlf(train_data_sil_aligned, max_files, max_frames_per_segment, lang):
@@ -86,7 +84,7 @@ def load_mlf(train_data_sil_aligned, max_files, max_frames_per_segment, lang):
     return mlf
 
 def gen_features(speech_data, speech_alignment):
-    vta = MLFMFCCOnlineAlignedArray(usec0=usec0,n_last_frames=0, usedelta = usedelta, useacc = useacc, mel_banks_only = mel_banks_only)
+    vta = MLFMFCCFeatureStore(features_store_dir, usec0=usec0,n_last_frames=0, usedelta = usedelta, useacc = useacc, mel_banks_only = mel_banks_only)
 
     lang_count = defaultdict(int)
     for sd, sa in zip(speech_data, speech_alignment):
@@ -112,50 +110,21 @@ def gen_features(speech_data, speech_alignment):
 
 #    print labels
 
-    mfcc = vta.__iter__().next()
+    print "Loading the features from:", features_store_dir
+    vta.open()
 
-    print "Features vector length:", len(mfcc[0])
-    input_size = len(mfcc[0])
+    print "Features vector length:", vta.features.shape[1]
 
     print "Generating the cross-validation and train features"
-    crossvalid_x = []
-    crossvalid_y = []
-    train_x = []
-    train_y = []
-    i = 0
-    samplingC = 0
-    for frame, label in vta:
-        # downcast
-        frame = frame.astype(np.float32)
-
-#        if label == 'sil':
-#            # we do not want to train and test on silence and or other noises
-#            continue
-            
-        if i % (max_frames / 10) == 0:
-            print "Already processed: %.2f%% of data" % (100.0*i/max_frames)
-
-        if i >= max_frames:
-            break
-            
-        if samplingC > 0 or float(len(crossvalid_x)) / (len(train_x)+1) < float(crossvalid_frames)/max_frames:
-            if not samplingC:
-                samplingC = int(crossvalid_frames*0.05)
-            # sample validation (test) data
-            crossvalid_x.append(frame)
-            crossvalid_y.append(labels[label])
-                
-            samplingC -= 1
-        else:
-            train_x.append(frame)
-            train_y.append(labels[label])
+    n_frames = min(len(vta), max_frames)
+    crossvalid = split_crossvalid(n_frames, crossvalid_frames, max_frames)
+    label_ids = np.array([labels[l] for l in vta.label_names], dtype=np.int32)
+    frames_y = label_ids[vta.labels[:n_frames]]
 
-        i += 1
-
-    crossvalid_x = np.array(crossvalid_x).astype(np.float32)
-    crossvalid_y = np.array(crossvalid_y).astype('int32')
-    train_x = np.array(train_x).astype(np.float32)
-    train_y = np.array(train_y).astype('int32')
+    crossvalid_x = vta.features[:n_frames][crossvalid]
+    crossvalid_y = frames_y[crossvalid]
+    train_x = vta.features[:n_frames][~crossvalid]
+    train_y = frames_y[~crossvalid]
 
     # normalise the data
     tx_m = np.mean(train_x, axis=0)
@@ -166,16 +135,6 @@ def gen_features(speech_data, speech_alignment):
     train_x -= tx_m
     train_x /= tx_std
 
-    print 'Saving data to:', fetures_file_name
-    f = open(fetures_file_name, "wb")
-    np.save(f, crossvalid_x) 
-    np.save(f, crossvalid_y)
-    np.save(f, train_x)
-    np.save(f, train_y)
-    np.save(f, tx_m)
-    np.save(f, tx_std)
-    f.close()
-
     return crossvalid_x, crossvalid_y, train_x, train_y, tx_m, tx_std
 
 
@@ -195,17 +154,7 @@ def train_nn(speech_data, speech_alignment):
     print datetime.datetime.now()
     print
     random.seed(0)
-    try:
-        f = open(fetures_file_name, "rb")
-        crossvalid_x = np.load(f) 
-        crossvalid_y = np.load(f)
-        train_x = np.load(f)
-        train_y = np.load(f)
-        tx_m = np.load(f)
-        tx_std = np.load(f)
-        f.close()
-    except IOError:  
-        crossvalid_x, crossvalid_y, train_x, train_y, tx_m, tx_std = gen_features(speech_data, speech_alignment)
+    crossvalid_x, crossvalid_y, train_x, train_y, tx_m, tx_std = gen_features(speech_data, speech_alignment)
 
     input_size = train_x.shape[1] * (prev_frames + 1 + next_frames)
     output_size = np.amax(train_y)+1
@@ -329,7 +278,7 @@ def main():
     global crossvalid_frames, usec0
     global hidden_dropouts, weight_l2
     global mel_banks_only
-    global fetures_file_name
+    global features_store_dir
 
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -410,9 +359,7 @@ def main():
     train_speech.append('data_voip_cs/train/*.wav')
     train_speech_alignment.append('model_voip_cs/aligned_best.mlf')
 
-    fetures_file_name = "model_voip/lid_mb_mfr%d_mfl%d_mfps%d_ts%d_usec0%d_usedelta%d_useacc%d_mbo%d.npc" % \
-                             (max_frames, max_files, max_frames_per_segment, trim_segments, 
-                              usec0, usedelta, useacc, mel_banks_only)
+    features_store_dir = "model_voip/lid_features"
 
     print datetime.datetime.now()
 
@@ -87,7 +87,7 @@ def load_mlf(train_data_sil_aligned, max_files, max_frames_per_segment):
 
 
 def gen_features(speech_data, speech_alignment):
-    vta = MLFMFCCOnlineAlignedArray(usec0=usec0,n_last_frames=0, usedelta = usedelta, useacc = useacc, mel_banks_only = mel_banks_only)
+    vta = MLFMFCCFeatureStore(features_store_dir, usec0=usec0,n_last_frames=0, usedelta = usedelta, useacc = useacc, mel_banks_only = mel_banks_only)
     sil_count = 0
     speech_count = 0
     for sd, sa in zip(speech_data, speech_alignment):
@@ -101,54 +101,21 @@ def gen_features(speech_data, speech_alignment):
     print "The length of sil segments:    ", sil_count
     print "The length of speech segments: ", speech_count
 
-    mfcc = vta.__iter__().next()
+    print "Loading the features from:", features_store_dir
+    vta.open()
 
-    print "Features vector length:", len(mfcc[0])
-    input_size = len(mfcc[0])
+    print "Features vector length:", vta.features.shape[1]
 
     print "Generating the cross-validation and train features"
-    crossvalid_x = []
-    crossvalid_y = []
-    train_x = []
-    train_y = []
-    i = 0
-    samplingC = 0
-    for frame, label in vta:
-        # downcast
-        frame = frame.astype(np.float32)
-    #        frame = frame - (10.0 if mel_banks_only else 0.0)
-
-        if i % (max_frames / 10) == 0:
-            print "Already processed: %.2f%% of data" % (100.0*i/max_frames)
-
-        if i >= max_frames:
-            break
-
-
-        if samplingC > 0 or float(len(crossvalid_x)) / (len(train_x)+1) < float(crossvalid_frames)/max_frames:
-            if not samplingC:
-                samplingC = int(crossvalid_frames*0.05)
-            # sample validation (test) data
-            crossvalid_x.append(frame)
-            if label == "sil":
-                crossvalid_y.append(0)
-            else:
-                crossvalid_y.append(1)
-                
-            samplingC -= 1
-        else:
-            train_x.append(frame)
-            if label == "sil":
-                train_y.append(0)
-            else:
-                train_y.append(1)
-
-        i += 1
+    n_frames = min(len(vta), max_frames)
+    crossvalid = split_crossvalid(n_frames, crossvalid_frames, max_frames)
+    label_ids = np.array([0 if l == 'sil' else 1 for l in vta.label_names], dtype=np.int32)
+    frames_y = label_ids[vta.labels[:n_frames]]
 
-    crossvalid_x = np.array(crossvalid_x).astype(np.float32)
-    crossvalid_y = np.array(crossvalid_y).astype('int32')
-    train_x = np.array(train_x).astype(np.float32)
-    train_y = np.array(train_y).astype('int32')
+    crossvalid_x = vta.features[:n_frames][crossvalid]
+    crossvalid_y = frames_y[crossvalid]
+    train_x = vta.features[:n_frames][~crossvalid]
+    train_y = frames_y[~crossvalid]
 
     # normalise the data
     tx_m = np.mean(train_x, axis=0)
@@ -159,16 +126,6 @@ def gen_features(speech_data, speech_alignment):
     train_x -= tx_m
     train_x /= tx_std
 
-    print 'Saving data to:', features_file_name
-    f = open(features_file_name, "wb")
-    np.save(f, crossvalid_x) 
-    np.save(f, crossvalid_y)
-    np.save(f, train_x)
-    np.save(f, train_y)
-    np.save(f, tx_m)
-    np.save(f, tx_std)
-    f.close()
-
     return crossvalid_x, crossvalid_y, train_x, train_y, tx_m, tx_std
 
 
@@ -188,17 +145,7 @@ def train_nn(speech_data, speech_alignment):
     print datetime.datetime.now()
     print
     random.seed(0)
-    try:
-        f = open(features_file_name, "rb")
-        crossvalid_x = np.load(f) 
-        crossvalid_y = np.load(f)
-        train_x = np.load(f)
-        train_y = np.load(f)
-        tx_m = np.load(f)
-        tx_std = np.load(f)
-        f.close()
-    except IOError:  
-        crossvalid_x, crossvalid_y, train_x, train_y, tx_m, tx_std = gen_features(speech_data, speech_alignment)
+    crossvalid_x, crossvalid_y, train_x, train_y, tx_m, tx_std = gen_features(speech_data, speech_alignment)
     
     input_size = train_x.shape[1] * (prev_frames + 1 + next_frames)
 
@@ -320,7 +267,7 @@ def main():
     global crossvalid_frames, usec0
     global hidden_dropouts, weight_l2
     global mel_banks_only
-    global features_file_name
+    global features_store_dir
 
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -400,9 +347,7 @@ def main():
     train_speech.append('data_voip_cs/train/*.wav')
     train_speech_alignment.append('model_voip_cs/aligned_best.mlf')
 
-    features_file_name = "model_voip/vad_sds_mfcc_mfr%d_mfl%d_mfps%d_ts%d_usec0%d_usedelta%d_useacc%d_mbo%d.npc" % \
-                             (max_frames, max_files, max_frames_per_segment, trim_segments,
-                              usec0, usedelta, useacc, mel_banks_only)
+    features_store_dir = "model_voip/vad_features"
 
     print datetime.datetime.now()
 
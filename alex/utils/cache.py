@@ -4,6 +4,7 @@
 # pylint: disable-msg=E1103
 
 
+import atexit
 import collections
 import functools
 import os
@@ -11,12 +12,17 @@ import os.path
 import cPickle as pickle
 import fcntl
 import hashlib
+import sqlite3
+import threading
+import time
 
 from itertools import ifilterfalse
 from heapq import nsmallest
 from operator import itemgetter
 
 persistent_cache_directory = '~/.alex_persistent_cache'
+persistent_cache_store_file = '~/.alex_persistent_cache.sqlite'
+persistent_cache_store_max_size = 1024 ** 3
 
 
 class Counter(dict):
@@ -31,6 +37,7 @@ def lru_cache(maxsize=100):
     Arguments to the cached function must be hashable.
     Cache performance statistics stored in f.hits and f.misses.
     Clear the cache with f.clear().
+    The cache can be used from several threads; the cached function itself is called outside of the lock.
     http://en.wikipedia.org/wiki/Cache_algorithms#Least_Recently_Used
 
     '''
@@ -42,6 +49,7 @@ def lru_cache(maxsize=100):
         refcount = Counter()        # times each key is in the queue
         sentinel = object()         # marker for looping around the queue
         kwd_mark = object()         # separate positional and keyword args
+        lock = threading.Lock()     # guards the cache, the queue and the statistics
 
         # lookup optimizations (ugly but fast)
         queue_append, queue_popleft = queue.append, queue.popleft
@@ -54,18 +62,23 @@ def lru_cache(maxsize=100):
             if kwds:
                 key += (kwd_mark,) + tuple(sorted(kwds.items()))
 
-            # record recent use of this key
-            queue_append(key)
-            refcount[key] += 1
-
             # get cache entry or compute if not found
-            try:
-                result = cache[key]
-                wrapper.hits += 1
-            except KeyError:
-                result = user_function(*args, **kwds)
+            with lock:
+                try:
+                    result = cache[key]
+                except KeyError:
+                    pass
+                else:
+                    wrapper.hits += 1
+                    record_use(key)
+                    return result
+
+            result = user_function(*args, **kwds)
+
+            with lock:
                 cache[key] = result
                 wrapper.misses += 1
+                record_use(key)
 
                 # purge least recently used cache entry
                 if len(cache) > maxsize:
@@ -76,23 +89,29 @@ def lru_cache(maxsize=100):
                         refcount[key] -= 1
                     del cache[key], refcount[key]
 
+            return result
+
+        def record_use(key):
+            # record recent use of this key, the caller holds the lock
+            queue_append(key)
+            refcount[key] += 1
+
             # periodically compact the queue by eliminating duplicate keys
             # while preserving order of most recent access
             if len(queue) > maxqueue:
                 refcount.clear()
                 queue_appendleft(sentinel)
-                for key in ifilterfalse(refcount.__contains__,
-                                        iter(queue_pop, sentinel)):
-                    queue_appendleft(key)
-                    refcount[key] = 1
-
-            return result
+                for k in ifilterfalse(refcount.__contains__,
+                                      iter(queue_pop, sentinel)):
+                    queue_appendleft(k)
+                    refcount[k] = 1
 
         def clear():
-            cache.clear()
-            queue.clear()
-            refcount.clear()
-            wrapper.hits = wrapper.misses = 0
+            with lock:
+                cache.clear()
+                queue.clear()
+                refcount.clear()
+                wrapper.hits = wrapper.misses = 0
 
         wrapper.hits = wrapper.misses = 0
         wrapper.clear = clear
@@ -108,6 +127,7 @@ def lfu_cache(maxsize=100):
     Arguments to the cached function must be hashable.
     Cache performance statistics stored in f.hits and f.misses.
     Clear the cache with f.clear().
+    The cache can be used from several threads; the cached function itself is called outside of the lock.
     http://en.wikipedia.org/wiki/Least_Frequently_Used
 
     '''
@@ -115,6 +135,7 @@ def lfu_cache(maxsize=100):
         cache = {}                      # mapping of args to results
         use_count = Counter()           # times each key has been accessed
         kwarg_mark = object()           # separate positional and keyword args
+        lock = threading.Lock()         # guards the cache and the statistics
 
         @functools.wraps(user_function)
         def wrapper(*args, **kwargs):
@@ -123,27 +144,34 @@ def lfu_cache(maxsize=100):
                 key += (kwarg_mark,) + tuple(sorted(kwargs.items()))
 
             # get cache entry or compute if not found
-            try:
-                result = cache[key]
-                use_count[key] += 1
-                wrapper.hits += 1
-            except KeyError:
+            with lock:
+                try:
+                    result = cache[key]
+                    use_count[key] += 1
+                    wrapper.hits += 1
+                    return result
+                except KeyError:
+                    pass
+
+            result = user_function(*args, **kwargs)
+
+            with lock:
                 # need to add something to the cache, make room if necessary
-                if len(cache) == maxsize:
+                if key not in cache and len(cache) >= maxsize:
                     for k, _ in nsmallest(maxsize // 10 or 1,
                                           use_count.iteritems(),
                                           key=itemgetter(1)):
                         del cache[k], use_count[k]
-                cache[key] = user_function(*args, **kwargs)
-                result = cache[key]
+                cache[key] = result
                 use_count[key] += 1
                 wrapper.misses += 1
             return result
 
         def clear():
-            cache.clear()
-            use_count.clear()
-            wrapper.hits = wrapper.misses = 0
+            with lock:
+                cache.clear()
+                use_count.clear()
+                wrapper.hits = wrapper.misses = 0
 
         wrapper.hits = wrapper.misses = 0
         wrapper.clear = clear
@@ -185,16 +213,237 @@ def set_persitent_cache_content(key, value):
     f.close()
 
 
-def persistent_cache(method=False, file_prefix='', file_suffix=''):
+class PersistentCacheStore(object):
+    '''Persistent cache stored in a single SQLite database with LRU eviction.
+
+    Strings are stored as raw bytes, all other values are pickled. When the total size of the stored values
+    exceeds max_size bytes, the least recently used entries are evicted. Each write is done in one transaction,
+    so that other processes never see a partially written value.
+
+    The hits, misses and evictions are counted in the database, so that they are shared by all processes
+    using the same file.
+
+    Reading an entry does not write into the database. The access times of the read entries and the hits and
+    misses are collected in memory and written in one transaction with the next write, when stats() is called,
+    or at most every flush_interval seconds. The rest is written by close(), which is also called at exit.
+    Processes which end without running the exit handlers, e.g. multiprocessing children, should call close().
+
+    '''
+    RAW = 0
+    PICKLE = 1
+
+    def __init__(self, file_name, max_size=persistent_cache_store_max_size, timeout=30.0, flush_interval=5.0):
+        self.file_name = os.path.expanduser(file_name)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+
+        self._local = threading.local()
+
+        # the access times and the statistics of the reads which are not written into the database yet
+        self._pending_lock = threading.Lock()
+        self._pending_atimes = {}
+        self._pending_stats = Counter()
+        self._pending_pid = os.getpid()
+        self._last_flush = time.time()
+
+        atexit.register(self._close_at_exit)
+
+    def configure(self, file_name=None, max_size=None):
+        '''Change the database file and the size limit, e.g. to those from the configuration.
+
+        The recent reads are written into the previous file first.
+
+        '''
+        self.flush()
+        if file_name is not None:
+            self.file_name = os.path.expanduser(file_name)
+        if max_size is not None:
+            self.max_size = max_size
+
+    def close(self):
+        '''Write the recent reads into the database and close the connection of this thread.'''
+        self.flush()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    def _close_at_exit(self):
+        try:
+            self.close()
+        except sqlite3.Error:
+            # the database may be gone already, e.g. a temporary one
+            pass
+
+    def _connection(self):
+        # a SQLite connection must not be shared by forked processes or by threads
+        if getattr(self._local, 'conn', None) is None or self._local.pid != os.getpid() or \
+                self._local.file_name != self.file_name:
+            if getattr(self._local, 'conn', None) is not None and self._local.pid == os.getpid():
+                # the store was configured to use another file
+                self._local.conn.close()
+            conn = sqlite3.connect(self.file_name, timeout=self.timeout, isolation_level=None)
+            conn.text_factory = str
+
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS entries ('
+                         'key TEXT PRIMARY KEY, type INTEGER, value BLOB, size INTEGER, atime REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_atime ON entries (atime)')
+            conn.execute('CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)')
+            conn.execute("INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0), "
+                         "('evictions', 0), ('size', 0)")
+
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.file_name = self.file_name
+
+        return self._local.conn
+
+    def _add_stat(self, conn, name, value):
+        conn.execute('UPDATE stats SET value = value + ? WHERE name = ?', (value, name))
+
+    def _take_pending(self):
+        with self._pending_lock:
+            if self._pending_pid != os.getpid():
+                # the reads of the parent process are written by the parent
+                self._pending_atimes, self._pending_stats = {}, Counter()
+                self._pending_pid = os.getpid()
+
+            atimes, stats = self._pending_atimes, self._pending_stats
+            self._pending_atimes, self._pending_stats = {}, Counter()
+            self._last_flush = time.time()
+
+        return atimes, stats
+
+    def _write_pending(self, conn, atimes, stats):
+        if atimes:
+            conn.executemany('UPDATE entries SET atime = MAX(atime, ?) WHERE key = ?',
+                             [(atime, key) for key, atime in atimes.iteritems()])
+        for name, value in stats.iteritems():
+            self._add_stat(conn, name, value)
+
+    def flush(self):
+        '''Write the access times and the statistics of the recent reads into the database.'''
+        atimes, stats = self._take_pending()
+        if not atimes and not stats:
+            return
+
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._write_pending(conn, atimes, stats)
+            conn.execute('COMMIT')
+        except:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get(self, key):
+        '''Return the value stored under the key and mark it as recently used.
+
+        Raises KeyError if the key is not stored.
+
+        '''
+        conn = self._connection()
+        row = conn.execute('SELECT type, value FROM entries WHERE key = ?', (key,)).fetchone()
+
+        with self._pending_lock:
+            if row is None:
+                self._pending_stats['misses'] += 1
+            else:
+                self._pending_atimes[key] = time.time()
+                self._pending_stats['hits'] += 1
+            flush = time.time() - self._last_flush >= self.flush_interval
+        if flush:
+            self.flush()
+
+        if row is None:
+            raise KeyError(key)
+
+        value_type, value = row
+        if value_type == self.PICKLE:
+            return pickle.loads(str(value))
+        return str(value)
+
+    def set(self, key, value):
+        '''Store the value under the key and evict the least recently used entries if the store is too big.'''
+        if isinstance(value, str):
+            value_type = self.RAW
+        else:
+            value_type = self.PICKLE
+            value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        atimes, stats = self._take_pending()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._write_pending(conn, atimes, stats)
+            row = conn.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self._add_stat(conn, 'size', -row[0])
+            conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                         (key, value_type, sqlite3.Binary(value), len(value), time.time()))
+            self._add_stat(conn, 'size', len(value))
+
+            size = conn.execute("SELECT value FROM stats WHERE name = 'size'").fetchone()[0]
+            evicted = 0
+            while size > self.max_size:
+                lru_entries = conn.execute('SELECT key, size FROM entries WHERE key != ? ORDER BY atime LIMIT 100',
+                                           (key,)).fetchall()
+                if not lru_entries:
+                    break
+                for old_key, old_size in lru_entries:
+                    if size <= self.max_size:
+                        break
+                    conn.execute('DELETE FROM entries WHERE key = ?', (old_key,))
+                    size -= old_size
+                    evicted += 1
+            if evicted:
+                conn.execute("UPDATE stats SET value = ? WHERE name = 'size'", (size,))
+                self._add_stat(conn, 'evictions', evicted)
+            conn.execute('COMMIT')
+        except:
+            conn.execute('ROLLBACK')
+            raise
+
+    def stats(self):
+        '''Return a dictionary with the number of hits, misses and evictions, the number of entries and their size.
+
+        The reads of other processes are included once they are flushed.
+
+        '''
+        self.flush()
+        conn = self._connection()
+        stats = dict(conn.execute('SELECT name, value FROM stats').fetchall())
+        stats['entries'] = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        return stats
+
+    def clear(self):
+        '''Remove all entries and reset the statistics.'''
+        self._take_pending()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('DELETE FROM entries')
+        conn.execute('UPDATE stats SET value = 0')
+        conn.execute('COMMIT')
+
+
+persistent_cache_store = PersistentCacheStore(persistent_cache_store_file)
+
+
+def persistent_cache(method=False, file_prefix='', file_suffix='', store=None):
     '''Persistent cache decorator.
 
-    It grows indefinitely.
+    If store is None, each value is pickled into its own file in the persistent cache directory and the cache
+    grows indefinitely. Otherwise, the values are kept in the given PersistentCacheStore.
     Arguments to the cached function must be hashable.
     Cache performance statistics stored in f.hits and f.misses.
 
     '''
     sha = hashlib.sha1()
     def decorator(user_function):
+        lock = threading.Lock()  # guards the statistics
+
         @functools.wraps(user_function)
         def wrapper(*args, **kwds):
             key = (file_prefix,)
@@ -212,14 +461,22 @@ def persistent_cache(method=False, file_prefix='', file_suffix=''):
             key = (hashlib.sha224(str(key)).hexdigest(),)
 
             try:
-                result = get_persitent_cache_content(key)
-                wrapper.hits += 1
+                if store is not None:
+                    result = store.get(key[0])
+                else:
+                    result = get_persitent_cache_content(key)
+                with lock:
+                    wrapper.hits += 1
             except KeyError:
                 result = user_function(*args, **kwds)
-                wrapper.misses += 1
+                with lock:
+                    wrapper.misses += 1
 
                 # record this key
-                set_persitent_cache_content(key, result)         
+                if store is not None:
+                    store.set(key[0], result)
+                else:
+                    set_persitent_cache_content(key, result)
 
             return result
 
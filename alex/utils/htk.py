@@ -5,8 +5,14 @@
 import numpy
 import re
 import glob
+import hashlib
+import json
+import multiprocessing
+import os
 import wave
 
+from itertools import imap
+
 from struct import unpack, pack
 
 from alex.utils.cache import lru_cache
@@ -395,6 +401,30 @@ class MLFMFCCOnlineAlignedArray(MLFFeaturesAlignedArray):
 
         self.mfcc_front_end = None
 
+    def get_frame_geometry(self, sample_rate):
+        """Returns the frame size and the frame shift in samples."""
+        frame_size = int(sample_rate * self.windowsize / 10000000)
+        if frame_size > 1024:
+            frame_size = 2048
+        elif frame_size > 512:
+            frame_size = 1024
+        elif frame_size > 256:
+            frame_size = 512
+        elif frame_size > 128:
+            frame_size = 256
+        elif frame_size > 64:
+            frame_size = 128
+
+        frame_shift = int(sample_rate * self.targetrate / 10000000)
+
+        return frame_size, frame_shift
+
+    def create_front_end(self, sample_rate):
+        frame_size, frame_shift = self.get_frame_geometry(sample_rate)
+        return MFCCFrontEnd(sample_rate, frame_size, usec0=self.usec0,
+                            usedelta=self.usedelta, useacc=self.useacc,
+                            n_last_frames=self.n_last_frames, mel_banks_only = self.mel_banks_only)
+
     def get_frame(self, file_name, frame_id):
         """Returns a frame from a specific param file."""
         if self.last_file_name != file_name:
@@ -421,22 +451,8 @@ class MLFMFCCOnlineAlignedArray(MLFFeaturesAlignedArray):
                 raise Exception('Input wave is not in 16bit')
 
             sample_rate = self.last_param_file_features.getframerate()
-            self.frame_size = int(sample_rate * self.windowsize / 10000000)
-            if self.frame_size > 1024:
-                self.frame_size = 2048
-            elif self.frame_size > 512:
-                self.frame_size = 1024
-            elif self.frame_size > 256:
-                self.frame_size = 512
-            elif self.frame_size > 128:
-                self.frame_size = 256
-            elif self.frame_size > 64:
-                self.frame_size = 128
-
-            self.frame_shift = int(sample_rate * self.targetrate / 10000000)
-            self.mfcc_front_end = MFCCFrontEnd(sample_rate, self.frame_size, usec0=self.usec0,
-                                               usedelta=self.usedelta, useacc=self.useacc,
-                                               n_last_frames=self.n_last_frames, mel_banks_only = self.mel_banks_only)
+            self.frame_size, self.frame_shift = self.get_frame_geometry(sample_rate)
+            self.mfcc_front_end = self.create_front_end(sample_rate)
 
         # print "FS", self.frame_size
         self.last_param_file_features.setpos(max(frame_id * self.frame_shift - int(self.frame_size / 2), 0))
@@ -452,3 +468,255 @@ class MLFMFCCOnlineAlignedArray(MLFFeaturesAlignedArray):
             raise
             
         return mfcc_params
+
+
+def count_online_frames(n_samples, frame_size, frame_shift):
+    """Returns the number of frames which MLFMFCCOnlineAlignedArray.get_frame computes from a file with n_samples.
+
+    The frame frame_id starts half of the frame before frame_id * frame_shift, or at the start of the file.
+    Only complete frames are counted.
+    """
+    if n_samples < frame_size:
+        return 0
+    return (n_samples - frame_size + int(frame_size / 2)) / frame_shift + 1
+
+
+def compute_aligned_features(task):
+    """Computes the features of the aligned frames of one wav file.
+
+    All frames of the file are computed by one call of MFCCFrontEnd.param_block and the aligned frames are selected
+    afterwards. So the state of the front end, i.e. the preemphasis, the deltas and the n_last_frames context, is
+    always updated with the preceding frame of the file. MLFMFCCOnlineAlignedArray.get_frame updates it only with
+    the aligned frames. The features are thus the same only if the segments cover the file without gaps. After a gap,
+    e.g. the frames removed by MLF.trim_segments or MLF.shorten_segments, the features here are those of the
+    continuous audio, as an online VAD computes them, while get_frame continues from the frame before the gap.
+
+    :param task: a tuple of the task index, the MLFMFCCOnlineAlignedArray parameters, the wav file name and a list
+        of the (start frame, end frame, label id) segments
+    :return: the task index, a matrix of features and a vector of label ids, one row per aligned frame
+    """
+    index, params, param_file_name, segments = task
+    vta = MLFMFCCOnlineAlignedArray(**params)
+
+    wav = wave.open(param_file_name, 'r')
+    if wav.getnchannels() != 1:
+        raise Exception('Input wave is not in mono')
+    if wav.getsampwidth() != 2:
+        raise Exception('Input wave is not in 16bit')
+    sample_rate = wav.getframerate()
+    samples = numpy.frombuffer(wav.readframes(wav.getnframes()), dtype=numpy.int16)
+    wav.close()
+
+    frame_size, frame_shift = vta.get_frame_geometry(sample_rate)
+    front_end = vta.create_front_end(sample_rate)
+    n_frames = count_online_frames(len(samples), frame_size, frame_shift)
+
+    # the first frames all start at the start of the file
+    n_clipped = min(int(frame_size / 2) / frame_shift + 1, n_frames)
+    features = [front_end.param(samples[:frame_size]).astype(numpy.float32).reshape(1, -1) for i in range(n_clipped)]
+    if n_frames > n_clipped:
+        features.append(front_end.param_block(samples[n_clipped * frame_shift - int(frame_size / 2):], frame_shift))
+    features = numpy.vstack(features) if features else numpy.zeros((0, front_end.get_size()), dtype=numpy.float32)
+
+    frame_ids = [numpy.arange(s, min(e, n_frames)) for s, e, l in segments]
+    label_ids = [numpy.repeat(numpy.int32(l), len(ids)) for ids, (s, e, l) in zip(frame_ids, segments)]
+    frame_ids = numpy.concatenate(frame_ids) if frame_ids else numpy.zeros(0, dtype=numpy.int64)
+    label_ids = numpy.concatenate(label_ids) if label_ids else numpy.zeros(0, dtype=numpy.int32)
+
+    return index, features[frame_ids], label_ids
+
+
+class MLFMFCCFeatureStore(MLFMFCCOnlineAlignedArray):
+
+    """This is an extension of MLFMFCCOnlineAlignedArray which computes the features of all aligned frames once
+    and stores them in memory mapped arrays.
+
+    The features of each wav file are computed at once in a pool of worker processes. They are written as one chunk
+    into store_dir/features.npy and their label ids into store_dir/labels.npy, so that features[i] has the label
+    label_names[labels[i]]. The chunk of each file starts at the corresponding offset. The frames are in the same
+    order as when iterating over MLFMFCCOnlineAlignedArray.
+
+    The store remembers a hash of the feature configuration and the alignments it was computed for. If they change,
+    open computes the features again.
+
+    """
+
+    version = 1
+
+    def __init__(self, store_dir, windowsize=250000, targetrate=100000, filter=None,
+                 usec0=False, usedelta=True, useacc=True,
+                 n_last_frames=0, mel_banks_only = False, n_jobs=None):
+        """Initialise the feature store.
+
+        store_dir - the directory with the stored features
+        n_jobs - the number of worker processes computing the features, all CPUs are used by default
+        """
+        MLFMFCCOnlineAlignedArray.__init__(self, windowsize, targetrate, filter, usec0, usedelta, useacc,
+                                           n_last_frames, mel_banks_only)
+
+        self.store_dir = store_dir
+        self.n_jobs = n_jobs
+
+        self.features = None
+        self.labels = None
+        self.label_names = []
+        self.file_names = []
+        self.offsets = []
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __iter__(self):
+        """Iterates over the stored frames as MLFMFCCOnlineAlignedArray does."""
+        if self.filter:
+            if self.filter in self.label_names:
+                label_id = self.label_names.index(self.filter)
+                for i in numpy.flatnonzero(self.labels == label_id):
+                    yield self.features[i]
+        else:
+            for frame, label_id in zip(self.features, self.labels):
+                yield [frame, self.label_names[label_id]]
+
+    def get_params(self):
+        """Returns the parameters of MLFMFCCOnlineAlignedArray which determine the features."""
+        return {'windowsize': self.windowsize, 'targetrate': self.targetrate, 'usec0': self.usec0,
+                'usedelta': self.usedelta, 'useacc': self.useacc, 'n_last_frames': self.n_last_frames,
+                'mel_banks_only': self.mel_banks_only}
+
+    def get_aligned_files(self):
+        """Returns a list of the file name, the param file name and the segments of all aligned files."""
+        aligned_files = []
+        for mlf in self.mlfs:
+            for f in mlf:
+                param_file_name = self.get_param_file_name(f)
+                if param_file_name == None:
+                    raise Exception("MLFMFCCFeatureStore: param_file_name cannot be None, file_name: " + f)
+                aligned_files.append((f, param_file_name, [(s, e, l) for s, e, l in mlf[f] if s < e]))
+
+        return aligned_files
+
+    def get_hash(self, aligned_files):
+        data = json.dumps([self.version, self.get_params(), aligned_files], sort_keys=True)
+        return hashlib.sha1(data).hexdigest()
+
+    def get_path(self, name):
+        return os.path.join(self.store_dir, name)
+
+    def read_meta(self):
+        try:
+            with open(self.get_path('meta.json'), 'r') as meta_file:
+                return json.load(meta_file)
+        except (IOError, ValueError):
+            return None
+
+    def open(self):
+        """Memory maps the stored features.
+
+        The features are computed first if they are not stored yet or if they were computed for other features or
+        alignments.
+        """
+        aligned_files = self.get_aligned_files()
+        store_hash = self.get_hash(aligned_files)
+
+        meta = self.read_meta()
+        if meta is None or meta['hash'] != store_hash:
+            self.build(aligned_files, store_hash)
+            meta = self.read_meta()
+
+        self.features = numpy.load(self.get_path('features.npy'), mmap_mode='r')
+        self.labels = numpy.load(self.get_path('labels.npy'), mmap_mode='r')
+        self.label_names = meta['label_names']
+        self.file_names = meta['file_names']
+        self.offsets = meta['offsets']
+
+    def build(self, aligned_files, store_hash):
+        """Computes the features of the aligned files and stores them."""
+        if not os.path.isdir(self.store_dir):
+            os.makedirs(self.store_dir)
+        elif os.path.exists(self.get_path('meta.json')):
+            os.remove(self.get_path('meta.json'))
+
+        label_names = sorted(set(l for f, param_file_name, segments in aligned_files for s, e, l in segments))
+        label_ids = dict((l, i) for i, l in enumerate(label_names))
+
+        # the number of the aligned frames of each file is known from the wav header
+        n_features = self.create_front_end(16000).get_size()
+        offsets = [0]
+        tasks = []
+        for f, param_file_name, segments in aligned_files:
+            wav = wave.open(param_file_name, 'r')
+            n_frames = count_online_frames(wav.getnframes(), *self.get_frame_geometry(wav.getframerate()))
+            wav.close()
+
+            offsets.append(offsets[-1] + sum(max(min(e, n_frames) - s, 0) for s, e, l in segments))
+            tasks.append((len(tasks), self.get_params(), param_file_name,
+                          [(s, e, label_ids[l]) for s, e, l in segments]))
+
+        features = numpy.lib.format.open_memmap(self.get_path('features.npy'), mode='w+', dtype=numpy.float32,
+                                                shape=(offsets[-1], n_features))
+        labels = numpy.lib.format.open_memmap(self.get_path('labels.npy'), mode='w+', dtype=numpy.int32,
+                                              shape=(offsets[-1], ))
+
+        if self.n_jobs == 1:
+            pool = None
+            results = imap(compute_aligned_features, tasks)
+        else:
+            pool = multiprocessing.Pool(self.n_jobs)
+            results = pool.imap_unordered(compute_aligned_features, tasks)
+
+        try:
+            for i, file_features, file_labels in results:
+                if len(file_labels) != offsets[i + 1] - offsets[i]:
+                    raise Exception("MLFMFCCFeatureStore: unexpected number of frames in " + tasks[i][2])
+
+                features[offsets[i]:offsets[i + 1]] = file_features
+                labels[offsets[i]:offsets[i + 1]] = file_labels
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        features.flush()
+        labels.flush()
+        del features, labels
+
+        # the meta data are written at last, the store is valid only when they match
+        meta = {'hash': store_hash, 'label_names': label_names,
+                'file_names': [f for f, param_file_name, segments in aligned_files], 'offsets': offsets}
+        with open(self.get_path('meta.json'), 'w') as meta_file:
+            json.dump(meta, meta_file)
+
+
+def split_crossvalid(n_frames, crossvalid_frames, max_frames):
+    """ Selects the cross-validation frames in blocks so that there are about crossvalid_frames / max_frames
+    times as many of them as of the training frames.
+
+    :param n_frames: the number of all frames
+    :param crossvalid_frames: the number of the cross-validation frames out of max_frames
+    :param max_frames: the maximal number of the frames used for training and cross-validation
+    :return: a boolean mask of the cross-validation frames
+    """
+    ratio = float(crossvalid_frames) / max_frames
+    block = max(int(crossvalid_frames*0.05), 1)
+    crossvalid = numpy.zeros(n_frames, dtype=bool)
+    if not ratio:
+        return crossvalid
+
+    i = n_crossvalid = n_train = 0
+    while i < n_frames:
+        if float(n_crossvalid) / (n_train + 1) < ratio:
+            n = min(block, n_frames - i)
+            crossvalid[i:i + n] = True
+            n_crossvalid += n
+        else:
+            # the training frames follow until the share of the cross-validation frames drops below the ratio
+            n = max(int(n_crossvalid / ratio) - n_train - 1, 1)
+            while n > 1 and float(n_crossvalid) / (n_train + n) < ratio:
+                n -= 1
+            while float(n_crossvalid) / (n_train + n + 1) >= ratio:
+                n += 1
+            n = min(n, n_frames - i)
+            n_train += n
+        i += n
+
+    return crossvalid
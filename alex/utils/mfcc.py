@@ -5,6 +5,7 @@ import numpy as np
 
 from scipy.fftpack import dct
 from collections import deque
+from numpy.lib.stride_tricks import as_strided
 
 
 class MFCCKaldi:
@@ -90,6 +91,12 @@ class MFCCFrontEnd:
         self.init_mel_filter_bank()
         self.init_cep_liftering_weights()
 
+    def reset(self):
+        """Forget the previous frames, so that the next frame is not processed as their continuation."""
+        self.prior = 0.0
+        self.mfcc_queue.clear()
+        self.mfcc_delta_queue.clear()
+
     def freq_to_mel(self, freq):
         return 1127 * np.log(1.0 + freq / 700.0)
 
@@ -146,15 +153,165 @@ class MFCCFrontEnd:
         self.cep_lift_weights = cep_lift_weights
 
     def preemphasis(self, frame):
+        frame = np.asarray(frame, dtype=float)
         out_frame = np.zeros_like(frame)
         out_frame[0] = frame[0] - self.preemcoef * self.prior
-        for i in range(1, len(frame)):
-            out_frame[i] = frame[i] - self.preemcoef * frame[i - 1]
+        out_frame[1:] = frame[1:] - self.preemcoef * frame[:-1]
 
         self.prior = frame[-1]
 
         return out_frame
 
+    def preemphasis_block(self, frames):
+        """Apply preemphasis to a matrix of consecutive frames, one frame per row.
+
+        As in preemphasis, the first sample of each frame uses the last sample of the previous frame.
+        """
+        out_frames = np.empty_like(frames)
+        out_frames[:, 1:] = frames[:, 1:] - self.preemcoef * frames[:, :-1]
+        out_frames[0, 0] = frames[0, 0] - self.preemcoef * self.prior
+        out_frames[1:, 0] = frames[1:, 0] - self.preemcoef * frames[:-1, -1]
+
+        self.prior = frames[-1, -1]
+
+        return out_frames
+
+    def get_static_size(self):
+        """Return the number of the static coefficients, those which are stored in the mfcc queue."""
+        if self.mel_banks_only:
+            return self.numchans
+        return self.numceps + (1 if self.usec0 else 0)
+
+    def get_size(self):
+        """Return the number of the coefficients returned for one frame."""
+        static_size = self.get_static_size()
+        size = static_size
+        if not self.mel_banks_only:
+            if self.usedelta:
+                size += static_size
+            if self.useacc:
+                size += static_size
+        return size + self.n_last_frames * static_size
+
+    def _mean_diff_block(self, rows, n_hist, maxlen):
+        """Compute the mean difference of consecutive rows in a sliding window.
+
+        The rows start with n_hist rows from a queue of length maxlen followed by new rows. For each new row, the
+        window contains the last maxlen rows up to this row. The differences are summed in the same order as in param
+        so that the results are identical. Windows with less than two rows give zeros.
+        """
+        n_new = len(rows) - n_hist
+        mean_diff = np.zeros((n_new, rows.shape[1]))
+
+        # windows which are not full yet, this happens only at the start of the stream
+        n_partial = min(max(maxlen - 1 - n_hist, 0), n_new)
+        for j in range(n_partial):
+            window = rows[:n_hist + j + 1]
+            if len(window) >= 2:
+                for i in range(1, len(window)):
+                    mean_diff[j] += window[i] - window[i - 1]
+                mean_diff[j] /= len(window) - 1
+
+        # full windows
+        n_full = n_new - n_partial
+        if n_full > 0:
+            start = n_hist + n_partial - maxlen + 1
+            acc = np.zeros((n_full, rows.shape[1]))
+            for i in range(1, maxlen):
+                acc += rows[start + i:start + i + n_full] - rows[start + i - 1:start + i - 1 + n_full]
+            acc /= maxlen - 1
+            mean_diff[n_partial:] = acc
+
+        return mean_diff
+
+    def param_block(self, samples, frameshift):
+        """Compute the MFCC coefficients for all frames in a block of samples.
+
+        The frames start every frameshift samples and only the complete frames are processed. The result is the same
+        as calling param on each of the frames in sequence, including the state kept between the calls.
+
+        :param samples: an array of int16 samples
+        :param frameshift: the number of samples between the starts of consecutive frames
+        :return: a matrix of coefficients, one row per frame
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if len(samples) < self.framesize:
+            return np.zeros((0, self.get_size()), dtype=np.float32)
+
+        n_frames = (len(samples) - self.framesize) / frameshift + 1
+        frames = as_strided(samples, shape=(n_frames, self.framesize),
+                            strides=(frameshift * samples.strides[0], samples.strides[0]))
+
+        # zero mean
+        if self.zmeansource:
+            frames = frames - np.mean(frames, axis=1)[:, np.newaxis]
+        # preemphasis
+        frames = self.preemphasis_block(frames)
+        # apply hamming window
+        if self.usehamming:
+            frames = self.hamming * frames
+
+        complex_spectrum = np.fft.rfft(frames, axis=1)
+        power_spectrum = complex_spectrum.real * complex_spectrum.real + \
+            complex_spectrum.imag * complex_spectrum.imag
+        # compute only power spectrum if required
+        if not self.usepower:
+            power_spectrum = np.sqrt(power_spectrum)
+
+        mel_spectrum = np.dot(power_spectrum, self.mel_filter_bank)
+        # apply mel floor
+        mel_spectrum = np.log(np.maximum(mel_spectrum, 1.0))
+
+        if self.mel_banks_only:
+            static = mel_spectrum
+        else:
+            cepstrum = dct(mel_spectrum, type=2, norm='ortho', axis=1)
+            # cepstral liftering
+            static = self.cep_lift_weights * cepstrum[:, 1:self.numceps + 1]
+            if self.usec0:
+                static = np.hstack([static, cepstrum[:, :1]])
+
+        n_hist = len(self.mfcc_queue)
+        if n_hist:
+            statics = np.vstack([np.array(self.mfcc_queue), static])
+        else:
+            statics = static
+
+        mfcc = [static, ]
+        if not self.mel_banks_only:
+            if self.usedelta:
+                delta = self._mean_diff_block(statics, n_hist, self.mfcc_queue.maxlen)
+                mfcc.append(delta)
+                # the delta is stored only if there were at least two frames in the mfcc queue
+                delta = delta[1:] if n_hist == 0 else delta
+            else:
+                delta = np.zeros((0, static.shape[1]))
+
+            if self.useacc:
+                n_delta_hist = len(self.mfcc_delta_queue)
+                if n_delta_hist:
+                    deltas = np.vstack([np.array(self.mfcc_delta_queue), delta])
+                else:
+                    deltas = delta
+                acc = self._mean_diff_block(deltas, n_delta_hist, self.mfcc_delta_queue.maxlen)
+                if len(acc) < n_frames:
+                    acc = np.vstack([np.zeros((n_frames - len(acc), static.shape[1])), acc])
+                mfcc.append(acc)
+
+            self.mfcc_delta_queue.extend(delta)
+
+        if self.n_last_frames:
+            # the previous frames are available only as far as the mfcc queue reaches, zeros otherwise
+            padded = np.vstack([np.zeros((max(self.n_last_frames - n_hist, 0), static.shape[1])),
+                                statics[max(n_hist - self.n_last_frames, 0):]])
+            offset = len(padded) - n_frames
+            for i in range(self.n_last_frames):
+                mfcc.append(padded[offset - 1 - i:offset - 1 - i + n_frames])
+
+        self.mfcc_queue.extend(static)
+
+        return np.hstack(mfcc).astype(np.float32)
+
     def param(self, frame):
         """Compute the MFCC coefficients in a way similar to the HTK."""
         # zero mean
@@ -177,10 +334,7 @@ class MFCCFrontEnd:
 #    print "SPS",power_spectrum.shape
         mel_spectrum = np.dot(power_spectrum, self.mel_filter_bank)
         # apply mel floor
-        for i in range(len(mel_spectrum)):
-            if mel_spectrum[i] < 1.0:
-                mel_spectrum[i] = 1.0
-        mel_spectrum = np.log(mel_spectrum)
+        mel_spectrum = np.log(np.maximum(mel_spectrum, 1.0))
         
         if self.mel_banks_only:
             mfcc = mel_spectrum
@@ -143,6 +143,30 @@ class InstanceID(object):
         return InstanceID.instance_id.value
 
 
+class ProcessInstanceID(object):
+    """
+    This class provides ids unique within a process to all instances of
+    objects inheriting from this class.
+
+    Unlike InstanceID, it does not take the global lock. It is meant for
+    objects created at a high rate, e.g. audio frames.
+
+    """
+
+    pid = None
+    instance_id = 0
+
+    def get_instance_id(self):
+        pid = os.getpid()
+        if ProcessInstanceID.pid != pid:
+            # the counter of a forked process starts from zero
+            ProcessInstanceID.pid = pid
+            ProcessInstanceID.instance_id = 0
+
+        ProcessInstanceID.instance_id += 1
+        return ProcessInstanceID.instance_id
+
+
 class SystemLogger(object):
     """
     This is a multiprocessing-safe logger.  It should be used by all components in Alex.
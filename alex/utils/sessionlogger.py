@@ -3,6 +3,7 @@
 # This code is mostly PEP8-compliant. See
 # http://www.python.org/dev/peps/pep-0008.
 
+import functools
 import multiprocessing
 import time
 import os
@@ -11,6 +12,7 @@ import re
 import xml.dom.minidom
 import socket
 import wave
+import cPickle as pickle
 
 from datetime import datetime
 from collections import deque
@@ -21,6 +23,33 @@ from alex.utils.exceptions import SessionLoggerException, SessionClosedException
 from alex.utils.procname import set_proc_name
 
 
+SESSION_XML_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<dialogue>
+</dialogue>
+"""
+
+
+def journal(user_function):
+    """This decorator appends each call of the decorated logging method to the session journal.
+
+    The session XML document is written only at the end of the session, the journal allows to rebuild it after
+    a crash. The time of the call is stored too, so that the rebuilt document contains the original times.
+    """
+    @functools.wraps(user_function)
+    def wrapper(self, *args, **kw):
+        if self._replaying:
+            return user_function(self, *args, **kw)
+
+        self._event_time = time.time()
+        try:
+            self._write_journal(user_function.__name__[1:], args, kw, self._event_time)
+            return user_function(self, *args, **kw)
+        finally:
+            self._event_time = None
+
+    return wrapper
+
+
 class SessionLogger(multiprocessing.Process):
     """
     This is a multiprocessing-safe logger. It should be used by Alex to log
@@ -30,6 +59,10 @@ class SessionLogger(multiprocessing.Process):
 
     Times should be in seconds from the beginning of the dialogue.
 
+    Each logging call is appended to the session.journal file with a constant cost. The session.xml file is
+    written at the end of the session or on demand by calling write_session_xml(). If the process crashes,
+    the session.xml can be rebuilt from the journal by recover_session_xml().
+
     """
 
     def __init__(self):
@@ -40,11 +73,35 @@ class SessionLogger(multiprocessing.Process):
         self._is_open = False   # whether the session is started
         self._doc = None
 
+        self._journal_file = None
+        # the time of the currently logged call, it is read from the journal when the journal is replayed
+        self._event_time = None
+        self._replaying = False
+
         # filename of the started recording
         self._rec_started = {}
 
+        # the number of bytes of the recordings sent by this (producer) process, see rec_write()
+        self._rec_sent = {}
+        # the number of bytes written into the recordings, the recordings which are ended but are waiting
+        # for their audio data, and the audio data received but not written yet
+        self._rec_written = {}
+        self._rec_ending = {}
+        self._rec_buffers = {}
+
         self.queue = multiprocessing.Queue()
         self._queue = deque()
+        # the audio data are sent through a separate queue without the overhead of the logging calls
+        self.audio_queue = multiprocessing.Queue()
+
+        self.last_session_start_time = 0
+        self.last_session_end_time = 0
+
+        self.n_calls = 0
+        self.max_queue_depth = 0
+        self.max_lag = 0.0
+        self.n_audio_chunks = 0
+        self.n_audio_writes = 0
 
     def set_close_event(self, close_event):
         self.close_event = close_event
@@ -54,6 +111,7 @@ class SessionLogger(multiprocessing.Process):
 
     def cancel_join_thread(self):
         self.queue.cancel_join_thread()
+        self.audio_queue.cancel_join_thread()
 
     def __repr__(self):
         return "SessionLogger()"
@@ -69,22 +127,61 @@ class SessionLogger(multiprocessing.Process):
 
         return queue
 
+    def rec_write(self, fname, data_rec):
+        """Queue the audio data for the started recording.
+
+        The data is sent through the audio queue as a plain string. The number of bytes sent is counted so that
+        rec_end() can tell the logger process how much data it has to wait for before closing the file.
+        """
+        data_rec = str(getattr(data_rec, 'payload', data_rec))
+        self._rec_sent[fname] = self._rec_sent.get(fname, 0) + len(data_rec)
+        self.audio_queue.put((fname, data_rec))
+
+    def rec_end(self, fname):
+        """Queue the end of the recording together with the number of bytes sent by rec_write()."""
+        self.queue.put(('rec_end', (fname, ), {'n_bytes': self._rec_sent.pop(fname, 0)}, time.time()))
+
+    def get_queue_stats(self):
+        """Return the statistics of the queued logging calls.
+
+        The lag is the time since the oldest pending call was queued.
+        """
+        return {
+            'n_calls': self.n_calls,
+            'queue_depth': len(self._queue),
+            'max_queue_depth': self.max_queue_depth,
+            'lag': time.time() - self._queue[0][3] if self._queue else 0.0,
+            'max_lag': self.max_lag,
+            'audio_buffered': sum(len(data) for chunks in self._rec_buffers.values() for data in chunks),
+            'n_audio_chunks': self.n_audio_chunks,
+            'n_audio_writes': self.n_audio_writes,
+        }
+
+    def _get_event_time(self):
+        """ Return the time of the currently logged call.
+        """
+        if self._event_time is None:
+            return time.time()
+
+        return self._event_time
+
     def _get_date_str(self):
         """ Return current time in ISO format.
 
         It is useful when constructing file and directory names.
         """
-        dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S") + " " + time.tzname[time.localtime().tm_isdst]
+        t = self._get_event_time()
+        dt = datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S") + " " + \
+            time.tzname[time.localtime(t).tm_isdst]
 
         return dt
 
-
     def _get_time_str(self):
         """ Return current time in ISO format.
 
         It is useful when constructing file and directory names.
         """
-        dt = time.time() - self._session_start_time
+        dt = self._get_event_time() - self._session_start_time
 
         return "%.3f" % dt
 
@@ -93,13 +190,15 @@ class SessionLogger(multiprocessing.Process):
         """ Records the target directory and creates the template call log.
         """
 
+        if self._is_open:
+            # the previous session was not ended, save what was logged
+            self._write_session_xml()
+            self._close_journal()
+
         self._session_dir_name = output_dir
 
         f = open(os.path.join(self._session_dir_name, 'session.xml'), "w", 0)
-        f.write("""<?xml version="1.0" encoding="UTF-8"?>
-<dialogue>
-</dialogue>
-""")
+        f.write(SESSION_XML_TEMPLATE)
         f.write('\n')
         f.close()
 
@@ -107,12 +206,24 @@ class SessionLogger(multiprocessing.Process):
         self._read_session_xml()
         self._is_open = True
 
+        self._journal_file = open(os.path.join(self._session_dir_name, 'session.journal'), "wb")
+        self._write_journal('session_start', (output_dir, ), {}, self._session_start_time)
+
     def _flush(self):
         # close all opened rec_started files
 
+        self._recv_audio()
+        self._write_audio()
+
         for f in self._rec_started:
             if self._rec_started[f]:
-                self._rec_end(f)
+                if f in self._rec_ending:
+                    print "SessionLogger: closing incomplete recording", f
+                    self._close_rec(f)
+                else:
+                    self._rec_end(f)
+
+        self._rec_buffers = {}
 
     @etime('seslog_session_end')
     def _session_end(self):
@@ -127,6 +238,7 @@ class SessionLogger(multiprocessing.Process):
 
         self._flush()
         self._write_session_xml()
+        self._close_journal()
         self._session_dir_name = ''
         self._doc = None
         self._is_open = False
@@ -141,6 +253,52 @@ class SessionLogger(multiprocessing.Process):
 
         return s + '\n'
 
+    def _write_journal(self, cmd, args, kw, cmd_time):
+        """Appends the logging call to the session journal."""
+        if self._journal_file:
+            pickle.dump((cmd, args, kw, cmd_time), self._journal_file, pickle.HIGHEST_PROTOCOL)
+            self._journal_file.flush()
+
+    def _close_journal(self):
+        if self._journal_file:
+            self._journal_file.close()
+            self._journal_file = None
+
+    def _replay_journal(self, session_dir_name):
+        """Rebuilds the session XML document by replaying the calls stored in the session journal.
+
+        The recordings and external files are not touched. A call which was not completely written, e.g. because
+        of a crash, ends the replay.
+        """
+        self._session_dir_name = session_dir_name
+        self._replaying = True
+
+        try:
+            with open(os.path.join(session_dir_name, 'session.journal'), "rb") as f:
+                while True:
+                    try:
+                        cmd, args, kw, cmd_time = pickle.load(f)
+                    except EOFError:
+                        break
+                    except Exception:
+                        print "SessionLogger: incomplete call in the journal of", session_dir_name
+                        break
+
+                    if cmd == 'session_start':
+                        self._session_start_time = cmd_time
+                        self._doc = xml.dom.minidom.parseString(SESSION_XML_TEMPLATE)
+                        continue
+
+                    self._event_time = cmd_time
+                    try:
+                        SessionLogger.__dict__['_' + cmd](self, *args, **kw)
+                    except SessionLoggerException as e:
+                        print "Exception when replaying:", cmd
+                        print e
+        finally:
+            self._event_time = None
+            self._replaying = False
+
     def _read_session_xml(self):
         """Opens the session xml file.
         """
@@ -151,11 +309,14 @@ class SessionLogger(multiprocessing.Process):
 
     def _write_session_xml(self):
         """Saves the self._doc self._document into the session xml file.
+
+        It is called at the end of the session, it can be also requested by calling write_session_xml().
         """
-        with open(os.path.join(self._session_dir_name, 'session.xml'), "r+", 0) as f:
+        if self._doc is None:
+            return
+
+        with open(os.path.join(self._session_dir_name, 'session.xml'), "w", 0) as f:
             # fcntl.lockf(self._f, fcntl.LOCK_EX)
-            f.seek(0)
-            f.truncate(0)
 
             x = self._doc.toprettyxml(encoding='utf-8')
 
@@ -171,6 +332,7 @@ class SessionLogger(multiprocessing.Process):
 
     @etime('seslog_config')
     @catch_ioerror
+    @journal
     def _config(self, cfg):
         """ Adds the config tag to the session log.
         """
@@ -183,10 +345,9 @@ class SessionLogger(multiprocessing.Process):
                 config = els[0].appendChild(self._doc.createElement("config"))
             config.appendChild(self._doc.createComment(self._cfg_formatter(cfg)))
 
-        self._write_session_xml()
-
     @etime('seslog_header')
     @catch_ioerror
+    @journal
     def _header(self, system_txt, version_txt):
         """ Adds host, date, system, and version info into the header element.
         The host and date will be derived automatically.
@@ -205,10 +366,9 @@ class SessionLogger(multiprocessing.Process):
             version = header.appendChild(self._doc.createElement("version"))
             version.appendChild(self._doc.createTextNode(version_txt))
 
-        self._write_session_xml()
-
     @etime('seslog_input_source')
     @catch_ioerror
+    @journal
     def _input_source(self, input_source):
         """Adds the input_source optional tag to the header."""
         els = self._doc.getElementsByTagName("header")
@@ -217,10 +377,9 @@ class SessionLogger(multiprocessing.Process):
             i_s = els[0].appendChild(self._doc.createElement("input_source"))
             i_s.setAttribute("type", input_source)
 
-        self._write_session_xml()
-
     @etime('seslog_dialogue_rec_start')
     # @catch_ioerror - do not add! VIO catches the IOError
+    @journal
     def _dialogue_rec_start(self, speaker, fname):
         """ Adds the optional recorded input/output element to the last
         "speaker" turn.
@@ -238,13 +397,11 @@ class SessionLogger(multiprocessing.Process):
             da.setAttribute("fname", fname)
             da.setAttribute("starttime", self._get_time_str())
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing dialogue element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_dialogue_rec_end')
     # @catch_ioerror - do not add! VIO catches the IOError
+    @journal
     def _dialogue_rec_end(self, fname):
         """ Stores the end time in the dialogue_rec element with fname file.
         """
@@ -255,11 +412,8 @@ class SessionLogger(multiprocessing.Process):
                 els[i].setAttribute("endtime", self._get_time_str())
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException("Missing dialogue_rec element for %s fname" % fname)
 
-        self._write_session_xml()
-
     @etime('seslog_evaluation')
     @catch_ioerror
     def _evaluation(self, num_turns, task_success, user_sat, score):
@@ -281,6 +435,7 @@ class SessionLogger(multiprocessing.Process):
 
     @etime('seslog_turn')
     @catch_ioerror
+    @journal
     def _turn(self, speaker):
         """ Adds a new turn at the end of the dialogue element.
 
@@ -295,10 +450,9 @@ class SessionLogger(multiprocessing.Process):
             turn.setAttribute("turn_number", unicode(turn_number))
             turn.setAttribute("time", self._get_time_str())
 
-        self._write_session_xml()
-
     @etime('seslog_dialogue_act')
     @catch_ioerror
+    @journal
     def _dialogue_act(self, speaker, dialogue_act):
         """ Adds the dialogue_act element to the last "speaker" turn.
         """
@@ -311,13 +465,11 @@ class SessionLogger(multiprocessing.Process):
                 da.appendChild(self._doc.createTextNode(unicode(dialogue_act)))
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_text')
     @catch_ioerror
+    @journal
     def _text(self, speaker, text, cost=None):
         """ Adds the text (prompt) element to the last "speaker" turn.
         """
@@ -332,13 +484,11 @@ class SessionLogger(multiprocessing.Process):
                 da.appendChild(self._doc.createTextNode(unicode(text)))
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException("Missing turn element for {spkr} speaker".format(spkr=speaker))
 
-        self._write_session_xml()
-
     @etime('seslog_rec_start')
     @catch_ioerror
+    @journal
     def _rec_start(self, speaker, fname):
         """Adds the optional recorded input/output element to the last
         "speaker" turn.
@@ -353,30 +503,54 @@ class SessionLogger(multiprocessing.Process):
                 da.setAttribute("starttime", self._get_time_str())
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for the {spkr} speaker".format(spkr=speaker)))
 
-        self._write_session_xml()
+        if self._replaying:
+            return
 
         self._rec_started[fname] = wave.open(os.path.join(self._session_dir_name, fname), 'w')
         self._rec_started[fname].setnchannels(1)
         self._rec_started[fname].setsampwidth(2)
         self._rec_started[fname].setframerate(self.cfg['Audio']['sample_rate'])
 
-    @etime('seslog_rec_write')
-    @catch_ioerror
     def _rec_write(self, fname, data_rec):
-        """Write into open file recording.
+        """Buffer the data for the recording. The buffered data are written by _write_audio().
         """
-        try:
-            self._rec_started[fname].writeframes(bytearray(data_rec))
-        except KeyError:
-            raise SessionLoggerException("rec_write: missing rec element %s" % fname)
+        self._rec_buffers.setdefault(fname, []).append(str(data_rec))
+
+    @etime('seslog_write_audio')
+    @catch_ioerror
+    def _write_audio(self, fname=None):
+        """Write the buffered data into the open recordings, all data of one recording are written at once.
+
+        The data of the recordings which are not started yet are kept in the buffer. The recordings which were
+        ended by rec_end() are closed when all their data are written.
+        """
+        for f in ([fname, ] if fname is not None else self._rec_buffers.keys()):
+            if not self._rec_started.get(f) or f not in self._rec_buffers:
+                continue
+
+            data = ''.join(self._rec_buffers.pop(f))
+            self._rec_started[f].writeframes(data)
+            self._rec_written[f] = self._rec_written.get(f, 0) + len(data)
+            self.n_audio_writes += 1
+
+            if f in self._rec_ending and self._rec_written[f] >= self._rec_ending[f]:
+                self._close_rec(f)
+
+    def _close_rec(self, fname):
+        self._rec_started[fname].close()
+        self._rec_started[fname] = None
+        self._rec_ending.pop(fname, None)
+        self._rec_written.pop(fname, None)
 
     @etime('seslog_rec_end')
     @catch_ioerror
-    def _rec_end(self, fname):
+    @journal
+    def _rec_end(self, fname, n_bytes=None):
         """ Stores the end time in the rec element with fname file.
+
+        If n_bytes is given, the file is closed only after n_bytes of data are written into it.
         """
         try:
             els = self._doc.getElementsByTagName("rec")
@@ -388,9 +562,18 @@ class SessionLogger(multiprocessing.Process):
             else:
                 raise SessionLoggerException(("Missing rec element for the {fname} fname.".format(fname=fname)))
 
-            self._write_session_xml()
-            self._rec_started[fname].close()
-            self._rec_started[fname] = None
+            if self._replaying:
+                return
+
+            if not self._rec_started[fname]:
+                raise KeyError(fname)
+
+            self._write_audio(fname)
+            if n_bytes is not None and self._rec_written.get(fname, 0) < n_bytes:
+                # the rest of the data is still in the audio queue
+                self._rec_ending[fname] = n_bytes
+            else:
+                self._close_rec(fname)
         except KeyError:
             raise SessionLoggerException("rec_end: missing rec element %s" % fname)
 
@@ -408,6 +591,7 @@ class SessionLogger(multiprocessing.Process):
 
     @etime('seslog_asr')
     @catch_ioerror
+    @journal
     def _asr(self, speaker, fname, nblist, confnet=None):
         """ Adds the ASR nblist to the last speaker turn.
 
@@ -438,13 +622,11 @@ class SessionLogger(multiprocessing.Process):
 
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_slu')
     @catch_ioerror
+    @journal
     def _slu(self, speaker, fname, nblist, confnet=None):
         """ Adds the slu nbest list to the last speaker turn.
 
@@ -479,13 +661,11 @@ class SessionLogger(multiprocessing.Process):
 
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_barge_in')
     @catch_ioerror
+    @journal
     def _barge_in(self, speaker, tts_time=False, asr_time=False):
         """Add the optional barge-in element to the last speaker turn."""
         els = self._doc.getElementsByTagName("turn")
@@ -502,10 +682,9 @@ class SessionLogger(multiprocessing.Process):
         else:
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     @etime('seslog_hangup')
     @catch_ioerror
+    @journal
     def _hangup(self, speaker):
         """ Adds the user hangup element to the last user turn.
         """
@@ -516,11 +695,8 @@ class SessionLogger(multiprocessing.Process):
                 els[i].appendChild(self._doc.createElement("hangup"))
                 break
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
-        self._write_session_xml()
-
     ########################################################################
     ## The following functions define functionality above what was set in ##
     ## SDC 2010 XML logging format.                                       ##
@@ -538,11 +714,11 @@ class SessionLogger(multiprocessing.Process):
             if els[i].getAttribute("speaker") == speaker:
                 return els[i]
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
     @etime('seslog_dialogue_state')
     @catch_ioerror
+    @journal
     def _dialogue_state(self, speaker, dstate):
         """ Adds the dialogue state to the log.
 
@@ -565,10 +741,9 @@ class SessionLogger(multiprocessing.Process):
                 sl.setAttribute("name", "%s" % slot_name)
                 sl.appendChild(self._doc.createTextNode(unicode(slot_value)))
 
-        self._write_session_xml()
-
     @etime('seslog_external_data_file')
     @catch_ioerror
+    @journal
     def _external_data_file(self, ftype, fname, data=None):
         """Writes data to an external file and adds a link to the log.
 
@@ -582,88 +757,116 @@ class SessionLogger(multiprocessing.Process):
         el = turn.appendChild(self._doc.createElement("external"))
         el.setAttribute("type", ftype)
         el.setAttribute("fname", os.path.basename(fname))
-        self._write_session_xml()
         # write the file data
-        if data is not None:
+        if data is not None and not self._replaying:
             with open(fname, 'w') as fh:
                 fh.write(data)
 
+    def _recv_audio(self):
+        """Receive all audio data waiting in the audio queue."""
+        while not self.audio_queue.empty():
+            fname, data_rec = self.audio_queue.get()
+            self._rec_write(fname, data_rec)
+            self.n_audio_chunks += 1
+
+    def _recv_queue(self):
+        """Receive all logging calls and audio data waiting in the queues."""
+        while not self.queue.empty():
+            self._queue.append(self.queue.get())
+            self.n_calls += 1
+
+        self._recv_audio()
+
+        if self._queue:
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+
+            lag = time.time() - self._queue[0][3]
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.cfg['Hub']['latency_report_threshold']:
+                print "QUEUE latency: SessionLogger t = {t:0.4f} calls = {n}\n".format(t=lag, n=len(self._queue))
+
+    def _process_queue(self):
+        """Execute all received logging calls and write the received audio data."""
+        while self._queue:
+            cmd, args, kw, cmd_time = self._queue.popleft()
+
+            attr = '_'+cmd
+            try:
+                if cmd == 'session_start':
+                    self.last_session_start_time = time.time()
+                elif cmd == 'session_end':
+                    self.last_session_start_time = time.time()
+
+
+                if not self._is_open and cmd != 'session_start':
+                    session_start_found = False
+                    while time.time() - cmd_time < 3.0 and not session_start_found:
+                        # these are probably commands for the new un-opened session
+                        for i, (_cmd, _args, _kw, _cmd_time) in enumerate(self._queue):
+                            if _cmd == 'session_start':
+                                print "SessionLogger: finally found session start"
+                                self._session_start(*_args,**_kw)
+                                del self._queue[i]
+                                session_start_found = True
+                                break
+                        else:
+                            time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+
+                    if not session_start_found and (self.last_session_end_time - cmd_time < 2.0):
+                        # just silently ignore because these are likely the be commands for the already
+                        # closed session
+
+                        # print "SessionLogger: should be silent"
+                        # print "SessionLogger: calling method", cmd, "when the session is not open"
+                        # print '             ', [a for a in args if isinstance(a, basestring) and len(a) < 80]
+                        continue
+
+
+                    if not session_start_found:
+                        print "SessionLogger: no session start found"
+                        print "SessionLogger: calling method", cmd, "when the session is not open"
+                        print '             ', [a for a in args if isinstance(a, basestring) and len(a) < 80]
+                        continue
+
+                cf = SessionLogger.__dict__[attr]
+                cf(self, *args, **kw)
+            except AttributeError:
+                print "SessionLogger: unknown method", cmd
+                self.close_event.set()
+                raise
+            except SessionLoggerException as e:
+                print "Exception when logging:", cmd, args, kw
+                print e
+            except SessionClosedException as e:
+                print "Exception when logging:", cmd, args, kw
+                print e
+
+        try:
+            self._write_audio()
+        except SessionLoggerException as e:
+            print "Exception when logging: rec_write"
+            print e
+
     def run(self):
         try:
             set_proc_name("Alex_SessionLogger")
-            last_session_start_time = 0
-            last_session_end_time = 0
 
             while 1:
                 # Check the close event.
                 if self.close_event.is_set():
                     print 'Received close event in: %s' % multiprocessing.current_process().name
+                    if self._is_open:
+                        self._write_session_xml()
+                        self._close_journal()
                     return
 
                 time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
 
                 s = (time.time(), time.clock())
 
-                while not self.queue.empty():
-                    self._queue.append(self.queue.get())
-
-                if len(self._queue):
-                    cmd, args, kw, cmd_time = self._queue.popleft()
-
-                    attr = '_'+cmd
-                    try:
-                        if cmd == 'session_start':
-                            last_session_start_time = time.time()
-                        elif cmd == 'session_end':
-                            last_session_start_time = time.time()
-
-
-                        if not self._is_open and cmd != 'session_start':
-                            session_start_found = False
-                            while time.time() - cmd_time < 3.0 and not session_start_found:
-                                # these are probably commands for the new un-opened session
-                                for i, (_cmd, _args, _kw, _cmd_time) in enumerate(self._queue):
-                                    if _cmd == 'session_start':
-                                        print "SessionLogger: finally found session start"
-                                        self._session_start(*_args,**_kw)
-                                        del self._queue[i]
-                                        session_start_found = True
-                                        break
-                                else:
-                                    time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
-
-                            if not session_start_found and (last_session_end_time - cmd_time < 2.0):
-                                # just silently ignore because these are likely the be commands for the already
-                                # closed session
-
-                                # print "SessionLogger: should be silent"
-                                # print "SessionLogger: calling method", cmd, "when the session is not open"
-                                # print '             ', [a for a in args if isinstance(a, basestring) and len(a) < 80]
-                                continue
-
-
-                            if not session_start_found:
-                                print "SessionLogger: no session start found"
-                                print "SessionLogger: calling method", cmd, "when the session is not open"
-                                print '             ', [a for a in args if isinstance(a, basestring) and len(a) < 80]
-                                continue
-
-                        cf = SessionLogger.__dict__[attr]
-                        cf(self, *args, **kw)
-                    except AttributeError:
-                        print "SessionLogger: unknown method", cmd
-                        self.close_event.set()
-                        raise
-                    except SessionLoggerException as e:
-                        if cmd == 'rec_write':
-                            print "Exception when logging:", cmd
-                            print e
-                        else:
-                            print "Exception when logging:", cmd, args, kw
-                            print e
-                    except SessionClosedException:
-                        print "Exception when logging:", cmd, args, kw
-                        print e
+                # process all calls queued since the last wakeup
+                self._recv_queue()
+                self._process_queue()
 
                 d = (time.time() - s[0], time.clock() - s[1])
                 if d[0] > 0.200:
@@ -678,5 +881,18 @@ class SessionLogger(multiprocessing.Process):
             self.close_event.set()
             raise
 
+        finally:
+            print "QUEUE stats: SessionLogger", self.get_queue_stats()
+
         print 'Exiting: %s. Setting close event' % multiprocessing.current_process().name
         self.close_event.set()
+
+
+def recover_session_xml(session_dir_name):
+    """Rebuilds the session.xml file in the session directory from its journal.
+
+    It is useful when the SessionLogger process did not end the session, e.g. because it crashed.
+    """
+    session_logger = SessionLogger()
+    session_logger._replay_journal(session_dir_name)
+    session_logger._write_session_xml()
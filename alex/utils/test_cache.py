@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from alex.utils.cache import PersistentCacheStore, lfu_cache, lru_cache, persistent_cache
+
+
+class TestPersistentCacheStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.tmp_dir, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_set(self):
+        store = PersistentCacheStore(self.file_name)
+
+        self.assertRaises(KeyError, store.get, 'wav')
+
+        store.set('wav', 'RIFF\x00\x01\xff')
+        store.set('list', [1, 2, u'tři'])
+        store.set('unicode', u'tři')
+
+        self.assertEqual(store.get('wav'), 'RIFF\x00\x01\xff')
+        self.assertEqual(store.get('list'), [1, 2, u'tři'])
+        self.assertEqual(store.get('unicode'), u'tři')
+        self.assertIsInstance(store.get('unicode'), unicode)
+
+        store.set('wav', 'RIFF')
+        self.assertEqual(store.get('wav'), 'RIFF')
+
+    def test_lru_eviction(self):
+        store = PersistentCacheStore(self.file_name, max_size=30)
+
+        store.set('a', 'a' * 10)
+        store.set('b', 'b' * 10)
+        store.set('c', 'c' * 10)
+        # make 'a' the most recently used entry
+        store.get('a')
+        store.set('d', 'd' * 10)
+
+        self.assertRaises(KeyError, store.get, 'b')
+        self.assertEqual(store.get('a'), 'a' * 10)
+        self.assertEqual(store.get('c'), 'c' * 10)
+        self.assertEqual(store.get('d'), 'd' * 10)
+
+        stats = store.stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['entries'], 3)
+        self.assertEqual(stats['size'], 30)
+
+        # an entry bigger than the whole store is kept alone
+        store.set('e', 'e' * 40)
+        self.assertEqual(store.get('e'), 'e' * 40)
+        self.assertEqual(store.stats()['entries'], 1)
+
+    def test_shared_stats(self):
+        store1 = PersistentCacheStore(self.file_name)
+        store2 = PersistentCacheStore(self.file_name)
+
+        store1.set('a', 'a')
+        store1.get('a')
+        store2.get('a')
+        self.assertRaises(KeyError, store2.get, 'b')
+
+        # the reads of the other store are shared once they are flushed
+        self.assertEqual(store1.stats()['hits'], 1)
+        store2.flush()
+        stats = store1.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+
+        store2.clear()
+        self.assertEqual(store1.stats(), {'hits': 0, 'misses': 0, 'evictions': 0, 'size': 0, 'entries': 0})
+
+    def test_get_does_not_write(self):
+        store = PersistentCacheStore(self.file_name, timeout=0.1, flush_interval=3600.0)
+        store.set('a', 'a')
+        atime = store._connection().execute("SELECT atime FROM entries WHERE key = 'a'").fetchone()[0]
+
+        # the other process holds the write lock, the reads do not wait for it
+        other = PersistentCacheStore(self.file_name, timeout=0.1)
+        conn = other._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for i in range(10):
+                self.assertEqual(store.get('a'), 'a')
+        finally:
+            conn.execute('ROLLBACK')
+
+        stats = store.stats()
+        self.assertEqual(stats['hits'], 10)
+        self.assertGreater(store._connection().execute("SELECT atime FROM entries WHERE key = 'a'").fetchone()[0],
+                           atime)
+
+    def test_close(self):
+        store = PersistentCacheStore(self.file_name, flush_interval=3600.0)
+        store.set('a', 'a')
+        store.get('a')
+        self.assertRaises(KeyError, store.get, 'b')
+        store.close()
+
+        # the reads since the last flush are written on close
+        stats = PersistentCacheStore(self.file_name).stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_configure(self):
+        store = PersistentCacheStore(self.file_name, flush_interval=3600.0)
+        store.set('a', 'a')
+        store.get('a')
+
+        other_file_name = os.path.join(self.tmp_dir, 'other.sqlite')
+        store.configure(other_file_name, max_size=1)
+        self.assertRaises(KeyError, store.get, 'a')
+        store.set('b', 'bb')
+        store.set('c', 'cc')
+        self.assertEqual(store.stats()['entries'], 1)
+
+        # the reads of the previous file were written into it
+        self.assertEqual(PersistentCacheStore(self.file_name).stats()['hits'], 1)
+
+    def test_threads(self):
+        store = PersistentCacheStore(self.file_name)
+        store.set('a', 'a')
+
+        results = []
+        thread = threading.Thread(target=lambda: results.append(store.get('a')))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(results, ['a'])
+
+    def test_decorator(self):
+        store = PersistentCacheStore(self.file_name)
+        calls = []
+
+        @persistent_cache(False, 'f', store=store)
+        def f(x, y):
+            calls.append((x, y))
+            return str(3 * x + y)
+
+        self.assertEqual(f(1, 2), '5')
+        self.assertEqual(f(1, 2), '5')
+        self.assertEqual(f(2, 1), '7')
+
+        self.assertEqual(calls, [(1, 2), (2, 1)])
+        self.assertEqual((f.hits, f.misses), (1, 2))
+        self.assertEqual(store.stats()['entries'], 2)
+
+
+class TestInMemoryCaches(unittest.TestCase):
+    def check_threads(self, decorator):
+        @decorator(maxsize=10)
+        def square(x):
+            return x * x
+
+        errors = []
+
+        def work(offset):
+            for i in xrange(2000):
+                x = (i + offset) % 20
+                if square(x) != x * x:
+                    errors.append(x)
+
+        threads = [threading.Thread(target=work, args=(offset,)) for offset in xrange(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(square.hits + square.misses, 8 * 2000)
+
+        square.clear()
+        self.assertEqual((square.hits, square.misses), (0, 0))
+
+    def test_lru_cache_threads(self):
+        self.check_threads(lru_cache)
+
+    def test_lfu_cache_threads(self):
+        self.check_threads(lfu_cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
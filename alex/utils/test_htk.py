@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import os
+import shutil
+import tempfile
+import unittest
+import wave
+
+import numpy as np
+
+from alex.utils.htk import MLF, MLFMFCCOnlineAlignedArray, MLFMFCCFeatureStore, split_crossvalid
+
+
+class TestMLFMFCCFeatureStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        np.random.seed(0)
+
+        mlf_lines = ['#!MLF!#']
+        for name, n_samples in [('rec_one', 32000), ('rec_two', 20000)]:
+            wav = wave.open(os.path.join(self.tmp_dir, name + '.wav'), 'w')
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(16000)
+            wav.writeframes((np.random.randn(n_samples) * 3000).astype(np.int16).tostring())
+            wav.close()
+
+            mlf_lines.extend(['"*/%s.lab"' % name,
+                              '0 5000000 sil',
+                              '5000000 10000000 speech',
+                              '10000000 %d sil' % (n_samples * 625),
+                              '.'])
+
+        self.mlf_file_name = os.path.join(self.tmp_dir, 'aligned.mlf')
+        with open(self.mlf_file_name, 'w') as f:
+            f.write('\n'.join(mlf_lines) + '\n')
+
+        # the frames 30 to 50 of each file are not aligned
+        self.gapped_mlf_file_name = os.path.join(self.tmp_dir, 'gapped.mlf')
+        with open(self.gapped_mlf_file_name, 'w') as f:
+            f.write('\n'.join(mlf_lines).replace('0 5000000 sil', '0 3000000 sil') + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def append_data(self, vta, mlf_file_name=None):
+        mlf = MLF(mlf_file_name or self.mlf_file_name)
+        mlf.times_to_frames()
+        vta.append_mlf(mlf)
+        vta.append_trn(os.path.join(self.tmp_dir, '*.wav'))
+
+    def create_store(self, mlf_file_name=None, **kwargs):
+        store = MLFMFCCFeatureStore(os.path.join(self.tmp_dir, 'store'), **kwargs)
+        self.append_data(store, mlf_file_name)
+        return store
+
+    def test_same_as_online(self):
+        vta = MLFMFCCOnlineAlignedArray(usec0=False, n_last_frames=2)
+        self.append_data(vta)
+        online_frames = list(vta)
+
+        for n_jobs in [1, 2]:
+            store = self.create_store(usec0=False, n_last_frames=2, n_jobs=n_jobs)
+            store.build(store.get_aligned_files(), 'rebuild')
+            store.open()
+
+            self.assertEqual(len(store), len(online_frames))
+            self.assertEqual(store.label_names, ['sil', 'speech'])
+            self.assertEqual(store.offsets, [0, 190, 305])
+            self.assertIsInstance(store.features, np.memmap)
+            for (frame, label), (online_frame, online_label) in zip(store, online_frames):
+                self.assertEqual(label, online_label)
+                self.assertTrue(np.allclose(frame, online_frame, rtol=1e-5, atol=1e-4))
+
+        store.filter = 'speech'
+        self.assertEqual(len(list(store)), 100)
+
+    def test_gapped_segments(self):
+        vta = MLFMFCCOnlineAlignedArray(usec0=False, n_last_frames=2)
+        self.append_data(vta)
+        online_frames = list(vta)
+
+        store = self.create_store(self.gapped_mlf_file_name, usec0=False, n_last_frames=2, n_jobs=1)
+        store.open()
+        self.assertEqual(store.offsets, [0, 170, 265])
+
+        # the features of the continuous audio, the frames in the gaps are skipped
+        expected = online_frames[0:30] + online_frames[50:190] + online_frames[190:220] + online_frames[240:305]
+        self.assertEqual(len(store), len(expected))
+        for (frame, label), (online_frame, online_label) in zip(store, expected):
+            self.assertEqual(label, online_label)
+            self.assertTrue(np.allclose(frame, online_frame, rtol=1e-5, atol=1e-4))
+
+        # the online array continues the deltas and the context from the last frame before the gap
+        vta = MLFMFCCOnlineAlignedArray(usec0=False, n_last_frames=2)
+        self.append_data(vta, self.gapped_mlf_file_name)
+        gapped_frames = list(vta)
+        self.assertTrue(np.allclose(store.features[29], gapped_frames[29][0], rtol=1e-5, atol=1e-4))
+        self.assertFalse(np.allclose(store.features[30], gapped_frames[30][0], rtol=1e-5, atol=1e-4))
+
+    def test_invalidated_by_config(self):
+        store = self.create_store(mel_banks_only=True, n_jobs=1)
+        store.open()
+        self.assertEqual(store.features.shape, (305, 26))
+
+        def build(aligned_files, store_hash):
+            self.fail("The features are computed again.")
+
+        store = self.create_store(mel_banks_only=True, n_jobs=1)
+        store.build = build
+        store.open()
+        self.assertEqual(store.features.shape, (305, 26))
+
+        store = self.create_store(mel_banks_only=False, n_jobs=1)
+        store.open()
+        self.assertEqual(store.features.shape, (305, 36))
+
+
+class TestSplitCrossvalid(unittest.TestCase):
+    def test_ratio(self):
+        crossvalid = split_crossvalid(10000, 2000, 10000)
+        self.assertEqual(len(crossvalid), 10000)
+        self.assertAlmostEqual(float(crossvalid.sum()) / (~crossvalid).sum(), 0.2, places=2)
+        # the cross-validation frames come in blocks of 5 % of crossvalid_frames
+        self.assertTrue(crossvalid[:100].all())
+        self.assertFalse(crossvalid[100])
+
+    def test_no_crossvalid(self):
+        self.assertFalse(split_crossvalid(100, 0, 1000).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import unittest
+
+import numpy as np
+
+from alex.utils.mfcc import MFCCFrontEnd
+
+
+class TestMFCCFrontEnd(unittest.TestCase):
+    framesize = 512
+    frameshift = 160
+
+    def setUp(self):
+        np.random.seed(0)
+        self.samples = (np.random.randn(16000) * 3000).astype(np.int16)
+
+    def param_frames(self, front_end, samples):
+        mfccs = []
+        for start in range(0, len(samples) - self.framesize + 1, self.frameshift):
+            mfccs.append(front_end.param(list(samples[start:start + self.framesize])))
+        return np.array(mfccs)
+
+    def assert_block_equals_frames(self, **kwargs):
+        front_end = MFCCFrontEnd(framesize=self.framesize, **kwargs)
+        expected = self.param_frames(front_end, self.samples)
+
+        # process the samples in blocks of different lengths, each block starts where the previous block's frames end
+        front_end = MFCCFrontEnd(framesize=self.framesize, **kwargs)
+        blocks = []
+        start = 0
+        for n_frames in [1, 2, 1, 7, 3, 20, 50]:
+            end = start + (n_frames - 1) * self.frameshift + self.framesize
+            blocks.append(front_end.param_block(self.samples[start:end], self.frameshift))
+            start += n_frames * self.frameshift
+        blocks.append(front_end.param_block(self.samples[start:], self.frameshift))
+        result = np.vstack(blocks)
+
+        self.assertEqual(result.shape, expected.shape)
+        self.assertEqual(result.shape[1], front_end.get_size())
+        self.assertTrue(np.allclose(result, expected, rtol=1e-5, atol=1e-4))
+
+    def test_param_block(self):
+        self.assert_block_equals_frames()
+
+    def test_param_block_last_frames(self):
+        self.assert_block_equals_frames(n_last_frames=3)
+
+    def test_param_block_no_delta(self):
+        self.assert_block_equals_frames(usedelta=False, usec0=False, usepower=False)
+
+    def test_param_block_mel_banks_only(self):
+        self.assert_block_equals_frames(mel_banks_only=True, n_last_frames=2)
+
+    def test_param_block_short(self):
+        front_end = MFCCFrontEnd(framesize=self.framesize)
+        mfcc = front_end.param_block(self.samples[:self.framesize - 1], self.frameshift)
+        self.assertEqual(mfcc.shape, (0, front_end.get_size()))
+
+    def test_param_list(self):
+        front_end = MFCCFrontEnd(framesize=self.framesize, zmeansource=False)
+        expected = front_end.param(self.samples[:self.framesize].astype(float))
+
+        front_end = MFCCFrontEnd(framesize=self.framesize, zmeansource=False)
+        result = front_end.param(list(self.samples[:self.framesize]))
+
+        self.assertTrue(np.allclose(result, expected))
+
+    def test_reset(self):
+        front_end = MFCCFrontEnd(framesize=self.framesize, n_last_frames=3)
+        expected = front_end.param_block(self.samples[8000:], self.frameshift)
+
+        front_end = MFCCFrontEnd(framesize=self.framesize, n_last_frames=3)
+        front_end.param_block(self.samples[:4000], self.frameshift)
+        front_end.reset()
+        result = front_end.param_block(self.samples[8000:], self.frameshift)
+
+        self.assertTrue(np.allclose(result, expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
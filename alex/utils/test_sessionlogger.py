@@ -3,6 +3,10 @@
 
 import unittest
 import os
+import shutil
+import tempfile
+import time
+import wave
 
 if __name__ == "__main__":
     import autopath
@@ -10,28 +14,33 @@ if __name__ == "__main__":
 from alex.components.asr.utterance import UtteranceConfusionNetwork
 from alex.components.slu.da import DialogueActItem, DialogueActConfusionNetwork
 from alex.utils.config import Config
-from alex.utils.sessionlogger import SessionLogger
+from alex.utils.sessionlogger import SessionLogger, recover_session_xml
 from alex.utils.mproc import SystemLogger
 
 
-CONFIG_DICT = {
-    'Logging': {
-    'system_name':    "Default alex",
-    'version':        "1.0",
-    'system_logger':  SystemLogger(stdout=True, output_dir='./call_logs'),
-    'session_logger': SessionLogger()
-  }
-}
-
 class TestSessionLogger(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
     def test_session_logger(self):
-        cfg = Config.load_configs(config=CONFIG_DICT, use_default=False)
+        config_dict = {
+            'Logging': {
+                'system_name':    "Default alex",
+                'version':        "1.0",
+                'system_logger':  SystemLogger(stdout=True, output_dir=os.path.join(self.tmp_dir, 'call_logs')),
+                'session_logger': SessionLogger()
+            }
+        }
+        cfg = Config.load_configs(config=config_dict, use_default=False)
 
         sl = SessionLogger()
 
         # test 3 calls at once
         for i in range(3):
-            sess_dir = "./%d" % i
+            sess_dir = os.path.join(self.tmp_dir, "%d" % i)
             if not os.path.isdir(sess_dir):
                 os.mkdir(sess_dir)
             sl.session_start(sess_dir)
@@ -77,7 +86,6 @@ class TestSessionLogger(unittest.TestCase):
             slu_confnet.add(0.6, DialogueActItem('thankyou'))
             slu_confnet.add(0.4, DialogueActItem('restart'))
             slu_confnet.add(0.1, DialogueActItem('bye'))
-            slu_confnet.merge()
             slu_confnet.normalise()
             slu_confnet.sort()
 
@@ -97,5 +105,136 @@ class TestSessionLogger(unittest.TestCase):
             sl.rec_end("user2.wav")
             sl.hangup("user")
 
+
+class TestSessionJournal(unittest.TestCase):
+    def setUp(self):
+        self.sess_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.sess_dir)
+
+    def read_session_xml(self):
+        with open(os.path.join(self.sess_dir, 'session.xml')) as f:
+            return f.read()
+
+    def log_session(self, sl):
+        sl._session_start(self.sess_dir)
+        sl._header("Default alex", "1.0")
+        sl._input_source("voip")
+        sl._turn("system")
+        sl._dialogue_act("system", "hello()")
+        sl._text("system", u"Dobrý den.")
+        sl._rec_start("system", "system1.wav")
+        sl._rec_write("system1.wav", '\x00\x01' * 160)
+        sl._rec_end("system1.wav")
+        sl._turn("user")
+        sl._rec_start("user", "user1.wav")
+        sl._rec_end("user1.wav")
+        sl._dialogue_state("system", [[("from_stop", u"Anděl"), ("to_stop", "None")]])
+        sl._hangup("user")
+
+    def test_journal(self):
+        sl = SessionLogger()
+        sl.set_cfg({'Audio': {'sample_rate': 16000}})
+        self.log_session(sl)
+
+        # the session.xml is written only at the end of the session
+        self.assertNotIn('<turn', self.read_session_xml())
+        self.assertTrue(os.path.getsize(os.path.join(self.sess_dir, 'session.journal')) > 0)
+
+        sl._session_end()
+        session_xml = self.read_session_xml()
+        self.assertIn('<turn speaker="user" time=', session_xml)
+        self.assertIn('<hangup/>', session_xml)
+        self.assertTrue(os.path.exists(os.path.join(self.sess_dir, 'user1.wav')))
+
+        # the recovered session.xml is the same as the written one
+        os.remove(os.path.join(self.sess_dir, 'session.xml'))
+        recover_session_xml(self.sess_dir)
+        self.assertEqual(self.read_session_xml(), session_xml)
+
+    def test_recover_incomplete_journal(self):
+        sl = SessionLogger()
+        sl.set_cfg({'Audio': {'sample_rate': 16000}})
+        self.log_session(sl)
+        sl._write_session_xml()
+        session_xml = self.read_session_xml()
+
+        # simulate a crash in the middle of writing to the journal
+        with open(os.path.join(self.sess_dir, 'session.journal'), 'ab') as f:
+            f.write('\x80\x02(U\x04turn')
+
+        recover_session_xml(self.sess_dir)
+        self.assertEqual(self.read_session_xml(), session_xml)
+
+
+class TestSessionLoggerQueue(unittest.TestCase):
+    def setUp(self):
+        self.sess_dir = tempfile.mkdtemp()
+
+        self.sl = SessionLogger()
+        self.sl.set_cfg({'Audio': {'sample_rate': 16000},
+                         'Hub': {'main_loop_sleep_time': 0.005, 'latency_report_threshold': 5.0}})
+        self.sl._session_start(self.sess_dir)
+        self.sl._turn("user")
+
+    def tearDown(self):
+        shutil.rmtree(self.sess_dir)
+
+    def read_rec(self, fname):
+        w = wave.open(os.path.join(self.sess_dir, fname))
+        try:
+            return w.readframes(w.getnframes())
+        finally:
+            w.close()
+
+    def process_queue(self, n_calls):
+        # wait for the feeder threads of the queues
+        start = time.time()
+        while self.sl.n_calls < n_calls and time.time() - start < 5.0:
+            time.sleep(0.01)
+            self.sl._recv_queue()
+        self.sl._process_queue()
+
+    def test_coalesced_writes(self):
+        self.sl.rec_start("user", "user1.wav")
+        for i in range(10):
+            self.sl.rec_write("user1.wav", chr(i) * 320)
+        self.sl.rec_end("user1.wav")
+        self.sl.dialogue_act("user", "hello()")
+        self.process_queue(3)
+
+        self.assertEqual(self.read_rec("user1.wav"), ''.join(chr(i) * 320 for i in range(10)))
+        self.assertIsNone(self.sl._rec_started["user1.wav"])
+
+        stats = self.sl.get_queue_stats()
+        self.assertEqual(stats['n_calls'], 3)
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['max_queue_depth'], 3)
+        self.assertEqual(stats['n_audio_chunks'], 10)
+        self.assertEqual(stats['n_audio_writes'], 1)
+        self.assertEqual(stats['audio_buffered'], 0)
+
+    def test_late_audio(self):
+        # the audio data can arrive after the end of the recording was processed
+        self.sl._rec_start("user", "user1.wav")
+        self.sl._rec_write("user1.wav", '\x01' * 320)
+        self.sl._rec_end("user1.wav", n_bytes=960)
+        self.assertIsNotNone(self.sl._rec_started["user1.wav"])
+
+        self.sl._rec_write("user1.wav", '\x02' * 640)
+        self.sl._write_audio()
+        self.assertIsNone(self.sl._rec_started["user1.wav"])
+        self.assertEqual(self.read_rec("user1.wav"), '\x01' * 320 + '\x02' * 640)
+
+    def test_early_audio(self):
+        # the audio data can arrive before the start of the recording was processed
+        self.sl._rec_write("user1.wav", '\x01' * 320)
+        self.sl._write_audio()
+        self.sl._rec_start("user", "user1.wav")
+        self.sl._rec_end("user1.wav", n_bytes=320)
+        self.assertEqual(self.read_rec("user1.wav"), '\x01' * 320)
+
+
 if __name__ == '__main__':
     unittest.main()